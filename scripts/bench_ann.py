@@ -0,0 +1,102 @@
+"""
+Benchmark the IVF index against exact search on synthetic embeddings.
+
+Reports recall@k versus exact search, p50/p99 query latency and index memory
+for a range of nprobe values, to pick SEARCH_ANN_* settings from measurements.
+
+    python scripts/bench_ann.py --size 100000 --queries 200 --k 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vembedding.search.ivf import IVFIndex, default_n_lists  # noqa: E402
+from vembedding.search.matrix import VectorMatrix, normalize_rows  # noqa: E402
+
+
+def synthetic_embeddings(size: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """clustered unit vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=size)
+    noise = rng.normal(scale=0.6, size=(size, dim)).astype(np.float32)
+    return normalize_rows(centers[labels] + noise)
+
+
+def percentile_ms(samples, q) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=0, help="0 = 4 * sqrt(size)")
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = synthetic_embeddings(
+        args.size + args.queries, args.dim, args.clusters, args.seed
+    )
+    vectors, queries = data[: args.size], data[args.size :]
+    ids = list(range(args.size))
+
+    exact = VectorMatrix(args.dim, capacity=args.size)
+    exact.add_many(ids, vectors)
+
+    start = time.perf_counter()
+    n_lists = args.lists or default_n_lists(args.size)
+    ivf = IVFIndex.build(ids, vectors, n_lists=n_lists)
+    build_s = time.perf_counter() - start
+
+    truth, exact_latency = [], []
+    for query in queries:
+        start = time.perf_counter()
+        ranked = exact.top_k(query, args.k)
+        exact_latency.append(time.perf_counter() - start)
+        truth.append({item_id for item_id, _ in ranked})
+
+    print(f"vectors={args.size} dim={args.dim} k={args.k} queries={args.queries}")
+    print(
+        f"exact: memory={exact.vectors.nbytes / 2**20:.1f} MiB "
+        f"p50={percentile_ms(exact_latency, 50):.2f}ms "
+        f"p99={percentile_ms(exact_latency, 99):.2f}ms"
+    )
+    print(
+        f"ivf:   lists={n_lists} build={build_s:.1f}s "
+        f"memory={ivf.memory_bytes() / 2**20:.1f} MiB"
+    )
+    print()
+    print(
+        f"{'nprobe':>8} {'recall@k':>10} {'p50 ms':>10} {'p99 ms':>10} {'speedup':>9}"
+    )
+
+    exact_p50 = percentile_ms(exact_latency, 50)
+    for nprobe in args.nprobe:
+        latency, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            ranked = ivf.top_k(query, args.k, nprobe=nprobe)
+            latency.append(time.perf_counter() - start)
+            hits += len(expected & {item_id for item_id, _ in ranked})
+
+        recall = hits / (len(queries) * args.k)
+        p50 = percentile_ms(latency, 50)
+        print(
+            f"{nprobe:>8} {recall:>10.3f} {p50:>10.2f} "
+            f"{percentile_ms(latency, 99):>10.2f} {exact_p50 / p50:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
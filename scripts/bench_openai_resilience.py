@@ -0,0 +1,190 @@
+"""
+Benchmark the OpenAI call layer against the local fake server
+(vembedding.providers.fake_openai_server) injecting latency and errors.
+
+The same concurrent embedding calls go through the real OpenAI client
+(max_retries=0) bare, then through the call layer with retries, then with
+hedging as well, under each fault profile; finally an outage shows the
+circuit breaker failing fast instead of waiting out every attempt, and
+closing again after one probe once the upstream recovers.
+
+    python scripts/bench_openai_resilience.py --calls 400 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# the settings are read on import; only the call layer's module is used
+for name in ("SUPABASE_URL", "SUPABASE_ANON_KEY", "OPENAI_API_KEY"):
+    os.environ.setdefault(name, "offline")
+
+import uvicorn
+from openai import AsyncOpenAI
+
+from vembedding.providers.fake_openai_server import Faults, create_app
+from vembedding.providers.resilience import (
+    ATTEMPTS,
+    HEDGES,
+    CallPolicy,
+    CircuitBreaker,
+    OpenAICallLayer,
+)
+
+PROFILES = {
+    "healthy": Faults(latency_ms=20),
+    "flaky": Faults(latency_ms=20, error_rate=0.1, throttle_rate=0.05),
+    "tail": Faults(latency_ms=20, slow_rate=0.03, slow_ms=2_000),
+    "flaky+tail": Faults(
+        latency_ms=20, error_rate=0.1, throttle_rate=0.05, slow_rate=0.03, slow_ms=2_000
+    ),
+}
+TEXT = "senior python engineer with five years of postgres and fastapi experience"
+
+
+def start_server(port: int):
+    app = create_app(seed=7)
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return app, server
+
+
+def total(metric, **labels) -> float:
+    return sum(
+        sample["value"]
+        for sample in metric.snapshot()
+        if all(sample["labels"].get(name) == want for name, want in labels.items())
+    )
+
+
+async def run(client, layer, calls: int, concurrency: int):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        make_call = lambda: client.embeddings.create(  # noqa: E731
+            model="text-embedding-3-small", input=[TEXT]
+        )
+        async with gate:
+            started = time.perf_counter()
+            try:
+                if layer is None:
+                    await make_call()
+                else:
+                    await layer.call(make_call)
+            except Exception:
+                failures += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    elapsed = time.perf_counter() - started
+    return latencies, failures, elapsed
+
+
+def percentile(values, share: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def make_layer(name: str, hedge_percentile: float, threshold: int = 0):
+    return OpenAICallLayer(
+        name,
+        CallPolicy(
+            deadline=10,
+            attempt_timeout=1,
+            max_attempts=4,
+            backoff_base=0.05,
+            backoff_max=1.0,
+            hedge_percentile=hedge_percentile,
+        ),
+        CircuitBreaker(name, failure_threshold=threshold, reset_seconds=2),
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args()
+
+    app, server = start_server(args.port)
+    client = AsyncOpenAI(
+        api_key="fake",
+        base_url=f"http://127.0.0.1:{args.port}/v1",
+        max_retries=0,
+        timeout=5,
+    )
+
+    print(f"{args.calls} embedding calls, {args.concurrency} concurrent")
+    header = f"{'profile':>11} {'mode':>7} {'ok %':>6} {'p50 ms':>7} {'p99 ms':>7}"
+    print(f"{header} {'max ms':>7} {'attempts':>9} {'hedges':>7}")
+    for profile, faults in PROFILES.items():
+        for mode, hedge in (("bare", None), ("retry", 0.0), ("hedge", 95.0)):
+            app.state.faults = faults
+            layer = None
+            if hedge is not None:
+                layer = make_layer(f"{profile}-{mode}", hedge)
+                # recent latencies so the hedge delay is known from the start
+                app.state.faults = PROFILES["healthy"]
+                await run(client, layer, 50, args.concurrency)
+                app.state.faults = faults
+            attempts_before = total(ATTEMPTS, operation=f"{profile}-{mode}")
+            latencies, failures, _ = await run(
+                client, layer, args.calls, args.concurrency
+            )
+            attempts = total(ATTEMPTS, operation=f"{profile}-{mode}") - attempts_before
+            hedges = total(HEDGES, operation=f"{profile}-{mode}")
+            ok = 100 * (args.calls - failures) / args.calls
+            print(
+                f"{profile:>11} {mode:>7} {ok:>6.1f}"
+                f" {percentile(latencies, 0.5) * 1000:>7.0f}"
+                f" {percentile(latencies, 0.99) * 1000:>7.0f}"
+                f" {max(latencies, default=0) * 1000:>7.0f}"
+                f" {attempts or args.calls:>9.0f} {hedges:>7.0f}"
+            )
+
+    # outage: every request fails, then the upstream recovers
+    app.state.faults = Faults(latency_ms=20, error_rate=1.0)
+    print("\noutage (all 500s), then recovery")
+    for threshold in (0, 5):
+        layer = make_layer(f"outage-{threshold}", 0.0, threshold=threshold)
+        stats_before = app.state.stats["requests"]
+        app.state.faults = Faults(latency_ms=20, error_rate=1.0)
+        _, failures, elapsed = await run(client, layer, 100, args.concurrency)
+        sent = app.state.stats["requests"] - stats_before
+        label = "breaker" if threshold else "no breaker"
+        print(
+            f"{label:>11}: {failures} of 100 failed in {elapsed:.2f}s,"
+            f" {sent} requests reached the upstream"
+        )
+        if threshold:
+            app.state.faults = PROFILES["healthy"]
+            await asyncio.sleep(layer.breaker.retry_after())
+            # half-open lets one probe through, concurrent calls still fail fast
+            await run(client, layer, 1, 1)
+            _, failures, elapsed = await run(client, layer, 100, args.concurrency)
+            print(
+                f"{'recovered':>11}: {failures} of 100 failed in {elapsed:.2f}s,"
+                f" circuit {layer.breaker.state}"
+            )
+
+    await client.close()
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
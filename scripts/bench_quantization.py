@@ -0,0 +1,137 @@
+"""
+Benchmark compact vector representations against full float32.
+
+For reduced dimensions, int8 scalar quantization and binary codes with int8
+rescoring, reports bytes per vector (in memory and as a JSON payload),
+JSON serialization / parse time and ranking agreement (recall@k and top-1
+agreement against exact float32 search) on synthetic embeddings.
+
+Synthetic vectors do not concentrate information in their leading
+components the way text-embedding-3 models do, so the reduced-dimension
+rows are a lower bound on what the API `dimensions` parameter achieves.
+
+    python scripts/bench_quantization.py --size 50000 --queries 200 --k 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_ann import percentile_ms, synthetic_embeddings  # noqa: E402
+from vembedding.search.matrix import VectorMatrix  # noqa: E402
+from vembedding.search.quantization import (  # noqa: E402
+    QuantizedMatrix,
+    truncate_dimensions,
+)
+
+
+def json_cost(vectors: np.ndarray, decimals: int, samples: int = 200):
+    """average JSON bytes, dumps and loads time (ms) for one vector"""
+    rows = vectors[:samples].astype(np.float64)
+    if decimals:
+        rows = np.round(rows, decimals)
+    payloads = [row.tolist() for row in rows]
+
+    start = time.perf_counter()
+    encoded = [json.dumps(payload) for payload in payloads]
+    dumps_ms = (time.perf_counter() - start) * 1000 / len(payloads)
+
+    start = time.perf_counter()
+    for text in encoded:
+        json.loads(text)
+    loads_ms = (time.perf_counter() - start) * 1000 / len(payloads)
+
+    return sum(len(text) for text in encoded) / len(encoded), dumps_ms, loads_ms
+
+
+def agreement(matrix, queries: np.ndarray, truth, k: int):
+    """recall@k and top-1 agreement against the exact float32 results"""
+    hits, top1, latency = 0, 0, []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        ranked = matrix.top_k(query, k)
+        latency.append(time.perf_counter() - start)
+        hits += len(set(expected) & {item_id for item_id, _ in ranked})
+        top1 += bool(ranked) and ranked[0][0] == expected[0]
+    return hits / (len(queries) * k), top1 / len(queries), latency
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--dimensions", type=int, nargs="*", default=[512, 256])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--decimals", type=int, nargs="+", default=[0, 6, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = synthetic_embeddings(
+        args.size + args.queries, args.dim, args.clusters, args.seed
+    )
+    vectors, queries = data[: args.size], data[args.size :]
+    ids = list(range(args.size))
+
+    exact = VectorMatrix(args.dim, capacity=args.size)
+    exact.add_many(ids, vectors)
+    truth = [[item_id for item_id, _ in exact.top_k(q, args.k)] for q in queries]
+
+    print(f"vectors={args.size} dim={args.dim} k={args.k} queries={args.queries}")
+    print()
+    print("JSON transport (one vector)")
+    print(f"{'dim':>6} {'decimals':>9} {'bytes':>9} {'dumps ms':>9} {'loads ms':>9}")
+    for dim in [args.dim] + args.dimensions:
+        rows = truncate_dimensions(vectors, dim) if dim != args.dim else vectors
+        for decimals in args.decimals:
+            size, dumps_ms, loads_ms = json_cost(rows, decimals)
+            print(
+                f"{dim:>6} {decimals or 'full':>9} {size:>9.0f} "
+                f"{dumps_ms:>9.3f} {loads_ms:>9.3f}"
+            )
+
+    print()
+    print("local scoring")
+    print(
+        f"{'representation':<22} {'bytes/vec':>10} {'recall@k':>9} "
+        f"{'top-1':>7} {'p50 ms':>8} {'p99 ms':>8}"
+    )
+
+    def report(name: str, matrix, bytes_per_vector: float, query_rows) -> None:
+        recall, top1, latency = agreement(matrix, query_rows, truth, args.k)
+        print(
+            f"{name:<22} {bytes_per_vector:>10.0f} {recall:>9.3f} {top1:>7.3f} "
+            f"{percentile_ms(latency, 50):>8.2f} {percentile_ms(latency, 99):>8.2f}"
+        )
+
+    report("float32", exact, 4 * args.dim, queries)
+    for dim in args.dimensions:
+        reduced = VectorMatrix(dim, capacity=args.size)
+        reduced.add_many(ids, truncate_dimensions(vectors, dim))
+        report(
+            f"float32 dim={dim}", reduced, 4 * dim, truncate_dimensions(queries, dim)
+        )
+
+    int8 = QuantizedMatrix(args.dim, capacity=args.size)
+    int8.add_many(ids, vectors)
+    # int8 codes + float32 scale
+    report("int8", int8, args.dim + 4, queries)
+
+    binary = QuantizedMatrix(args.dim, capacity=args.size, binary=True)
+    binary.add_many(ids, vectors)
+    for rescore in args.rescore:
+        binary.rescore = rescore
+        # bits scanned per query; the int8 codes are only read for the shortlist
+        report(f"binary rescore={rescore}x", binary, args.dim / 8, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark batch reverse matching (applicants to jobs) on synthetic embeddings.
+
+Reports applicants/s for ranking with one matrix product per batch of
+applicants at several batch sizes (batch size 1 is the one-applicant-at-a-
+time baseline), then for the in-process work of the batch match (python -m
+vembedding.match_jobs) per page: decoding the '[...]' vectors PostgREST
+returns, ranking, and building the rows of the bulk upsert. Database round
+trips come on top; the batch match prints its end-to-end applicants/s.
+
+    python scripts/bench_reverse_match.py --jobs 5000 --applicants 20000 --k 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_ann import synthetic_embeddings  # noqa: E402
+from vembedding.applicants.matching import match_rows, rank_jobs  # noqa: E402
+from vembedding.search.engine import parse_embedding  # noqa: E402
+from vembedding.search.matrix import VectorMatrix  # noqa: E402
+
+
+def bench_ranking(
+    jobs: VectorMatrix, applicants: np.ndarray, k: int, batch_size: int
+) -> float:
+    """applicants/s ranking every applicant, `batch_size` per matrix product"""
+    start = time.perf_counter()
+    for offset in range(0, len(applicants), batch_size):
+        rank_jobs(jobs, applicants[offset : offset + batch_size], k)
+    return len(applicants) / (time.perf_counter() - start)
+
+
+def bench_pages(
+    jobs: VectorMatrix, applicants: np.ndarray, k: int, page_size: int
+) -> float:
+    """applicants/s for the batch match's in-process work on wire-format pages"""
+    pages = [
+        [
+            {"id": f"applicant-{offset + i}", "embedding": json.dumps(vector.tolist())}
+            for i, vector in enumerate(applicants[offset : offset + page_size])
+        ]
+        for offset in range(0, len(applicants), page_size)
+    ]
+    start = time.perf_counter()
+    for page in pages:
+        vectors = np.asarray(
+            [parse_embedding(row["embedding"]) for row in page], dtype=np.float32
+        )
+        ranked = rank_jobs(jobs, vectors, k)
+        match_rows([row["id"] for row in page], ranked, "2026-01-01T00:00:00+00:00")
+    return len(applicants) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=5_000)
+    parser.add_argument("--applicants", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 64, 256, 1024, 4096]
+    )
+    parser.add_argument("--page-size", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = synthetic_embeddings(args.jobs + args.applicants, args.dim, 200, args.seed)
+    job_vectors, applicants = data[: args.jobs], data[args.jobs :]
+    jobs = VectorMatrix(args.dim, capacity=args.jobs)
+    jobs.add_many([f"job-{i}" for i in range(args.jobs)], job_vectors)
+
+    print(f"jobs={args.jobs} applicants={args.applicants} dim={args.dim} k={args.k}")
+    print()
+    print(f"{'batch':>8} {'applicants/s':>14} {'speedup':>9}")
+    baseline = None
+    for batch_size in args.batch_sizes:
+        # one at a time is slow, a sample is enough
+        sample = applicants if batch_size > 1 else applicants[:1_000]
+        rate = bench_ranking(jobs, sample, args.k, batch_size)
+        baseline = baseline or rate
+        print(f"{batch_size:>8} {rate:>14,.0f} {rate / baseline:>8.1f}x")
+
+    rate = bench_pages(jobs, applicants, args.k, args.page_size)
+    print()
+    print(
+        f"batch match pages of {args.page_size} (decode + rank + rows): "
+        f"{rate:,.0f} applicants/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
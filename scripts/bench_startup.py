@@ -0,0 +1,92 @@
+"""
+Benchmark worker startup: how long `import vembedding.main` takes, then the
+app lifespan startup, then the first request that needs the tokenizer
+(GET /check-token-size), each in a fresh interpreter.
+
+Runs with and without STARTUP_PREWARM: pre-warming moves building the
+OpenAI clients and loading the tokenizer out of the first request and into
+startup, before the worker reports ready. Uses the in-memory database and
+makes no OpenAI call; the tokenizer's BPE file must be in the tiktoken
+cache (or downloadable).
+
+    python scripts/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+CHILD = """
+import asyncio, json, time
+TEXT = "senior python engineer with five years of postgres and fastapi experience"
+started = time.perf_counter()
+import vembedding.main
+imported = time.perf_counter()
+import httpx
+from vembedding.main import app
+
+async def main():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://x") as c:
+            response = await c.get(
+                "/check-token-size",
+                params={"text": TEXT},
+            )
+            response.raise_for_status()
+        return ready, time.perf_counter()
+
+ready, answered = asyncio.run(main())
+print(json.dumps({
+    "import": imported - started,
+    "startup": ready - imported,
+    "first_request": answered - ready,
+    "total": answered - started,
+}))
+"""
+
+STAGES = ("import", "startup", "first_request", "total")
+
+
+def run_child(prewarm: bool) -> dict:
+    env = {
+        "DATABASE_PROVIDER": "memory",
+        "EMBEDDING_QUEUE_PATH": "",
+        "EMBEDDING_CACHE_PATH": "",
+        "RATE_LIMIT_ENABLED": "false",
+        **os.environ,
+        "STARTUP_PREWARM": "true" if prewarm else "false",
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, [os.path.abspath(ROOT), os.environ.get("PYTHONPATH")])
+        ),
+    }
+    child = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, cwd=ROOT, capture_output=True, text=True
+    )
+    if child.returncode:
+        sys.exit(f"startup run failed:\n{child.stderr}")
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"median of {args.runs} fresh processes, milliseconds")
+    print(f"{'':>12} " + " ".join(f"{stage:>14}" for stage in STAGES))
+    for prewarm in (False, True):
+        runs = [run_child(prewarm) for _ in range(args.runs)]
+        medians = [statistics.median(run[stage] for run in runs) for stage in STAGES]
+        label = "prewarm" if prewarm else "lazy"
+        print(f"{label:>12} " + " ".join(f"{value * 1000:>14.0f}" for value in medians))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compare per-request `create_client` against the shared pooled client.
+
+Runs a local PostgREST stand-in (a keep-alive HTTP server that answers every
+`/rest/v1/*` call with a small JSON array), then issues the same table
+select through both client strategies and reports requests/sec.
+
+    python scripts/bench_supabase_client.py --requests 2000 --threads 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BODY = json.dumps([{"id": "00000000-0000-0000-0000-000000000000"}]).encode()
+
+
+class PostgrestStandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self):
+        length = int(self.headers.get("content-length") or 0)
+        if length:
+            self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    do_GET = do_POST = do_PATCH = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label: str, get_client, requests: int, threads: int) -> None:
+    def one(_):
+        get_client().table("jobs").select("id").eq("id", "x").execute()
+
+    one(0)  # warm up
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {requests / elapsed:>10.0f} req/s  ({elapsed:.2f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PostgrestStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ["SUPABASE_URL"] = url
+    os.environ.setdefault("SUPABASE_ANON_KEY", "bench-anon-key")
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+    from supabase import create_client
+
+    from vembedding.database import SupabasePool
+
+    pool = SupabasePool(
+        url=url,
+        key=os.environ["SUPABASE_ANON_KEY"],
+        max_connections=args.threads,
+        max_keepalive_connections=args.threads,
+        timeout=10,
+    )
+
+    print(f"{args.requests} requests, {args.threads} threads, stand-in at {url}")
+    run(
+        "create_client per request",
+        lambda: create_client(url, os.environ["SUPABASE_ANON_KEY"]),
+        args.requests,
+        args.threads,
+    )
+    run("pooled client", lambda: pool.client, args.requests, args.threads)
+    run(
+        "pooled client + with_auth",
+        lambda: pool.with_auth("user-token"),
+        args.requests,
+        args.threads,
+    )
+
+    pool.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
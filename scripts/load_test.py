@@ -0,0 +1,302 @@
+"""
+Concurrent load test for the API.
+
+Drives create_job, create_applicant, create_application and search-applicants
+in that order (each phase feeds ids to the next) and reports throughput and
+p50/p95/p99 latency per endpoint. Embeddings are computed in the background,
+so before searching it waits for every applicant to be ready
+(`embedding_ready`: latency is the wait per applicant). Start the server with RATE_LIMIT_ENABLED=false
+or the per-minute limits will reject almost everything.
+
+    python scripts/load_test.py --base-url http://127.0.0.1:8000 --concurrency 32
+
+With --offline no server is needed: the app runs in-process (ASGI transport)
+on the fake providers (hash embeddings, a canned-JSON chat model with the
+given latency / output speed, an in-memory database), with rate limiting
+and the on-disk caches off. Nothing leaves the machine, as long as the
+tiktoken cl100k_base file is already in its cache. Several --concurrency
+values run one after the other:
+
+    python scripts/load_test.py --offline --concurrency 1 8 32 --llm-latency-ms 500
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+SKILLS = [
+    "python",
+    "fastapi",
+    "postgres",
+    "react",
+    "typescript",
+    "kubernetes",
+    "aws",
+    "go",
+    "rust",
+    "machine learning",
+    "data engineering",
+    "terraform",
+]
+QUERIES = [
+    "senior python backend",
+    "react + typescript",
+    "kubernetes platform engineer",
+    "data engineer with spark experience",
+    "machine learning in production",
+]
+
+
+def job_payload(i: int) -> Dict:
+    skills = random.sample(SKILLS, 4)
+    return {
+        "title": f"Load test engineer #{i}",
+        "description": f"We are hiring an engineer to work with {', '.join(skills)}.",
+        "requirements": f"At least 3 years with {skills[0]} and {skills[1]}.",
+        "author": "load-test",
+    }
+
+
+def applicant_payload(i: int) -> Dict:
+    skills = random.sample(SKILLS, 5)
+    return {
+        "name": f"Candidate {i}",
+        "email": f"candidate{i}-{random.randrange(10**9)}@example.com",
+        "resume_text": (
+            f"Engineer with {random.randint(1, 15)} years of experience building "
+            f"systems with {', '.join(skills)}. Shipped several production services."
+        ),
+        "skills": ", ".join(skills),
+        "experience": f"{random.randint(1, 15)} years",
+    }
+
+
+async def wait_until_embedded(
+    client: httpx.AsyncClient, path: str, poll_seconds: float = 0.05
+) -> httpx.Response:
+    """poll an embedding status endpoint until it is no longer pending"""
+    while True:
+        response = await client.get(path)
+        if response.status_code >= 400:
+            return response
+        if response.json()["embedding_status"] != "pending":
+            return response
+        await asyncio.sleep(poll_seconds)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class PhaseResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors: Dict[int, int] = {}
+        self.elapsed = 0.0
+
+    def report(self) -> str:
+        ok = len(self.latencies)
+        throughput = ok / self.elapsed if self.elapsed else 0.0
+        errors = ",".join(f"{code}x{n}" for code, n in sorted(self.errors.items()))
+        return (
+            f"{self.name:<20} {ok:>6} {throughput:>9.1f} "
+            f"{percentile(self.latencies, 50) * 1000:>9.1f} "
+            f"{percentile(self.latencies, 95) * 1000:>9.1f} "
+            f"{percentile(self.latencies, 99) * 1000:>9.1f}  {errors or '-'}"
+        )
+
+
+async def run_phase(
+    name: str,
+    total: int,
+    concurrency: int,
+    send: Callable[[int], Awaitable[httpx.Response]],
+    on_success: Callable[[httpx.Response], None] = lambda r: None,
+) -> PhaseResult:
+    """send `total` requests with at most `concurrency` in flight"""
+    result = PhaseResult(name)
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await send(i)
+            except httpx.HTTPError:
+                result.errors[0] = result.errors.get(0, 0) + 1
+                continue
+            if response.status_code < 400:
+                result.latencies.append(time.perf_counter() - start)
+                on_success(response)
+            else:
+                code = response.status_code
+                result.errors[code] = result.errors.get(code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+async def run_load_test(
+    client: httpx.AsyncClient, args, concurrency: int
+) -> List[PhaseResult]:
+    job_ids: List[str] = []
+    applicant_ids: List[str] = []
+    results = []
+
+    results.append(
+        await run_phase(
+            "create_job",
+            args.jobs,
+            concurrency,
+            lambda i: client.post("/api/jobs/", json=job_payload(i)),
+            lambda r: job_ids.append(r.json()["id"]),
+        )
+    )
+    results.append(
+        await run_phase(
+            "create_applicant",
+            args.applicants,
+            concurrency,
+            lambda i: client.post("/api/applicants/", json=applicant_payload(i)),
+            lambda r: applicant_ids.append(r.json()["id"]),
+        )
+    )
+    if not job_ids or not applicant_ids:
+        return results
+
+    results.append(
+        await run_phase(
+            "embedding_ready",
+            len(applicant_ids),
+            concurrency,
+            lambda i: wait_until_embedded(
+                client, f"/api/applicants/{applicant_ids[i]}/status"
+            ),
+        )
+    )
+
+    results.append(
+        await run_phase(
+            "create_application",
+            len(applicant_ids),
+            concurrency,
+            lambda i: client.post(
+                "/api/applications/",
+                json={
+                    "job_id": job_ids[i % len(job_ids)],
+                    "applicant_id": applicant_ids[i],
+                },
+            ),
+        )
+    )
+    results.append(
+        await run_phase(
+            "search_applicants",
+            args.searches,
+            concurrency,
+            lambda i: client.post(
+                f"/api/jobs/{job_ids[i % len(job_ids)]}/search-applicants",
+                json={"query": random.choice(QUERIES)},
+            ),
+        )
+    )
+    return results
+
+
+def offline_app(args):
+    """the app wired to the fake providers (settings are read on import)"""
+    os.environ.update(
+        {
+            "EMBEDDING_PROVIDER": "fake",
+            "LLM_PROVIDER": "fake",
+            "DATABASE_PROVIDER": "memory",
+            "RATE_LIMIT_ENABLED": "false",
+            "EMBEDDING_CACHE_PATH": "",
+            "EMBEDDING_QUEUE_PATH": "",
+            "SEARCH_INDEX_DIR": "",
+            "FAKE_EMBEDDING_LATENCY_MS": str(args.embedding_latency_ms),
+            "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+            "FAKE_LLM_TOKENS_PER_SECOND": str(args.llm_tokens_per_second),
+            "FAKE_DATABASE_LATENCY_MS": str(args.db_latency_ms),
+        }
+    )
+    for name in ("SUPABASE_URL", "SUPABASE_ANON_KEY", "OPENAI_API_KEY"):
+        os.environ.setdefault(name, "offline")
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from vembedding.main import app
+
+    return app
+
+
+def print_report(results: List[PhaseResult], concurrency: int) -> None:
+    print(f"concurrency={concurrency}")
+    print(
+        f"{'endpoint':<20} {'ok':>6} {'req/s':>9} {'p50 ms':>9} "
+        f"{'p95 ms':>9} {'p99 ms':>9}  errors"
+    )
+    for result in results:
+        print(result.report())
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16])
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--applicants", type=int, default=200)
+    parser.add_argument("--searches", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--offline", action="store_true")
+    # fake provider latencies (--offline only)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    return parser
+
+
+async def main_async(args) -> None:
+    random.seed(args.seed)
+    if not args.offline:
+        for concurrency in args.concurrency:
+            async with httpx.AsyncClient(
+                base_url=args.base_url,
+                timeout=args.timeout,
+                limits=httpx.Limits(max_connections=concurrency),
+            ) as client:
+                print_report(
+                    await run_load_test(client, args, concurrency), concurrency
+                )
+            print()
+        return
+
+    app = offline_app(args)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://offline",
+            timeout=args.timeout,
+        ) as client:
+            for concurrency in args.concurrency:
+                print_report(
+                    await run_load_test(client, args, concurrency), concurrency
+                )
+                print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(build_parser().parse_args()))
@@ -0,0 +1,67 @@
+-- Chunked multi-vector applicant embeddings (EMBEDDING_CHUNKING_ENABLED).
+--
+-- Long applicant texts are embedded as overlapping token windows, one row per
+-- window. `applicants.embedding` keeps the normalized mean of the chunks.
+
+create table if not exists public.applicant_chunks (
+    applicant_id uuid not null references public.applicants (id) on delete cascade,
+    chunk_index integer not null,
+    content text not null,
+    embedding vector(1536) not null,
+    created_at timestamptz not null default now(),
+    primary key (applicant_id, chunk_index)
+);
+
+alter table public.applicant_chunks enable row level security;
+
+create policy "applicant_chunks are readable"
+    on public.applicant_chunks for select using (true);
+
+create policy "applicant_chunks are insertable"
+    on public.applicant_chunks for insert with check (true);
+
+-- Max-sim search: an applicant scores as its best chunk, or as its single
+-- embedding when it has no chunks. Still one row per applicant.
+-- `match_count` changes the signature: drop the two-argument version so
+-- calls without it are not ambiguous between the two overloads.
+drop function if exists public.search_applicants_for_job(uuid, vector);
+
+create or replace function public.search_applicants_for_job(
+    job_id_param uuid,
+    query_embedding vector(1536),
+    match_count integer default 10
+)
+returns table (
+    id uuid,
+    name text,
+    email text,
+    resume_text text,
+    skills text,
+    experience text,
+    similarity_score double precision
+)
+language sql
+stable
+as $$
+    select
+        a.id,
+        a.name,
+        a.email,
+        a.resume_text,
+        a.skills,
+        a.experience,
+        coalesce(
+            (
+                select max(1 - (c.embedding <=> query_embedding))
+                from public.applicant_chunks c
+                where c.applicant_id = a.id
+            ),
+            1 - (a.embedding <=> query_embedding)
+        ) as similarity_score
+    from public.applications ap
+    join public.applicants a on a.id = ap.applicant_id
+    where ap.job_id = job_id_param
+      and a.embedding is not null
+    order by similarity_score desc
+    limit match_count;
+$$;
@@ -0,0 +1,33 @@
+-- Lets POST /api/applications create an application with a single INSERT:
+-- the foreign keys report a missing job or applicant (23503) and the unique
+-- key a duplicate application (23505), instead of three lookups beforehand.
+-- The bulk endpoint relies on the unique key for ON CONFLICT DO NOTHING.
+
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint
+        where conname = 'applications_job_id_applicant_id_key'
+    ) then
+        alter table public.applications
+            add constraint applications_job_id_applicant_id_key
+            unique (job_id, applicant_id);
+    end if;
+
+    if not exists (
+        select 1 from pg_constraint where conname = 'applications_job_id_fkey'
+    ) then
+        alter table public.applications
+            add constraint applications_job_id_fkey
+            foreign key (job_id) references public.jobs (id) on delete cascade;
+    end if;
+
+    if not exists (
+        select 1 from pg_constraint where conname = 'applications_applicant_id_fkey'
+    ) then
+        alter table public.applications
+            add constraint applications_applicant_id_fkey
+            foreign key (applicant_id) references public.applicants (id) on delete cascade;
+    end if;
+end
+$$;
@@ -0,0 +1,72 @@
+-- Background embedding: jobs and applicants are inserted without their
+-- embedding (`embedding_status` pending) and updated by the embedding workers
+-- (ready, or failed with `embedding_error` once retries are exhausted).
+-- Existing rows already have their embedding.
+
+alter table public.jobs
+    alter column embedding drop not null,
+    add column if not exists embedding_status text not null default 'ready'
+        check (embedding_status in ('pending', 'ready', 'failed')),
+    add column if not exists embedding_error text;
+
+alter table public.applicants
+    alter column embedding drop not null,
+    add column if not exists embedding_status text not null default 'ready'
+        check (embedding_status in ('pending', 'ready', 'failed')),
+    add column if not exists embedding_error text;
+
+-- workers re-queue pending rows at startup
+create index if not exists jobs_embedding_pending_idx
+    on public.jobs (id) where embedding_status = 'pending';
+create index if not exists applicants_embedding_pending_idx
+    on public.applicants (id) where embedding_status = 'pending';
+
+-- chunk rows are upserted (a retried embedding rewrites its chunks)
+create policy "applicant_chunks are updatable"
+    on public.applicant_chunks for update using (true);
+
+-- same max-sim search, skipping applicants whose embedding is not ready; drop
+-- the two-argument version in case it is still there, so calls without
+-- `match_count` are not ambiguous
+drop function if exists public.search_applicants_for_job(uuid, vector);
+
+create or replace function public.search_applicants_for_job(
+    job_id_param uuid,
+    query_embedding vector(1536),
+    match_count integer default 10
+)
+returns table (
+    id uuid,
+    name text,
+    email text,
+    resume_text text,
+    skills text,
+    experience text,
+    similarity_score double precision
+)
+language sql
+stable
+as $$
+    select
+        a.id,
+        a.name,
+        a.email,
+        a.resume_text,
+        a.skills,
+        a.experience,
+        coalesce(
+            (
+                select max(1 - (c.embedding <=> query_embedding))
+                from public.applicant_chunks c
+                where c.applicant_id = a.id
+            ),
+            1 - (a.embedding <=> query_embedding)
+        ) as similarity_score
+    from public.applications ap
+    join public.applicants a on a.id = ap.applicant_id
+    where ap.job_id = job_id_param
+      and a.embedding_status = 'ready'
+      and a.embedding is not null
+    order by similarity_score desc
+    limit match_count;
+$$;
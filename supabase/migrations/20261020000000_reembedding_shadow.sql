@@ -0,0 +1,178 @@
+-- Shadow vectors for re-embedding with a new model (python -m vembedding.reembed).
+--
+-- The tool writes new vectors to `embedding_next` and new chunk vectors to
+-- `applicant_chunks_next`; searches keep using the current ones until
+-- `cutover_embeddings()` swaps both in one transaction and moves the vector
+-- indexes onto the new ones. The replaced vectors stay in
+-- `embedding_previous` / `applicant_chunks_previous` until the next cutover,
+-- for rollback.
+--
+-- For a dimension change, replace vector(1536) below (and in
+-- search_applicants_for_job) with the new size before applying.
+
+alter table public.jobs add column if not exists embedding_next vector(1536);
+alter table public.applicants add column if not exists embedding_next vector(1536);
+
+create table if not exists public.applicant_chunks_next (
+    applicant_id uuid not null references public.applicants (id) on delete cascade,
+    chunk_index integer not null,
+    content text not null,
+    embedding vector(1536) not null,
+    created_at timestamptz not null default now(),
+    primary key (applicant_id, chunk_index)
+);
+
+alter table public.applicant_chunks_next enable row level security;
+
+create policy "applicant_chunks_next are readable"
+    on public.applicant_chunks_next for select using (true);
+
+create policy "applicant_chunks_next are insertable"
+    on public.applicant_chunks_next for insert with check (true);
+
+create policy "applicant_chunks_next are updatable"
+    on public.applicant_chunks_next for update using (true);
+
+-- Indexes follow a renamed column or table, so after the swap the vector
+-- (ANN) indexes sit on the replaced vectors. This moves every single-column
+-- index of `source_table.source_column` to `target_table.target_column`,
+-- same name, access method, operator class and options, unless the target
+-- already has one with that access method.
+create or replace function public.move_embedding_indexes(
+    source_table regclass,
+    source_column text,
+    target_table regclass,
+    target_column text
+)
+returns void
+language plpgsql
+as $$
+declare
+    index_row record;
+begin
+    for index_row in
+        select
+            index_class.oid::regclass as index_name,
+            index_class.relname,
+            access_method.amname,
+            operator_class.opcname,
+            index_class.reloptions
+        from pg_index i
+        join pg_class index_class on index_class.oid = i.indexrelid
+        join pg_am access_method on access_method.oid = index_class.relam
+        join pg_opclass operator_class on operator_class.oid = i.indclass[0]
+        join pg_attribute a on a.attrelid = i.indrelid and a.attnum = i.indkey[0]
+        where i.indrelid = source_table
+          and i.indnatts = 1
+          and not i.indisprimary
+          and a.attname = source_column
+    loop
+        execute format('drop index %s', index_row.index_name);
+        if not exists (
+            select 1
+            from pg_index i
+            join pg_class index_class on index_class.oid = i.indexrelid
+            join pg_am access_method on access_method.oid = index_class.relam
+            join pg_attribute a on a.attrelid = i.indrelid and a.attnum = i.indkey[0]
+            where i.indrelid = target_table
+              and i.indnatts = 1
+              and a.attname = target_column
+              and access_method.amname = index_row.amname
+        ) then
+            execute format(
+                'create index %I on %s using %I (%I %I)%s',
+                index_row.relname,
+                target_table,
+                index_row.amname,
+                target_column,
+                index_row.opcname,
+                case
+                    when index_row.reloptions is null then ''
+                    else format(' with (%s)', array_to_string(index_row.reloptions, ', '))
+                end
+            );
+        end if;
+    end loop;
+end;
+$$;
+
+create or replace function public.cutover_embeddings()
+returns void
+language plpgsql
+as $$
+declare
+    missing_jobs bigint;
+    missing_applicants bigint;
+begin
+    -- no writes (and no worker embeddings) between the check and the swap
+    lock table public.jobs, public.applicants, public.applicant_chunks,
+        public.applicant_chunks_next in access exclusive mode;
+
+    select count(*) into missing_jobs from public.jobs
+        where embedding is not null and embedding_next is null;
+    select count(*) into missing_applicants from public.applicants
+        where embedding is not null and embedding_next is null;
+    if missing_jobs > 0 or missing_applicants > 0 then
+        raise exception 'Re-embedding incomplete: % jobs and % applicants have no embedding_next',
+            missing_jobs, missing_applicants
+            using errcode = 'P0001';
+    end if;
+
+    alter table public.jobs drop column if exists embedding_previous;
+    alter table public.jobs rename column embedding to embedding_previous;
+    alter table public.jobs rename column embedding_next to embedding;
+    execute format(
+        'alter table public.jobs add column embedding_next %s',
+        format_type(
+            (select atttypid from pg_attribute
+             where attrelid = 'public.jobs'::regclass and attname = 'embedding'),
+            (select atttypmod from pg_attribute
+             where attrelid = 'public.jobs'::regclass and attname = 'embedding')
+        )
+    );
+
+    alter table public.applicants drop column if exists embedding_previous;
+    alter table public.applicants rename column embedding to embedding_previous;
+    alter table public.applicants rename column embedding_next to embedding;
+    execute format(
+        'alter table public.applicants add column embedding_next %s',
+        format_type(
+            (select atttypid from pg_attribute
+             where attrelid = 'public.applicants'::regclass and attname = 'embedding'),
+            (select atttypmod from pg_attribute
+             where attrelid = 'public.applicants'::regclass and attname = 'embedding')
+        )
+    );
+
+    drop table if exists public.applicant_chunks_previous;
+    alter table public.applicant_chunks rename to applicant_chunks_previous;
+    alter table public.applicant_chunks_next rename to applicant_chunks;
+    -- rebuilt on the new vectors, under the lock (searches wait for them);
+    -- before the new shadow table copies the chunk indexes
+    perform public.move_embedding_indexes(
+        'public.jobs', 'embedding_previous', 'public.jobs', 'embedding'
+    );
+    perform public.move_embedding_indexes(
+        'public.applicants', 'embedding_previous', 'public.applicants', 'embedding'
+    );
+    perform public.move_embedding_indexes(
+        'public.applicant_chunks_previous', 'embedding',
+        'public.applicant_chunks', 'embedding'
+    );
+
+    create table public.applicant_chunks_next
+        (like public.applicant_chunks including all);
+    alter table public.applicant_chunks_next
+        add foreign key (applicant_id) references public.applicants (id) on delete cascade;
+    alter table public.applicant_chunks_next enable row level security;
+    create policy "applicant_chunks_next are readable"
+        on public.applicant_chunks_next for select using (true);
+    create policy "applicant_chunks_next are insertable"
+        on public.applicant_chunks_next for insert with check (true);
+    create policy "applicant_chunks_next are updatable"
+        on public.applicant_chunks_next for update using (true);
+
+    -- PostgREST caches the schema
+    notify pgrst, 'reload schema';
+end;
+$$;
@@ -0,0 +1,116 @@
+-- Hybrid lexical + vector search.
+--
+-- `search_document` is a generated tsvector over skills, experience and
+-- resume text, so Postgres keeps it current on every insert and update. Its
+-- GIN index serves the must-have pre-filter (only applicants containing
+-- every must-have term are vector scored) and the lexical score.
+--
+-- The 'simple' configuration (no stemming, no stop words) matches terms
+-- like skill names literally, as the local backend's BM25 index does.
+
+alter table public.applicants
+    add column if not exists search_document tsvector
+        generated always as (
+            to_tsvector(
+                'simple',
+                coalesce(skills, '') || ' ' || coalesce(experience, '') || ' '
+                    || coalesce(resume_text, '')
+            )
+        ) stored;
+
+create index if not exists applicants_search_document_idx
+    on public.applicants using gin (search_document);
+
+-- fusion: null ranks by similarity alone, 'rrf' by reciprocal rank fusion
+-- (k = 60) of the vector and lexical rankings, 'weighted' by
+-- (1 - lexical_weight) * similarity + lexical_weight * max-normalized rank
+create or replace function public.search_applicants_hybrid(
+    job_id_param uuid,
+    query_embedding vector(1536),
+    query_text text default '',
+    must_have text[] default '{}',
+    fusion text default null,
+    lexical_weight double precision default 0.3,
+    match_count integer default 10
+)
+returns table (
+    id uuid,
+    name text,
+    email text,
+    resume_text text,
+    skills text,
+    experience text,
+    similarity_score double precision,
+    lexical_score double precision,
+    hybrid_score double precision
+)
+language sql
+stable
+as $$
+    with lexical_query as (
+        -- any query word counts (plainto_tsquery would require all of them)
+        select coalesce(
+            (
+                select string_agg(quote_literal(word), ' | ')::tsquery
+                from unnest(tsvector_to_array(to_tsvector('simple', query_text))) word
+            ),
+            ''::tsquery
+        ) as query
+    ),
+    filtered as (
+        select a.*
+        from public.applications ap
+        join public.applicants a on a.id = ap.applicant_id
+        where ap.job_id = job_id_param
+          and a.embedding_status = 'ready'
+          and a.embedding is not null
+          and not exists (
+              select 1
+              from unnest(coalesce(must_have, '{}')) term
+              where numnode(plainto_tsquery('simple', term)) > 0
+                and not a.search_document @@ plainto_tsquery('simple', term)
+          )
+    ),
+    scored as (
+        select
+            f.id,
+            f.name,
+            f.email,
+            f.resume_text,
+            f.skills,
+            f.experience,
+            coalesce(
+                (
+                    select max(1 - (c.embedding <=> query_embedding))
+                    from public.applicant_chunks c
+                    where c.applicant_id = f.id
+                ),
+                1 - (f.embedding <=> query_embedding)
+            ) as similarity_score,
+            ts_rank(f.search_document, q.query)::double precision as lexical_score
+        from filtered f
+        cross join lexical_query q
+    ),
+    fused as (
+        select
+            s.*,
+            case fusion
+                when 'rrf' then
+                    1.0 / (60 + rank() over (order by s.similarity_score desc))
+                    + case when s.lexical_score > 0
+                        then 1.0 / (60 + rank() over (order by s.lexical_score desc))
+                        else 0 end
+                when 'weighted' then
+                    (1 - lexical_weight) * s.similarity_score
+                    + lexical_weight * coalesce(
+                        s.lexical_score / nullif(max(s.lexical_score) over (), 0), 0
+                    )
+                else s.similarity_score
+            end::double precision as hybrid_score
+        from scored s
+    )
+    select *
+    from fused
+    order by hybrid_score desc
+    limit match_count;
+$$;
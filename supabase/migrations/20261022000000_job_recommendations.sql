@@ -0,0 +1,150 @@
+-- Recommended applicants per job: the top-K applicants by similarity of the
+-- job's and the applicant's embeddings, materialized so reads are a plain
+-- indexed lookup (GET /api/jobs/{id}/recommended-applicants).
+--
+-- Maintained incrementally by the application:
+--   build_job_recommendations      once a job is embedded
+--   add_applicant_recommendations  once a batch of applicants is embedded
+--   applied = true                 when an application is created
+--
+-- Jobs have no closed state, so every embedded job is open.
+
+create table if not exists public.job_recommendations (
+    job_id uuid not null references public.jobs (id) on delete cascade,
+    applicant_id uuid not null references public.applicants (id) on delete cascade,
+    score double precision not null,
+    applied boolean not null default false,
+    primary key (job_id, applicant_id)
+);
+
+create index if not exists job_recommendations_job_score_idx
+    on public.job_recommendations (job_id, score desc);
+
+alter table public.job_recommendations enable row level security;
+
+create policy "job_recommendations are readable"
+    on public.job_recommendations for select using (true);
+
+create policy "job_recommendations are insertable"
+    on public.job_recommendations for insert with check (true);
+
+create policy "job_recommendations are updatable"
+    on public.job_recommendations for update using (true);
+
+create policy "job_recommendations are deletable"
+    on public.job_recommendations for delete using (true);
+
+-- (re)build one job's list: a nearest-neighbour query over the applicants
+create or replace function public.build_job_recommendations(
+    job_id_param uuid,
+    match_count integer default 50
+)
+returns setof public.job_recommendations
+language plpgsql
+as $$
+declare
+    job_embedding vector(1536);
+begin
+    delete from public.job_recommendations where job_id = job_id_param;
+
+    select j.embedding into job_embedding
+    from public.jobs j
+    where j.id = job_id_param and j.embedding_status = 'ready';
+    if job_embedding is null then
+        return;
+    end if;
+
+    return query
+    insert into public.job_recommendations (job_id, applicant_id, score, applied)
+    select
+        job_id_param,
+        a.id,
+        1 - (a.embedding <=> job_embedding),
+        exists (
+            select 1 from public.applications ap
+            where ap.job_id = job_id_param and ap.applicant_id = a.id
+        )
+    from public.applicants a
+    where a.embedding_status = 'ready' and a.embedding is not null
+    order by a.embedding <=> job_embedding
+    limit match_count
+    returning *;
+end;
+$$;
+
+-- merge newly embedded applicants into every list they rank in: rescore the
+-- pairs already listed (a re-embedded applicant can score lower), then one
+-- pass scoring the batch against all embedded jobs, writing only the new
+-- pairs that beat the job's K-th score, then trimming the lists touched
+create or replace function public.add_applicant_recommendations(
+    applicant_ids uuid[],
+    match_count integer default 50
+)
+returns setof public.job_recommendations
+language plpgsql
+as $$
+begin
+    return query
+    update public.job_recommendations r
+    set score = 1 - (a.embedding <=> j.embedding)
+    from public.applicants a, public.jobs j
+    where r.applicant_id = a.id
+      and r.job_id = j.id
+      and a.id = any(applicant_ids)
+      and a.embedding_status = 'ready' and a.embedding is not null
+      and j.embedding_status = 'ready' and j.embedding is not null
+    returning r.*;
+
+    return query
+    insert into public.job_recommendations (job_id, applicant_id, score, applied)
+    select
+        j.id,
+        a.id,
+        s.score,
+        exists (
+            select 1 from public.applications ap
+            where ap.job_id = j.id and ap.applicant_id = a.id
+        )
+    from public.applicants a
+    cross join public.jobs j
+    cross join lateral (select 1 - (a.embedding <=> j.embedding) as score) s
+    where a.id = any(applicant_ids)
+      and a.embedding_status = 'ready' and a.embedding is not null
+      and j.embedding_status = 'ready' and j.embedding is not null
+      and not exists (
+          select 1 from public.job_recommendations r
+          where r.job_id = j.id and r.applicant_id = a.id
+      )
+      and s.score > coalesce(
+          (
+              select r.score
+              from public.job_recommendations r
+              where r.job_id = j.id
+              order by r.score desc
+              offset match_count - 1
+              limit 1
+          ),
+          '-infinity'::double precision
+      )
+    on conflict (job_id, applicant_id) do update set score = excluded.score
+    returning *;
+
+    delete from public.job_recommendations r
+    using (
+        select
+            job_id,
+            applicant_id,
+            row_number() over (
+                partition by job_id order by score desc, applicant_id
+            ) as position
+        from public.job_recommendations
+        where job_id in (
+            select job_id from public.job_recommendations
+            where applicant_id = any(applicant_ids)
+        )
+    ) ranked
+    where r.job_id = ranked.job_id
+      and r.applicant_id = ranked.applicant_id
+      and ranked.position > match_count;
+end;
+$$;
@@ -0,0 +1,69 @@
+-- Reverse matching: the jobs that fit an applicant, from the stored job and
+-- applicant embeddings.
+--
+-- `search_jobs_for_applicant` ranks one applicant live; the nightly batch
+-- (python -m vembedding.match_jobs) stores the top k of every applicant in
+-- `applicant_job_matches`, one upsert per page of applicants. Rows of an
+-- applicant older than its latest run's `computed_at` are deleted by the run.
+
+create table if not exists public.applicant_job_matches (
+    applicant_id uuid not null references public.applicants (id) on delete cascade,
+    job_id uuid not null references public.jobs (id) on delete cascade,
+    score double precision not null,
+    rank integer not null,
+    computed_at timestamptz not null,
+    primary key (applicant_id, job_id)
+);
+
+create index if not exists applicant_job_matches_applicant_rank_idx
+    on public.applicant_job_matches (applicant_id, rank);
+
+alter table public.applicant_job_matches enable row level security;
+
+create policy "applicant_job_matches are readable"
+    on public.applicant_job_matches for select using (true);
+
+create policy "applicant_job_matches are insertable"
+    on public.applicant_job_matches for insert with check (true);
+
+create policy "applicant_job_matches are updatable"
+    on public.applicant_job_matches for update using (true);
+
+create policy "applicant_job_matches are deletable"
+    on public.applicant_job_matches for delete using (true);
+
+create or replace function public.search_jobs_for_applicant(
+    applicant_id_param uuid,
+    match_count integer default 10
+)
+returns table (
+    id uuid,
+    title text,
+    author text,
+    similarity_score double precision
+)
+language plpgsql
+stable
+as $$
+declare
+    applicant_embedding vector(1536);
+begin
+    select a.embedding into applicant_embedding
+    from public.applicants a
+    where a.id = applicant_id_param and a.embedding_status = 'ready';
+    if applicant_embedding is null then
+        return;
+    end if;
+
+    return query
+    select
+        j.id,
+        j.title,
+        j.author,
+        1 - (j.embedding <=> applicant_embedding)
+    from public.jobs j
+    where j.embedding_status = 'ready' and j.embedding is not null
+    order by j.embedding <=> applicant_embedding
+    limit match_count;
+end;
+$$;
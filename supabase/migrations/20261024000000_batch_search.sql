@@ -0,0 +1,39 @@
+-- Batch search: several query embeddings against one job in a single call
+-- (POST /api/jobs/{id}/search-applicants/batch). Each query is ranked by
+-- `search_applicants_for_job`; rows carry the 0-based index of their query.
+--
+-- The embeddings are passed as a JSON array of arrays.
+
+create or replace function public.search_applicants_for_job_batch(
+    job_id_param uuid,
+    query_embeddings jsonb,
+    match_count integer default 10
+)
+returns table (
+    query_index integer,
+    id uuid,
+    name text,
+    email text,
+    resume_text text,
+    skills text,
+    experience text,
+    similarity_score double precision
+)
+language sql
+stable
+as $$
+    select
+        (q.position - 1)::integer,
+        r.id,
+        r.name,
+        r.email,
+        r.resume_text,
+        r.skills,
+        r.experience,
+        r.similarity_score
+    from jsonb_array_elements(query_embeddings) with ordinality as q(embedding, position)
+    cross join lateral public.search_applicants_for_job(
+        job_id_param, (q.embedding::text)::vector(1536), match_count
+    ) r
+    order by q.position, r.similarity_score desc;
+$$;
@@ -0,0 +1,53 @@
+-- Version of a job's applicant set, for the local search backend
+-- (SEARCH_BACKEND=local): how many applicants are linked to the job and the
+-- latest change to them, their chunks or their links. A worker compares it
+-- with the version its in-memory (or saved) index was built from and
+-- rebuilds the index when another worker, or a write made while it was
+-- down, changed the job.
+
+-- keep `updated_at` current on every update, whoever makes it
+create or replace function public.touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists applicants_touch_updated_at on public.applicants;
+create trigger applicants_touch_updated_at
+    before update on public.applicants
+    for each row execute function public.touch_updated_at();
+
+drop trigger if exists applications_touch_updated_at on public.applications;
+create trigger applications_touch_updated_at
+    before update on public.applications
+    for each row execute function public.touch_updated_at();
+
+create or replace function public.job_applicants_version(job_id_param uuid)
+returns table (
+    applicant_count bigint,
+    last_change timestamptz
+)
+language sql
+stable
+as $$
+    select
+        count(*),
+        greatest(
+            max(ap.updated_at),
+            max(a.updated_at),
+            max(
+                (
+                    select max(c.created_at)
+                    from public.applicant_chunks c
+                    where c.applicant_id = a.id
+                )
+            )
+        )
+    from public.applications ap
+    join public.applicants a on a.id = ap.applicant_id
+    where ap.job_id = job_id_param;
+$$;
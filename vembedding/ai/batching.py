@@ -0,0 +1,151 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Set
+
+from vembedding.metrics import counter, histogram
+
+EmbedMany = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+BATCH_SIZE = histogram(
+    "embedding_batch_size",
+    "Number of texts sent per embedding API call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+BATCH_WAIT = histogram(
+    "embedding_batch_wait_seconds",
+    "Time a text waited in the coalescer before its batch was sent",
+)
+BATCH_FLUSHES = counter(
+    "embedding_batch_flushes_total",
+    "Embedding batches sent, by the condition that triggered the send",
+    labelnames=("reason",),
+)
+BATCH_SPLITS = counter(
+    "embedding_batch_splits_total",
+    "Embedding batches rejected as a bad request and re-sent one text per call",
+)
+
+
+@dataclass
+class _PendingText:
+    text: str
+    tokens: int
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce concurrent single-text embedding requests into list-input calls.
+
+    A batch is sent when the wait window elapses, when it reaches
+    `max_batch_size` texts, or when adding a text would exceed
+    `max_batch_tokens`. Each caller gets back its own vector.
+    """
+
+    def __init__(
+        self,
+        embed_many: EmbedMany,
+        count_tokens: Callable[[str], int],
+        window_ms: float,
+        max_batch_size: int,
+        max_batch_tokens: int,
+    ):
+        self._embed_many = embed_many
+        self._count_tokens = count_tokens
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+
+        self._pending: List[_PendingText] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """texts queued for the next batch"""
+        return len(self._pending)
+
+    async def embed(self, text: str, tokens: Optional[int] = None) -> List[float]:
+        """Queue a text for the next batch and wait for its vector"""
+        loop = asyncio.get_running_loop()
+        # callers that already counted the text's tokens pass them along
+        if tokens is None:
+            tokens = self._count_tokens(text)
+
+        if self._pending and self._pending_tokens + tokens > self.max_batch_tokens:
+            self._flush("tokens")
+
+        future = loop.create_future()
+        self._pending.append(_PendingText(text, tokens, future, time.perf_counter()))
+        self._pending_tokens += tokens
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush("size")
+        elif self.window_ms <= 0:
+            self._flush("window")
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush, "window")
+
+        return await future
+
+    def _flush(self, reason: str) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        self._pending_tokens = 0
+        if not batch:
+            return
+
+        BATCH_FLUSHES.inc(reason=reason)
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch: List[_PendingText]) -> None:
+        sent_at = time.perf_counter()
+        BATCH_SIZE.observe(len(batch))
+        for item in batch:
+            BATCH_WAIT.observe(sent_at - item.enqueued_at)
+
+        try:
+            vectors = await self._embed_many([item.text for item in batch])
+            if len(vectors) != len(batch):
+                raise ValueError(
+                    f"Embedding batch returned {len(vectors)} vectors "
+                    f"for {len(batch)} inputs"
+                )
+        except Exception as e:
+            if len(batch) > 1 and _is_bad_request(e):
+                # one bad input rejects the whole list, find it: only its
+                # caller should get the error
+                BATCH_SPLITS.inc()
+                await asyncio.gather(*(self._send_one(item) for item in batch))
+                return
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, vector in zip(batch, vectors):
+            if not item.future.done():
+                item.future.set_result(vector)
+
+    async def _send_one(self, item: _PendingText) -> None:
+        try:
+            [vector] = await self._embed_many([item.text])
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        if not item.future.done():
+            item.future.set_result(vector)
+
+
+def _is_bad_request(error: BaseException) -> bool:
+    """the API rejected the input itself (HTTP 400), retrying it cannot help"""
+    return getattr(error, "status_code", None) == 400
@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from vembedding.metrics import counter
+
+CACHE_HITS = counter(
+    "embedding_cache_hits_total",
+    "Embedding cache hits, by tier",
+    labelnames=("tier",),
+)
+CACHE_MISSES = counter("embedding_cache_misses_total", "Embedding cache misses")
+CACHE_EVICTIONS = counter(
+    "embedding_cache_evictions_total",
+    "Entries evicted from the embedding cache, by tier",
+    labelnames=("tier",),
+)
+
+# the disk tier is trimmed this far below its cap, so it is not trimmed on
+# every write once full
+DISK_EVICTION_SLACK = 0.1
+
+
+def normalize_text(text: str) -> str:
+    """normalize text before embedding so equivalent inputs share a cache entry"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache.
+
+    Keys are `sha256(model + normalized text)`. Lookups go through a bounded
+    in-memory LRU of packed float32 vectors first (about 6 KB per 1536-dim
+    vector, not 49 KB as a list of floats), then an optional SQLite file that
+    survives restarts, read in a thread.
+    The file holds only the keys and the vectors (packed float32), never the
+    text, and at most `max_disk_entries` of them (least recently used go
+    first). Writes are queued and committed in batches by a background
+    thread every `flush_seconds`, off the event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        path: Optional[str] = None,
+        max_disk_entries: int = 0,
+        flush_seconds: float = 1.0,
+    ):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.flush_seconds = flush_seconds
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # the lookup connection is used by one thread at a time
+        self._read_lock = threading.Lock()
+        # written by the next flush: new vectors, and disk hits to mark used
+        self._writes: Dict[str, Tuple[str, bytes]] = {}
+        self._touched: Dict[str, float] = {}
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = self._connect()
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, "
+                "used_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {
+                row[1] for row in self._db.execute("PRAGMA table_info(embeddings)")
+            }
+            if "used_at" not in columns:
+                # files written before the disk tier was bounded
+                self._db.execute(
+                    "ALTER TABLE embeddings ADD COLUMN used_at REAL NOT NULL DEFAULT 0"
+                )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings (used_at)"
+            )
+            self._db.commit()
+            self._writer = threading.Thread(
+                target=self._write_loop, name="embedding-cache-writer", daemon=True
+            )
+            self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(normalize_text(text).encode("utf-8"))
+        return digest.hexdigest()
+
+    async def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self.make_key(model, text)
+
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                CACHE_HITS.inc(tier="memory")
+                return array("f", blob).tolist()
+            if self._db is not None:
+                queued = self._writes.get(key)
+                blob = queued[1] if queued is not None else None
+
+        if blob is None and self._db is not None:
+            blob = await asyncio.to_thread(self._read, key)
+        if blob is None:
+            CACHE_MISSES.inc()
+            return None
+
+        with self._lock:
+            self._remember(key, blob)
+            self._touched[key] = time.time()
+        CACHE_HITS.inc(tier="disk")
+        return array("f", blob).tolist()
+
+    def _read(self, key: str) -> Optional[bytes]:
+        with self._read_lock:
+            row = self._db.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        key = self.make_key(model, text)
+        blob = array("f", vector).tobytes()
+
+        with self._lock:
+            self._remember(key, blob)
+            if self._db is not None and not self._closed:
+                self._writes[key] = (model, blob)
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            CACHE_EVICTIONS.inc(tier="memory")
+
+    def _write_loop(self) -> None:
+        # its own connection: WAL lets lookups read while a batch commits
+        db = self._connect()
+        try:
+            while True:
+                self._wake.wait(self.flush_seconds)
+                self._wake.clear()
+                try:
+                    self._flush(db)
+                except sqlite3.Error as e:
+                    logging.warning(f"Embedding cache write failed: {e}")
+                if self._closed:
+                    return
+        finally:
+            db.close()
+
+    def _flush(self, db: sqlite3.Connection) -> None:
+        """commit the queued writes in one transaction, then trim to the cap"""
+        with self._lock:
+            writes, self._writes = self._writes, {}
+            touched, self._touched = self._touched, {}
+        if not writes and not touched:
+            return
+
+        now = time.time()
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, used_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, model, blob, now) for key, (model, blob) in writes.items()],
+            )
+            db.executemany(
+                "UPDATE embeddings SET used_at = ? WHERE key = ?",
+                [(used_at, key) for key, used_at in touched.items()],
+            )
+            if writes and self.max_disk_entries > 0:
+                count = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                if count > self.max_disk_entries:
+                    keep = int(self.max_disk_entries * (1 - DISK_EVICTION_SLACK))
+                    db.execute(
+                        "DELETE FROM embeddings WHERE key IN ("
+                        "SELECT key FROM embeddings ORDER BY used_at LIMIT ?)",
+                        (count - keep,),
+                    )
+                    CACHE_EVICTIONS.inc(count - keep, tier="disk")
+
+    def close(self) -> None:
+        """write back the queued vectors and stop the writer thread"""
+        if self._writer is None or self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+
+    def __len__(self) -> int:
+        """entries in the memory tier"""
+        return len(self._memory)
+
+    def stats(self) -> dict:
+        disk_entries = None
+        if self._db is not None:
+            with self._read_lock:
+                disk_entries = self._db.execute(
+                    "SELECT COUNT(*) FROM embeddings"
+                ).fetchone()[0]
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "max_memory_entries": self.max_entries,
+                "disk_entries": disk_entries,
+                "max_disk_entries": self.max_disk_entries or None,
+                "pending_writes": len(self._writes),
+            }
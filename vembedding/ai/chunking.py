@@ -0,0 +1,49 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from vembedding.ai.embedding import compact_embedding, encoding
+
+
+def token_windows(length: int, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    [start, end) bounds of windows of `size` tokens, each sharing `overlap`
+    tokens with the previous one; the last window ends at `length`
+    """
+    if size <= 0:
+        raise ValueError("size must be positive")
+    step = size - min(max(overlap, 0), size - 1)
+    windows = []
+    start = 0
+    while True:
+        end = min(start + size, length)
+        windows.append((start, end))
+        if end >= length:
+            return windows
+        start += step
+
+
+def chunk_text(text: str, size: int, overlap: int) -> List[str]:
+    """
+    Split text into overlapping windows of `size` cl100k tokens.
+
+    The text is encoded once and every window decoded from its slice, so the
+    work is linear in the text length (times size / (size - overlap)).
+    """
+    tokenizer = encoding()
+    tokens = tokenizer.encode(text, disallowed_special=())
+    if len(tokens) <= size:
+        return [text]
+    return [
+        tokenizer.decode(tokens[start:end])
+        for start, end in token_windows(len(tokens), size, overlap)
+    ]
+
+
+def mean_embedding(vectors: Sequence[Sequence[float]]) -> List[float]:
+    """unit-length mean of the chunk vectors, the applicant's single vector"""
+    mean = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+    norm = float(np.linalg.norm(mean))
+    if norm:
+        mean /= norm
+    return compact_embedding(mean.tolist())
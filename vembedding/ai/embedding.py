@@ -1,44 +1,222 @@
-from typing import List
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Iterable, List, Tuple
+import numpy as np
 from fastapi import HTTPException, status
-from openai import AsyncOpenAI
-from tiktoken import get_encoding
 
 from vembedding.config import settings
 from vembedding.constant import EmbeddingModelsConst
+from vembedding.ai.batching import EmbeddingBatcher
+from vembedding.ai.cache import EmbeddingCache, normalize_text
+from vembedding.metrics import gauge
+from vembedding.providers.clients import record_usage, register_openai_client
+from vembedding.providers.registry import providers
+from vembedding.providers.resilience import build_call_layer
+from vembedding.timing import stage
+
+if TYPE_CHECKING:
+    from tiktoken import Encoding
 
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 EMBEDDING_MODEL = EmbeddingModelsConst.OPENAI_EMBEDDING_MODEL
-ENCODING = get_encoding("cl100k_base")
+ENCODING_NAME = "cl100k_base"
 MAX_TOKEN_LENGTH = 8000
 MIN_TOKEN_LENGTH = 10
+EMBEDDING_DIMENSIONS = settings.EMBEDDING_DIMENSIONS or None
+
+
+def _load_encoding() -> "Encoding":
+    # reads (or downloads) the BPE file, the slowest part of startup
+    from tiktoken import get_encoding
+
+    return get_encoding(ENCODING_NAME)
+
+
+# built on first use, see `providers`
+EMBEDDING_CLIENT = register_openai_client(settings.EMBEDDING_PROVIDER)
+ENCODING = providers.register("encoding", _load_encoding)
+# deadline, retries, hedging and circuit breaker of the embedding calls
+embedding_calls = build_call_layer(
+    "embeddings",
+    deadline=settings.OPENAI_EMBEDDING_DEADLINE_SECONDS,
+    attempt_timeout=settings.OPENAI_EMBEDDING_ATTEMPT_TIMEOUT_SECONDS,
+    hedge_percentile=settings.OPENAI_EMBEDDING_HEDGE_PERCENTILE,
+)
+
+
+def encoding() -> "Encoding":
+    """the tokenizer, loaded on first use"""
+    return providers.get(ENCODING)
+
+
+# cached vectors are only valid for the model and size they were made with
+CACHE_MODEL_KEY = (
+    f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}"
+    if EMBEDDING_DIMENSIONS
+    else EMBEDDING_MODEL
+)
+
+
+def compact_embedding(embedding: List[float]) -> List[float]:
+    """
+    round components to EMBEDDING_DECIMALS so their JSON form (inserts, RPC
+    arguments) is a few characters each instead of ~20
+    """
+    if not settings.EMBEDDING_DECIMALS:
+        return embedding
+    return np.round(
+        np.asarray(embedding, dtype=np.float64), settings.EMBEDDING_DECIMALS
+    ).tolist()
+
+
+async def openai_generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """openAI generate embeddings for a list of texts in a single call"""
+    # batches are shared between requests, so keep them out of Server-Timing
+    client = providers.get(EMBEDDING_CLIENT)
+    with stage("embedding_api", server_timing=False):
+        response = await embedding_calls.call(
+            lambda: client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=texts,
+                **(
+                    {"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {}
+                ),
+            )
+        )
+    record_usage(EMBEDDING_MODEL, getattr(response, "usage", None))
+    # the API may return items out of order, so sort by their input index
+    return [
+        compact_embedding(item.embedding)
+        for item in sorted(response.data, key=lambda d: d.index)
+    ]
+
+
+def token_batches(
+    items: Iterable[Tuple[Any, int]], max_size: int, max_tokens: int
+) -> Iterable[list]:
+    """group (item, token count) pairs into batches within the embedding API limits"""
+    batch, batch_tokens = [], 0
+    for item, tokens in items:
+        if batch and (len(batch) >= max_size or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+async def generate_embeddings_in_batches(
+    texts: List[Tuple[Hashable, str, int]],
+) -> Tuple[Dict[Hashable, List[float]], Dict[Hashable, str]]:
+    """
+    embed (key, text, token count) triples in as few calls as the API limits
+    allow; returns the vector of every key and the error of every key whose
+    batch failed
+    """
+    vectors: Dict[Hashable, List[float]] = {}
+    errors: Dict[Hashable, str] = {}
+    for batch in token_batches(
+        (((key, text), tokens) for key, text, tokens in texts),
+        max_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+    ):
+        try:
+            embeddings = await openai_generate_embeddings([text for _, text in batch])
+        except Exception as e:
+            for key, _ in batch:
+                errors[key] = str(e)
+            continue
+        for (key, _), embedding in zip(batch, embeddings):
+            vectors[key] = embedding
+    return vectors, errors
 
 
 async def openai_generate_embedding(text: str) -> List[float]:
-    """openAI generate embedding"""
-    response = await client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=text,
-    )
-    return response.data[0].embedding
+    """
+    openAI generate a search query's embedding (cached, coalesced with
+    concurrent requests); documents go through the uncached batch path
+    """
+    with stage("embedding"):
+        # the cache key is normalized, the text sent to the model is not
+        embedding = await cache.get(CACHE_MODEL_KEY, text)
+        if embedding is not None:
+            # the cache stores float32, round again for a compact payload
+            return compact_embedding(embedding)
+
+        # an over-long text would fail the whole batch it is coalesced into
+        tokens = validate_text_length(text, min_tokens=1)
+        embedding = await batcher.embed(text, tokens)
+        if embedding:
+            cache.put(CACHE_MODEL_KEY, text, embedding)
+        return embedding
+
+
+async def openai_generate_query_embeddings(texts: List[str]) -> List[List[float]]:
+    """openAI generate embeddings for several queries (cached), one call for all"""
+    with stage("embedding"):
+        # normalized only to find duplicates, the first spelling is embedded
+        keys = [normalize_text(text) for text in texts]
+        distinct: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            distinct.setdefault(key, text)
+        embeddings = {}
+        for key, text in distinct.items():
+            embedding = await cache.get(CACHE_MODEL_KEY, text)
+            if embedding is not None:
+                embeddings[key] = compact_embedding(embedding)
+
+        missing = [key for key in distinct if key not in embeddings]
+        if missing:
+            vectors = await openai_generate_embeddings(
+                [distinct[key] for key in missing]
+            )
+            for key, embedding in zip(missing, vectors):
+                if embedding:
+                    cache.put(CACHE_MODEL_KEY, distinct[key], embedding)
+                embeddings[key] = embedding
+        return [embeddings[key] for key in keys]
 
 
 def count_tokens(text: str) -> int:
     """count the number of tokens"""
-    return len(ENCODING.encode(text))
+    with stage("tokenize"):
+        return len(encoding().encode(text))
 
 
-def validate_text_length(text: str) -> int:
+def validate_text_length(
+    text: str, max_tokens: int = MAX_TOKEN_LENGTH, min_tokens: int = MIN_TOKEN_LENGTH
+) -> int:
     """validate the length of the text"""
     token_count = count_tokens(text)
-    if token_count < MIN_TOKEN_LENGTH:
+    if token_count < min_tokens:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Text is too short. Minimum {MIN_TOKEN_LENGTH} tokens required.",
+            detail=f"Text is too short. Minimum {min_tokens} tokens required.",
         )
-    if token_count > MAX_TOKEN_LENGTH:
+    if token_count > max_tokens:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Text is too long. Maximum {MAX_TOKEN_LENGTH} tokens allowed.",
+            detail=f"Text is too long. Maximum {max_tokens} tokens allowed.",
         )
 
     return token_count
+
+
+cache = EmbeddingCache(
+    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    path=settings.EMBEDDING_CACHE_PATH or None,
+    max_disk_entries=settings.EMBEDDING_CACHE_MAX_DISK_ENTRIES,
+    flush_seconds=settings.EMBEDDING_CACHE_FLUSH_SECONDS,
+)
+batcher = EmbeddingBatcher(
+    embed_many=openai_generate_embeddings,
+    count_tokens=count_tokens,
+    window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+    max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+    max_batch_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+)
+
+gauge(
+    "embedding_cache_memory_entries", "Vectors held in the embedding cache memory tier"
+).set_function(lambda: len(cache))
+gauge(
+    "embedding_batch_pending", "Texts waiting in the coalescer for the next batch"
+).set_function(lambda: batcher.pending)
@@ -1,134 +1,142 @@
+import asyncio
 import json
-from typing import Dict, List
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
 from fastapi import HTTPException, status
-from openai import AsyncOpenAI, OpenAIError
 
 from vembedding.config import settings
 from vembedding.constant import LLMModelsConst
+from vembedding.ai.prompts import (
+    SYSTEM_PROMPT,
+    Prompt,
+    build_pool_summary_prompt,
+    build_search_explanation_prompt,
+    pack_candidates,
+)
+from vembedding.ai.stream_json import AnalysisStreamParser, StreamEvent
+from vembedding.providers.clients import (
+    openai_errors,
+    record_usage,
+    register_openai_client,
+)
+from vembedding.providers.registry import providers
+from vembedding.providers.resilience import build_call_layer
+from vembedding.timing import stage
 
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+# built on first use, shared with the embeddings when the provider is the same
+LLM_CLIENT = register_openai_client(settings.LLM_PROVIDER)
+# deadline, retries and circuit breaker of the chat calls (a streamed call is
+# retried until its response starts)
+chat_calls = build_call_layer(
+    "chat",
+    deadline=settings.OPENAI_CHAT_DEADLINE_SECONDS,
+    attempt_timeout=settings.OPENAI_CHAT_ATTEMPT_TIMEOUT_SECONDS,
+)
 LLM_MODEL = LLMModelsConst.OPENAI_LLM_MODEL
+SUMMARY_MAX_TOKENS = 300
 
 
-async def generate_search_explanation(
-    job_info: Dict,
-    candidates: List[Dict],
-    query: str,
-) -> Dict:
-    """
-    Generate an AI-powered analysis report
-    """
+def analysis_max_tokens(candidate_count: int) -> int:
+    """~400 tokens per candidate analysis + 1000 for summary and overhead"""
+    return min(8192, 400 * candidate_count + 1000)
 
-    system_prompt = """
-        You are an expert technical recruiter and talent analyst with 15+ years of experience.
-
-        Your role is to:
-        1. Analyze candidate profiles against job requirements
-        2. Provide objective, evidence-based assessments
-        3. Identify both strengths and potential concerns
-        4. Give actionable hiring recommendations
-
-        Key principles:
-        - Be specific and cite evidence from the candidate's profile
-        - Consider both technical skills and soft skills
-        - Highlight relevant experience, not just keywords
-        - Be honest about gaps or concerns
-        - Use professional, neutral language
-        - Focus on job-relevance
-    """
 
-    user_prompt = f"""
-        # Job Context:
-        - **Job Title:** {job_info['title']}
-        - **Job Description:** {job_info['description']}
-        - **Requirements:** {job_info['requirements']}
+class AnalysisPlan(NamedTuple):
+    # (prompt, max output tokens) per call, one per shard
+    shards: List[Tuple[Prompt, int]]
+    # separate overall summary call, only for sharded analyses
+    summary: Optional[Prompt]
+    omitted: int
+
+    @property
+    def prompt_tokens(self) -> int:
+        tokens = sum(prompt.tokens for prompt, _ in self.shards)
+        if self.summary is not None:
+            tokens += self.summary.tokens
+        return tokens
 
-        ---
-        # Recruiter's Search Query
-        "{query}"
-        ---
+    @property
+    def max_tokens(self) -> int:
+        """the most tokens the plan's calls can consume, prompts and outputs"""
+        tokens = self.prompt_tokens + sum(limit for _, limit in self.shards)
+        if self.summary is not None:
+            tokens += SUMMARY_MAX_TOKENS
+        return tokens
 
-        Task
-        Analyze the following candidates and explain why they match (or don't match) the search criteria and job requirements.
 
-        Candidates to Analyze
+def plan_analysis(job_info: Dict, candidates: List[Dict], query: str) -> AnalysisPlan:
     """
-    for idx, candidate in enumerate(candidates, 1):
-        # Truncate resume at word boundary to avoid cutting mid-word
-        resume_preview = candidate["resume_text"][:800]
-        if len(candidate["resume_text"]) > 800:
-            resume_preview = resume_preview.rsplit(" ", 1)[0] + "..."
-
-        user_prompt += f"""
-        ## Candidate {idx}: {candidate['name']} (ID: {candidate['id']})
-        - **Email:** {candidate['email']}
-        - **Similarity Score:** {candidate['similarity_score']:.3f}
-        - **Skills:** {candidate['skills']}
-        - **Experience:** {candidate['experience']}
-        - **Resume Summary:** {resume_preview}
-        """
-
-    # Specify exact output format
-    user_prompt += """
-        ---
-
-        # Output Format
-        Return a JSON object with this exact structure:
-
-        {
-        "overall_summary": "2-3 sentence summary of the candidate pool quality",
-        "candidates": [
-            {
-            "candidate_id": "Use the exact ID from the candidate input",
-            "candidate_name": "Use the exact name from the candidate input",
-            "similarity_score": 0.XX,
-            "match_quality": "Excellent Match" | "Strong Match" | "Good Match" | "Moderate Match" | "Weak Match",
-            "match_explanation": "2-3 sentences explaining why this candidate matches. Be specific and cite evidence.",
-            "key_strengths": [
-                "Specific strength 1 with evidence",
-                "Specific strength 2 with evidence",
-                "Specific strength 3 with evidence"
-            ],
-            "potential_concerns": [
-                "Specific concern 1 (or empty array if none)",
-                "Specific concern 2 (or empty array if none)"
-            ],
-            "relevant_experience_highlights": [
-                "Relevant experience point 1",
-                "Relevant experience point 2"
-            ],
-            "hiring_recommendation": "Strong recommendation with specific next steps"
-            }
-        ]
-        }
-
-        # Guidelines
-        1. Use the EXACT candidate_id and candidate_name from the input data provided above
-        2. Base analysis ONLY on provided information
-        3. Be specific - cite actual skills and achievements
-        4. Consider similarity score but don't rely on it alone
-        5. Match quality should reflect alignment with BOTH query and job requirements
-        6. Provide actionable recommendations
+    Pack the candidates into the prompt token budget, then split them into
+    shards of LLM_ANALYSIS_SHARD_SIZE; a single shard keeps the one-call
+    prompt with its own overall summary
     """
+    with stage("prompt"):
+        size = max(1, settings.LLM_ANALYSIS_SHARD_SIZE)
+        packed = pack_candidates(
+            job_info,
+            candidates,
+            query,
+            token_budget=settings.LLM_PROMPT_TOKEN_BUDGET,
+            min_resume_tokens=settings.LLM_RESUME_MIN_TOKENS,
+            max_resume_tokens=settings.LLM_RESUME_MAX_TOKENS,
+            shard_size=size,
+        )
+        if len(packed.segments) <= size:
+            prompt = build_search_explanation_prompt(job_info, query, packed.segments)
+            return AnalysisPlan(
+                [(prompt, analysis_max_tokens(len(packed.segments)))],
+                None,
+                packed.omitted,
+            )
+
+        shards = []
+        for i in range(0, len(packed.segments), size):
+            segments = packed.segments[i : i + size]
+            prompt = build_search_explanation_prompt(
+                job_info, query, segments, include_summary=False
+            )
+            shards.append((prompt, analysis_max_tokens(len(segments))))
+        summary = build_pool_summary_prompt(job_info, packed.candidates, query)
+        return AnalysisPlan(shards, summary, packed.omitted)
+
+
+def with_prompt_stats(analysis: Dict, plan: AnalysisPlan) -> Dict:
+    return {
+        **analysis,
+        "prompt_tokens": plan.prompt_tokens,
+        "omitted_candidates": plan.omitted,
+    }
+
+
+def merge_analyses(overall_summary: str, shard_results: List[Dict]) -> Dict:
+    """combine shard analyses (in rank order) into the single-call schema"""
+    merged = []
+    for result in shard_results:
+        merged.extend(result.get("candidates") or [])
+    return {"overall_summary": overall_summary, "candidates": merged}
+
 
+async def _complete_json(user_prompt: str, max_tokens: int) -> Dict:
+    """one JSON-mode chat completion, parsed"""
+
+    client = providers.get(LLM_CLIENT)
     try:
-        # Calculate dynamic max_tokens based on number of candidates
-        # ~400 tokens per candidate analysis + 1000 for summary and overhead
-        dynamic_max_tokens = min(8192, 400 * len(candidates) + 1000)
-
-        # Generate the analysis report
-        response = await client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.3,
-            max_tokens=dynamic_max_tokens,
-            response_format={
-                "type": "json_object",
-            },
-        )
+        # shards run concurrently, the request-level time is the `llm` stage
+        with stage("llm_call", server_timing=False):
+            response = await chat_calls.call(
+                lambda: client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    temperature=0.3,
+                    max_tokens=max_tokens,
+                    response_format={
+                        "type": "json_object",
+                    },
+                )
+            )
+        record_usage(LLM_MODEL, getattr(response, "usage", None))
 
         # Parse the JSON string response into a Python dict
         response_content = response.choices[0].message.content
@@ -140,7 +148,7 @@ async def generate_search_explanation(
                 detail=f"Failed to parse AI response as JSON: {str(e)}",
             )
 
-    except OpenAIError as e:
+    except openai_errors() as e:
         # Handle OpenAI-specific errors (rate limits, API errors, etc.)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -158,3 +166,176 @@ async def generate_search_explanation(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Unexpected error generating search explanation: {str(e)}",
         )
+
+
+async def generate_search_explanation(
+    job_info: Dict,
+    candidates: List[Dict],
+    query: str,
+    charge: Optional[Callable[[int], None]] = None,
+) -> Dict:
+    """
+    Generate an AI-powered analysis report.
+
+    Candidates are packed into prompts of LLM_PROMPT_TOKEN_BUDGET tokens each
+    (see `pack_candidates`). Up to LLM_ANALYSIS_SHARD_SIZE of them are analyzed in
+    one call; larger pools are split into shards analyzed concurrently (at
+    most LLM_ANALYSIS_CONCURRENCY in flight) next to a short summary call, so
+    the wall-clock time is that of the slowest shard and no single completion
+    has to fit every candidate in its output budget.
+
+    The report carries `prompt_tokens` and `omitted_candidates`. `charge`
+    is called with the plan's worst-case token cost before any call is made
+    (and may raise to refuse it).
+    """
+
+    plan = plan_analysis(job_info, candidates, query)
+    if charge is not None:
+        charge(plan.max_tokens)
+    if plan.summary is None:
+        prompt, max_tokens = plan.shards[0]
+        analysis = await _complete_json(prompt.text, max_tokens)
+        return with_prompt_stats(analysis, plan)
+
+    semaphore = asyncio.Semaphore(max(1, settings.LLM_ANALYSIS_CONCURRENCY))
+
+    async def analyze(prompt: Prompt, max_tokens: int) -> Dict:
+        async with semaphore:
+            return await _complete_json(prompt.text, max_tokens)
+
+    tasks = [asyncio.create_task(analyze(plan.summary, SUMMARY_MAX_TOKENS))]
+    for prompt, max_tokens in plan.shards:
+        tasks.append(asyncio.create_task(analyze(prompt, max_tokens)))
+    try:
+        summary, *shard_results = await asyncio.gather(*tasks)
+    finally:
+        # one failed call fails the report, stop the others spending tokens
+        for task in tasks:
+            task.cancel()
+    analysis = merge_analyses(summary.get("overall_summary", ""), shard_results)
+    return with_prompt_stats(analysis, plan)
+
+
+async def _stream_completion(
+    user_prompt: str, max_tokens: int
+) -> AsyncIterator[StreamEvent]:
+    """one streamed JSON-mode completion, parsed incrementally"""
+
+    parser = AnalysisStreamParser()
+    client = providers.get(LLM_CLIENT)
+
+    try:
+        stream = await chat_calls.call(
+            lambda: client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=0.3,
+                max_tokens=max_tokens,
+                response_format={
+                    "type": "json_object",
+                },
+                stream=True,
+                # the last chunk carries the token usage (and no choices)
+                stream_options={"include_usage": True},
+            )
+        )
+        async for chunk in stream:
+            record_usage(LLM_MODEL, getattr(chunk, "usage", None))
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            for event in parser.feed(chunk.choices[0].delta.content):
+                yield event
+
+    except openai_errors() as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"OpenAI API error: {str(e)}",
+        )
+
+    try:
+        yield "analysis", parser.result()
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to parse AI response as JSON: {str(e)}",
+        )
+
+
+async def stream_search_explanation(
+    job_info: Dict,
+    candidates: List[Dict],
+    query: str,
+    charge: Optional[Callable[[int], None]] = None,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Stream the analysis report. Yields ("overall_summary", str) and one
+    ("candidate", dict) per candidate as soon as each is fully parsed, then
+    ("analysis", dict) with the complete report.
+
+    Sharded like `generate_search_explanation`; candidates of different shards
+    arrive interleaved, the final report keeps the rank order.
+    """
+
+    plan = plan_analysis(job_info, candidates, query)
+    if charge is not None:
+        charge(plan.max_tokens)
+    if plan.summary is None:
+        prompt, max_tokens = plan.shards[0]
+        async for event, data in _stream_completion(prompt.text, max_tokens):
+            if event == "analysis":
+                data = with_prompt_stats(data, plan)
+            yield event, data
+        return
+
+    semaphore = asyncio.Semaphore(max(1, settings.LLM_ANALYSIS_CONCURRENCY))
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run_summary() -> None:
+        try:
+            async with semaphore:
+                result = await _complete_json(plan.summary.text, SUMMARY_MAX_TOKENS)
+            await queue.put((None, "overall_summary", result.get("overall_summary")))
+        except Exception as e:
+            await queue.put((None, "error", e))
+        finally:
+            await queue.put((None, "finished", None))
+
+    async def run_shard(index: int, user_prompt: str, max_tokens: int) -> None:
+        try:
+            async with semaphore:
+                async for event, data in _stream_completion(user_prompt, max_tokens):
+                    await queue.put((index, event, data))
+        except Exception as e:
+            await queue.put((index, "error", e))
+        finally:
+            await queue.put((index, "finished", None))
+
+    tasks = [asyncio.create_task(run_summary())]
+    for index, (prompt, max_tokens) in enumerate(plan.shards):
+        tasks.append(asyncio.create_task(run_shard(index, prompt.text, max_tokens)))
+
+    overall_summary = ""
+    shard_results: List[Dict] = [{} for _ in plan.shards]
+    running = len(tasks)
+    try:
+        while running:
+            index, event, data = await queue.get()
+            if event == "finished":
+                running -= 1
+            elif event == "error":
+                raise data
+            elif event == "analysis":
+                shard_results[index] = data
+            else:
+                if event == "overall_summary":
+                    overall_summary = data or ""
+                yield event, data
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    analysis = merge_analyses(overall_summary, shard_results)
+    yield "analysis", with_prompt_stats(analysis, plan)
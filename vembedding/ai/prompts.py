@@ -0,0 +1,300 @@
+"""Prompt templates for the LLM calls"""
+
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+from vembedding.ai.embedding import encoding
+
+SYSTEM_PROMPT = """
+        You are an expert technical recruiter and talent analyst with 15+ years of experience.
+
+        Your role is to:
+        1. Analyze candidate profiles against job requirements
+        2. Provide objective, evidence-based assessments
+        3. Identify both strengths and potential concerns
+        4. Give actionable hiring recommendations
+
+        Key principles:
+        - Be specific and cite evidence from the candidate's profile
+        - Consider both technical skills and soft skills
+        - Highlight relevant experience, not just keywords
+        - Be honest about gaps or concerns
+        - Use professional, neutral language
+        - Focus on job-relevance
+    """
+
+SUMMARY_FIELD = """
+        "overall_summary": "2-3 sentence summary of the candidate pool quality","""
+
+# Specify exact output format
+OUTPUT_FORMAT = (
+    """
+        ---
+
+        # Output Format
+        Return a JSON object with this exact structure:
+
+        {"""
+    + SUMMARY_FIELD
+    + """
+        "candidates": [
+            {
+            "candidate_id": "Use the exact ID from the candidate input",
+            "candidate_name": "Use the exact name from the candidate input",
+            "similarity_score": 0.XX,
+            "match_quality": "Excellent Match" | "Strong Match" | "Good Match" | "Moderate Match" | "Weak Match",
+            "match_explanation": "2-3 sentences explaining why this candidate matches. Be specific and cite evidence.",
+            "key_strengths": [
+                "Specific strength 1 with evidence",
+                "Specific strength 2 with evidence",
+                "Specific strength 3 with evidence"
+            ],
+            "potential_concerns": [
+                "Specific concern 1 (or empty array if none)",
+                "Specific concern 2 (or empty array if none)"
+            ],
+            "relevant_experience_highlights": [
+                "Relevant experience point 1",
+                "Relevant experience point 2"
+            ],
+            "hiring_recommendation": "Strong recommendation with specific next steps"
+            }
+        ]
+        }
+
+        # Guidelines
+        1. Use the EXACT candidate_id and candidate_name from the input data provided above
+        2. Base analysis ONLY on provided information
+        3. Be specific - cite actual skills and achievements
+        4. Consider similarity score but don't rely on it alone
+        5. Match quality should reflect alignment with BOTH query and job requirements
+        6. Provide actionable recommendations
+    """
+)
+
+
+class Prompt(NamedTuple):
+    text: str
+    # the system prompt sent with it included
+    tokens: int
+
+
+class PackedCandidates(NamedTuple):
+    """candidates that fit the prompt budget, in rank order"""
+
+    candidates: List[Dict]
+    # token ids of each candidate's rendered section
+    segments: List[List[int]]
+    omitted: int
+
+
+def _encode(text: str) -> List[int]:
+    return encoding().encode(text, disallowed_special=())
+
+
+@lru_cache(maxsize=1)
+def _system_tokens() -> int:
+    """tokens of SYSTEM_PROMPT, sent ahead of every user prompt"""
+    return len(_encode(SYSTEM_PROMPT))
+
+
+def _job_header(job_info: Dict, query: str) -> str:
+    return f"""
+        # Job Context:
+        - **Job Title:** {job_info['title']}
+        - **Job Description:** {job_info['description']}
+        - **Requirements:** {job_info['requirements']}
+
+        ---
+        # Recruiter's Search Query
+        "{query}"
+        ---
+
+        Task
+        Analyze the following candidates and explain why they match (or don't match) the search criteria and job requirements.
+
+        Candidates to Analyze
+    """
+
+
+def _candidate_section(idx: int, candidate: Dict, resume_preview: str) -> str:
+    return f"""
+        ## Candidate {idx}: {candidate['name']} (ID: {candidate['id']})
+        - **Email:** {candidate['email']}
+        - **Similarity Score:** {candidate['similarity_score']:.3f}
+        - **Skills:** {candidate['skills']}
+        - **Experience:** {candidate['experience']}
+        - **Resume Summary:** {resume_preview}
+        """
+
+
+def _output_format(include_summary: bool) -> str:
+    if include_summary:
+        return OUTPUT_FORMAT
+    return OUTPUT_FORMAT.replace(SUMMARY_FIELD, "", 1)
+
+
+def _resume_preview(tokens: List[int], limit: int) -> str:
+    """the first `limit` tokens of a resume"""
+    if len(tokens) <= limit:
+        return encoding().decode(tokens)
+    # Truncate resume at word boundary to avoid cutting mid-word
+    return encoding().decode(tokens[:limit]).rsplit(" ", 1)[0] + "..."
+
+
+def _allocate(
+    weights: List[float], floors: List[int], caps: List[int], pool: int
+) -> List[int]:
+    """
+    split `pool` extra tokens between resumes in proportion to `weights`, on
+    top of `floors` and never past `caps`; what a capped resume cannot use is
+    handed to the others
+    """
+    allocation = list(floors)
+    active = [i for i in range(len(allocation)) if allocation[i] < caps[i]]
+    while pool > 0 and active:
+        total = sum(weights[i] for i in active)
+        spent = 0
+        for i in active:
+            share = int(pool * weights[i] / total) if total else pool // len(active)
+            grant = min(max(share, 1), caps[i] - allocation[i], pool - spent)
+            allocation[i] += grant
+            spent += grant
+        if not spent:
+            break
+        pool -= spent
+        active = [i for i in active if allocation[i] < caps[i]]
+    return allocation
+
+
+def rank_score(candidate: Dict) -> float:
+    """the score a candidate is ranked by (hybrid searches: the fused score)"""
+    return candidate.get("hybrid_score", candidate.get("similarity_score")) or 0.0
+
+
+def pack_candidates(
+    job_info: Dict,
+    candidates: List[Dict],
+    query: str,
+    token_budget: int,
+    min_resume_tokens: int,
+    max_resume_tokens: int,
+    shard_size: Optional[int] = None,
+) -> PackedCandidates:
+    """
+    Fit the candidates into prompts of at most `token_budget` tokens each
+    (system prompt, job context and output format included). Candidates are
+    split, in rank order, into prompts of `shard_size` (all in one prompt by
+    default), each repeating the job context and output format.
+
+    Candidates are admitted best score first with at least `min_resume_tokens`
+    of resume each until their prompt's budget runs out; the tail is dropped.
+    Tokens left over in a prompt are spread across its resumes in proportion
+    to their score, up to `max_resume_tokens` each.
+    """
+
+    per_prompt = token_budget - (
+        _system_tokens()
+        + len(_encode(_job_header(job_info, query)))
+        + len(_encode(OUTPUT_FORMAT))
+    )
+    shard_size = shard_size or max(len(candidates), 1)
+
+    ranked = sorted(candidates, key=rank_score, reverse=True)
+    admitted, resumes, floors, caps = [], [], [], []
+    available: List[int] = []
+    for idx, candidate in enumerate(ranked, 1):
+        shard = len(admitted) // shard_size
+        if shard == len(available):
+            available.append(per_prompt)
+        resume = _encode(candidate.get("resume_text") or "")
+        cap = min(len(resume), max_resume_tokens)
+        floor = min(cap, min_resume_tokens)
+        # the section without its resume, plus the "..." of a cut resume
+        fixed = len(_encode(_candidate_section(idx, candidate, ""))) + 1
+        # always keep the best match of a prompt, even over budget
+        if len(admitted) % shard_size and fixed + floor > available[shard]:
+            break
+        admitted.append(candidate)
+        resumes.append(resume)
+        floors.append(floor)
+        caps.append(cap)
+        available[shard] -= fixed + floor
+
+    allocation = []
+    for shard, left in enumerate(available):
+        members = slice(shard * shard_size, (shard + 1) * shard_size)
+        allocation.extend(
+            _allocate(
+                [max(rank_score(c), 0.0) for c in admitted[members]],
+                floors[members],
+                caps[members],
+                max(left, 0),
+            )
+        )
+    segments = [
+        _encode(_candidate_section(idx, candidate, _resume_preview(resume, limit)))
+        for idx, (candidate, resume, limit) in enumerate(
+            zip(admitted, resumes, allocation), 1
+        )
+    ]
+    return PackedCandidates(admitted, segments, len(candidates) - len(admitted))
+
+
+def build_search_explanation_prompt(
+    job_info: Dict,
+    query: str,
+    segments: List[List[int]],
+    include_summary: bool = True,
+) -> Prompt:
+    """
+    user prompt asking for a per-candidate analysis of the search results,
+    assembled from pre-tokenized candidate sections; shards of a larger pool
+    skip the overall summary
+    """
+    tokens = _encode(_job_header(job_info, query))
+    for segment in segments:
+        tokens.extend(segment)
+    tokens.extend(_encode(_output_format(include_summary)))
+    return Prompt(encoding().decode(tokens), _system_tokens() + len(tokens))
+
+
+def build_pool_summary_prompt(
+    job_info: Dict,
+    candidates: List[Dict],
+    query: str,
+) -> Prompt:
+    """short prompt for the overall summary of a sharded analysis"""
+    parts = [f"""
+        # Job Context:
+        - **Job Title:** {job_info['title']}
+        - **Requirements:** {job_info['requirements']}
+
+        ---
+        # Recruiter's Search Query
+        "{query}"
+        ---
+
+        Task
+        Summarize the quality of this candidate pool for the search in 2-3 sentences.
+
+        Candidates
+    """]
+    for idx, candidate in enumerate(candidates, 1):
+        parts.append(
+            f"""
+        {idx}. {candidate['name']} - score {candidate['similarity_score']:.3f}; skills: {candidate['skills']}; experience: {candidate['experience']}"""
+        )
+
+    parts.append("""
+
+        # Output Format
+        Return a JSON object with this exact structure:
+
+        {
+        "overall_summary": "2-3 sentence summary of the candidate pool quality"
+        }
+    """)
+
+    user_prompt = "".join(parts)
+    return Prompt(user_prompt, _system_tokens() + len(_encode(user_prompt)))
@@ -0,0 +1,181 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from fastapi import HTTPException, status
+from postgrest import APIError
+from supabase import AsyncClient
+
+from vembedding.config import settings
+from vembedding.constant import EmbeddingStatusConst
+from vembedding.metrics import gauge
+
+
+class EmbeddingTask(NamedTuple):
+    id: int
+    # the table the record lives in ("jobs", "applicants")
+    kind: str
+    record_id: str
+    attempts: int
+
+
+class EmbeddingQueue:
+    """
+    Durable queue of records waiting for their embedding, in a SQLite file
+    shared by every worker process on the host.
+
+    A record is queued once per kind (re-enqueueing is a no-op). Workers
+    lease tasks for a while; a task that is neither completed nor retried
+    before its lease runs out (a crashed worker) is handed out again. The
+    SQLite statements run in a thread, so a busy file never blocks the loop.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path or ":memory:",
+            timeout=5.0,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_tasks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "kind TEXT NOT NULL, "
+            "record_id TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "available_at REAL NOT NULL, "
+            "leased_until REAL NOT NULL DEFAULT 0, "
+            "last_error TEXT, "
+            "UNIQUE (kind, record_id))"
+        )
+        # wakes this process's workers as soon as something is queued
+        self._ready = asyncio.Event()
+
+    async def enqueue(self, kind: str, record_ids: Iterable[str]) -> None:
+        await asyncio.to_thread(self._enqueue, kind, list(record_ids))
+        # set on the loop, asyncio events are not thread safe
+        self._ready.set()
+
+    def _enqueue(self, kind: str, record_ids: List[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO embedding_tasks (kind, record_id, available_at) "
+                "VALUES (?, ?, ?)",
+                [(kind, str(record_id), now) for record_id in record_ids],
+            )
+
+    async def lease(self, limit: int, seconds: float) -> List[EmbeddingTask]:
+        """up to `limit` due tasks, oldest first, hidden from others for `seconds`"""
+        return await asyncio.to_thread(self._lease, limit, seconds)
+
+    def _lease(self, limit: int, seconds: float) -> List[EmbeddingTask]:
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "UPDATE embedding_tasks SET leased_until = ? WHERE id IN ("
+                "SELECT id FROM embedding_tasks "
+                "WHERE available_at <= ? AND leased_until <= ? "
+                "ORDER BY id LIMIT ?) "
+                "RETURNING id, kind, record_id, attempts",
+                (now + seconds, now, now, limit),
+            ).fetchall()
+        return sorted((EmbeddingTask(*row) for row in rows), key=lambda t: t.id)
+
+    async def complete(self, task_ids: Iterable[int]) -> None:
+        await asyncio.to_thread(self._complete, list(task_ids))
+
+    def _complete(self, task_ids: List[int]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM embedding_tasks WHERE id = ?",
+                [(task_id,) for task_id in task_ids],
+            )
+
+    async def retry(self, task: EmbeddingTask, error: str, delay: float) -> None:
+        """release the task to be tried again in `delay` seconds"""
+        await asyncio.to_thread(self._retry, task, error, delay)
+
+    def _retry(self, task: EmbeddingTask, error: str, delay: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE embedding_tasks SET attempts = attempts + 1, "
+                "available_at = ?, leased_until = 0, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, task.id),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM embedding_tasks"
+            ).fetchone()
+        return count
+
+    async def wait(self, timeout: float) -> None:
+        """until something is queued in this process, or `timeout` seconds"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._ready.clear()
+
+
+async def mark_embedding_ready(
+    table: str, record_id: str, embedding: List[float], supabase: AsyncClient
+) -> None:
+    """store a queued record's embedding, which makes it searchable"""
+    response = await (
+        supabase.table(table)
+        .update(
+            {
+                "embedding": embedding,
+                "embedding_status": EmbeddingStatusConst.READY,
+                "embedding_error": None,
+            }
+        )
+        .eq("id", record_id)
+        .execute()
+    )
+    if not response.data:
+        raise ValueError("Database update returned empty result")
+
+
+async def fetch_embedding_status(
+    table: str, record_id: str, label: str, supabase: AsyncClient
+) -> Dict:
+    """`embedding_status` (and the last error once failed) of a job or applicant"""
+    try:
+        response = await (
+            supabase.table(table)
+            .select("id,embedding_status,embedding_error")
+            .eq("id", record_id)
+            .execute()
+        )
+    except APIError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}",
+        )
+    if not response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{label} with id {record_id} not found",
+        )
+    return response.data[0]
+
+
+embedding_queue = EmbeddingQueue(settings.EMBEDDING_QUEUE_PATH or None)
+
+gauge(
+    "embedding_queue_depth", "Jobs and applicants waiting for their embedding"
+).set_function(lambda: len(embedding_queue))
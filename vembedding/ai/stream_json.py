@@ -0,0 +1,101 @@
+"""Incremental parsing of the analysis JSON while the model is still writing it"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+# (event name, payload)
+StreamEvent = Tuple[str, Any]
+
+
+class AnalysisStreamParser:
+    """
+    Feed it chunks of the analysis JSON object as they arrive; it returns
+    events as soon as they are complete:
+
+    - ("candidate", dict) for each object of the top-level `candidates` array
+    - ("overall_summary", str) once the top-level summary string is closed
+
+    Only string/escape state and nesting depth are tracked, so each character
+    is looked at once.
+    """
+
+    def __init__(
+        self, array_key: str = "candidates", summary_key: str = "overall_summary"
+    ):
+        self.array_key = array_key
+        self.summary_key = summary_key
+        self._buffer: List[str] = []
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._expect_value = False
+        self._object_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """everything received so far"""
+        return "".join(self._buffer)
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        events: List[StreamEvent] = []
+        self._buffer.append(chunk)
+        text = None
+
+        for char in chunk:
+            index = self._position
+            self._position += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        text = text or self.text
+                        value = json.loads(text[self._string_start : index + 1])
+                        if self._expect_value:
+                            self._expect_value = False
+                            if self._current_key == self.summary_key:
+                                events.append((self.summary_key, value))
+                        else:
+                            self._last_string = value
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char == ":" and self._depth == 1:
+                self._current_key = self._last_string
+                self._expect_value = True
+            elif char == "," and self._depth == 1:
+                self._expect_value = False
+            elif char in "{[":
+                if self._depth == 1:
+                    self._expect_value = False
+                if (
+                    char == "{"
+                    and self._depth == 2
+                    and self._current_key == self.array_key
+                ):
+                    self._object_start = index
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._depth == 2 and self._object_start is not None:
+                    text = text or self.text
+                    events.append(
+                        ("candidate", json.loads(text[self._object_start : index + 1]))
+                    )
+                    self._object_start = None
+
+        return events
+
+    def result(self) -> Any:
+        """the complete parsed object; raises json.JSONDecodeError if invalid"""
+        return json.loads(self.text)
@@ -0,0 +1,125 @@
+"""Streaming record parsers and report encoding for bulk applicant ingestion"""
+
+import csv
+import json
+import tempfile
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    BinaryIO,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+# (row number, parsed record or the parse error for that row)
+ParsedRow = Tuple[int, Any]
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+
+def detect_format(content_type: Optional[str]) -> str:
+    """pick the record format from a request content type"""
+    if content_type and "csv" in content_type.lower():
+        return CSV
+    return NDJSON
+
+
+async def _iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """split a stream of byte chunks into decoded lines without buffering it all"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+async def iter_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[ParsedRow]:
+    """parse one JSON object per line, skipping blank lines"""
+    row = 0
+    async for line in _iter_lines(chunks):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Each line must be a JSON object")
+            yield row, record
+        except ValueError as e:
+            yield row, e
+
+
+async def iter_csv(chunks: AsyncIterable[bytes]) -> AsyncIterator[ParsedRow]:
+    """parse CSV with a header row; quoted fields may span several lines"""
+    header = None
+    row = 0
+    pending = ""
+    async for line in _iter_lines(chunks):
+        pending = f"{pending}\n{line}" if pending else line
+        # an odd number of quotes means a quoted field continues on the next line
+        if pending.count('"') % 2:
+            continue
+        record_text, pending = pending, ""
+        if not record_text.strip():
+            continue
+
+        values = next(csv.reader([record_text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row += 1
+        if len(values) != len(header):
+            yield row, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield row, dict(zip(header, values))
+
+    if pending:
+        row += 1
+        yield row, ValueError("Unterminated quoted field at end of input")
+
+
+def parse_records(chunks: AsyncIterable[bytes], fmt: str) -> AsyncIterator[ParsedRow]:
+    """parse a byte stream in the given format"""
+    if fmt == CSV:
+        return iter_csv(chunks)
+    return iter_ndjson(chunks)
+
+
+async def iter_file(f: BinaryIO, chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+    """read an open binary file in fixed-size chunks, closing it at the end"""
+    try:
+        while chunk := f.read(chunk_size):
+            yield chunk
+    finally:
+        f.close()
+
+
+async def spool_body(chunks: AsyncIterable[bytes], max_memory: int) -> BinaryIO:
+    """
+    copy a request body into a temporary file that spills to disk past
+    `max_memory` bytes. The body has to be fully received before a streaming
+    response starts, since the response listens on the same ASGI channel.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    async for chunk in chunks:
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def encode_report(results: AsyncIterable[Dict]) -> AsyncIterator[bytes]:
+    """encode per-row results as NDJSON, followed by a summary line"""
+    summary: Dict[str, int] = {"total": 0}
+    async for result in results:
+        summary["total"] += 1
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+        yield (json.dumps(result) + "\n").encode("utf-8")
+    yield (json.dumps({"summary": summary}) + "\n").encode("utf-8")
@@ -0,0 +1,194 @@
+"""
+Reverse matching: the jobs that fit an applicant, ranked by the similarity
+of the stored job and applicant embeddings (no OpenAI call).
+
+Single applicants are matched live in Postgres (`search_jobs_for_applicant`).
+The batch match (python -m vembedding.match_jobs) loads every embedded job
+into one matrix and ranks pages of applicants against it with one matrix
+product per page, storing the results in `applicant_job_matches`.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from fastapi import HTTPException, status
+from postgrest import APIError
+from supabase import AsyncClient
+
+from vembedding.ai.queue import fetch_embedding_status
+from vembedding.constant import EmbeddingStatusConst, TableNamesConst
+from vembedding.search.engine import parse_embedding
+from vembedding.search.matrix import VectorMatrix, normalize_rows, top_k_rows
+from vembedding.timing import stage
+
+# jobs read per page when loading the job matrix
+JOB_PAGE_SIZE = 1_000
+MATCH_COLUMNS = f"job_id,score,rank,computed_at,{TableNamesConst.JOBS}(title,author)"
+
+
+async def load_job_matrix(
+    supabase: AsyncClient, page_size: int = JOB_PAGE_SIZE
+) -> VectorMatrix:
+    """every embedded job's vector, keyed by job id"""
+    matrix: Optional[VectorMatrix] = None
+    after = None
+    while True:
+        query = (
+            supabase.table(TableNamesConst.JOBS)
+            .select("id,embedding")
+            .eq("embedding_status", EmbeddingStatusConst.READY)
+            .order("id")
+            .limit(page_size)
+        )
+        if after:
+            query = query.gt("id", after)
+        page = (await query.execute()).data
+        if not page:
+            break
+        after = str(page[-1]["id"])
+        vectors = np.asarray(
+            [parse_embedding(row["embedding"]) for row in page], dtype=np.float32
+        )
+        if matrix is None:
+            matrix = VectorMatrix(dim=vectors.shape[1], capacity=len(page))
+        matrix.add_many([str(row["id"]) for row in page], vectors)
+    return matrix or VectorMatrix(dim=1)
+
+
+def rank_jobs(
+    jobs: VectorMatrix, vectors: np.ndarray, k: int
+) -> List[List[Tuple[str, float]]]:
+    """the k best jobs of every applicant vector, one matrix product for all"""
+    if not len(jobs) or not len(vectors):
+        return [[] for _ in range(len(vectors))]
+    scores = normalize_rows(np.asarray(vectors, dtype=np.float32)) @ jobs.vectors.T
+    best, best_scores = top_k_rows(scores, k)
+    ids = jobs.ids
+    return [
+        [(ids[column], float(score)) for column, score in zip(row, row_scores)]
+        for row, row_scores in zip(best, best_scores)
+    ]
+
+
+def match_rows(
+    applicant_ids: Sequence[str],
+    ranked: List[List[Tuple[str, float]]],
+    computed_at: str,
+) -> List[Dict]:
+    """`applicant_job_matches` rows of a ranked page"""
+    return [
+        {
+            "applicant_id": applicant_id,
+            "job_id": job_id,
+            "score": score,
+            "rank": rank,
+            "computed_at": computed_at,
+        }
+        for applicant_id, jobs in zip(applicant_ids, ranked)
+        for rank, (job_id, score) in enumerate(jobs, start=1)
+    ]
+
+
+async def store_matches(
+    applicant_ids: Sequence[str],
+    ranked: List[List[Tuple[str, float]]],
+    computed_at: str,
+    supabase: AsyncClient,
+) -> None:
+    """write a page of matches in one upsert, then drop the page's older ones"""
+    rows = match_rows(applicant_ids, ranked, computed_at)
+    if rows:
+        await (
+            supabase.table(TableNamesConst.APPLICANT_JOB_MATCHES)
+            .upsert(rows, on_conflict="applicant_id,job_id")
+            .execute()
+        )
+    # matches of earlier runs that fell out of the top k
+    await (
+        supabase.table(TableNamesConst.APPLICANT_JOB_MATCHES)
+        .delete()
+        .in_("applicant_id", list(applicant_ids))
+        .lt("computed_at", computed_at)
+        .execute()
+    )
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+async def matching_jobs(
+    applicant_id: str, limit: int, fresh: bool, supabase: AsyncClient
+) -> Dict:
+    """
+    The applicant's best jobs: the last batch match when there is one (and
+    `fresh` is off), otherwise ranked live.
+    """
+    try:
+        if not fresh:
+            with stage("db"):
+                response = await (
+                    supabase.table(TableNamesConst.APPLICANT_JOB_MATCHES)
+                    .select(MATCH_COLUMNS)
+                    .eq("applicant_id", applicant_id)
+                    .order("rank")
+                    .limit(limit)
+                    .execute()
+                )
+            if response.data:
+                return _response(
+                    applicant_id,
+                    "batch",
+                    response.data[0]["computed_at"],
+                    [
+                        {
+                            "job_id": row["job_id"],
+                            **(row.get(TableNamesConst.JOBS) or {}),
+                            "score": row["score"],
+                            "rank": row["rank"],
+                        }
+                        for row in response.data
+                    ],
+                )
+
+        with stage("search"):
+            response = await supabase.rpc(
+                "search_jobs_for_applicant",
+                {"applicant_id_param": applicant_id, "match_count": limit},
+            ).execute()
+    except APIError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}",
+        )
+
+    if not response.data:
+        # unknown applicants are a 404, pending ones simply have no match yet
+        await fetch_embedding_status(
+            TableNamesConst.APPLICANTS, applicant_id, "Applicant", supabase
+        )
+    return _response(
+        applicant_id,
+        "live",
+        utc_now(),
+        [
+            {
+                "job_id": row["id"],
+                "title": row["title"],
+                "author": row["author"],
+                "score": row["similarity_score"],
+                "rank": rank,
+            }
+            for rank, row in enumerate(response.data, start=1)
+        ],
+    )
+
+
+def _response(applicant_id: str, source: str, computed_at: str, results: List[Dict]):
+    return {
+        "applicant_id": applicant_id,
+        "source": source,
+        "computed_at": computed_at,
+        "total": len(results),
+        "results": results,
+    }
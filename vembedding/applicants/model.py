@@ -24,10 +24,30 @@ class ApplicantUpdate(BaseModel):
     experience: Optional[str] = None
 
 
+class MatchingJob(BaseModel):
+    job_id: UUID
+    title: Optional[str] = None
+    author: Optional[str] = None
+    # cosine similarity of the applicant and job embeddings
+    score: float
+    rank: int
+
+
+class MatchingJobsResponse(BaseModel):
+    applicant_id: UUID
+    # "batch" (last nightly match) or "live"
+    source: str
+    computed_at: datetime
+    total: int
+    results: List[MatchingJob]
+
+
 class ApplicantResponse(ApplicantBase):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    # pending until a background worker has embedded it, then ready (or failed)
+    embedding_status: Optional[str] = None
     # embedding: Optional[List[float]] = None
 
     class Config:
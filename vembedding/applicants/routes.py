@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, Request, status
-from supabase import Client
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from supabase import AsyncClient
 
-from vembedding.rate_limiter import limiter
-from vembedding.dependencies import get_applicant_service, get_supabase_client_no_auth
+from vembedding.rate_limiter import ClientBudget, limiter
+from vembedding.dependencies import (
+    get_applicant_service,
+    get_bulk_token_budget,
+    get_supabase_client_no_auth,
+    get_token_budget,
+)
+from vembedding.config import settings
+from .bulk import detect_format, encode_report, iter_file, parse_records, spool_body
 from .service import ApplicantService
-from .model import ApplicantResponse, ApplicantCreate
+from .model import ApplicantResponse, ApplicantCreate, MatchingJobsResponse
 
 router = APIRouter(
     prefix="/api/applicants",
@@ -12,13 +20,74 @@ router = APIRouter(
 )
 
 
-@router.post("/", response_model=ApplicantResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/", response_model=ApplicantResponse, status_code=status.HTTP_202_ACCEPTED
+)
 @limiter.limit("1/minute")
 async def create_applicant(
     request: Request,
+    response: Response,
     payload: ApplicantCreate,
-    supabase: Client = Depends(get_supabase_client_no_auth),
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
     service: ApplicantService = Depends(get_applicant_service),
+    budget: ClientBudget = Depends(get_token_budget),
 ) -> ApplicantResponse:
-    """Create a new applicant"""
-    return await service.create_applicant(payload, supabase)
+    """
+    Create a new applicant. The embedding is computed in the background and
+    the applicant shows up in searches once the `Location` (embedding status)
+    reports `ready`.
+    """
+    applicant = await service.create_applicant(payload, supabase, budget)
+    response.headers["Location"] = str(
+        request.url_for("get_applicant_embedding_status", applicant_id=applicant["id"])
+    )
+    return applicant
+
+
+@router.get("/{applicant_id}/status", status_code=status.HTTP_200_OK)
+async def get_applicant_embedding_status(
+    applicant_id: str,
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
+    service: ApplicantService = Depends(get_applicant_service),
+):
+    """Embedding status of an applicant: pending, ready or failed"""
+    return await service.get_embedding_status(applicant_id, supabase)
+
+
+@router.get(
+    "/{applicant_id}/matching-jobs",
+    response_model=MatchingJobsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_matching_jobs(
+    applicant_id: str,
+    limit: int = Query(default=10, ge=1, le=100),
+    fresh: bool = False,
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
+    service: ApplicantService = Depends(get_applicant_service),
+):
+    """
+    Jobs that fit the applicant, best first, from the stored embeddings.
+    Served from the last batch match (python -m vembedding.match_jobs) when
+    there is one, otherwise (or with `fresh`) ranked live.
+    """
+    return await service.get_matching_jobs(applicant_id, limit, fresh, supabase)
+
+
+@router.post("/bulk", status_code=status.HTTP_200_OK)
+@limiter.limit("1/minute")
+async def bulk_create_applicants(
+    request: Request,
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
+    service: ApplicantService = Depends(get_applicant_service),
+    budget: ClientBudget = Depends(get_bulk_token_budget),
+) -> StreamingResponse:
+    """
+    Bulk create applicants from a streamed NDJSON (default) or CSV body.
+    Returns an NDJSON report with one result per row plus a summary line.
+    """
+    fmt = detect_format(request.headers.get("content-type"))
+    body = await spool_body(request.stream(), settings.BULK_INGEST_SPOOL_BYTES)
+    rows = parse_records(iter_file(body), fmt)
+    results = service.bulk_create_applicants(rows, supabase, budget)
+    return StreamingResponse(encode_report(results), media_type="application/x-ndjson")
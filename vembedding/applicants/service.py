@@ -1,46 +1,92 @@
+import asyncio
 import logging
+import sqlite3
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
 from postgrest import APIError
-from supabase import Client
+from pydantic import ValidationError
+from supabase import AsyncClient
 
-from vembedding.constant import TableNamesConst
-from vembedding.ai.embedding import openai_generate_embedding, validate_text_length
+from vembedding.config import settings
+from vembedding.constant import EmbeddingStatusConst, TableNamesConst
+from vembedding.ai.chunking import chunk_text, mean_embedding
+from vembedding.ai.embedding import (
+    count_tokens,
+    generate_embeddings_in_batches,
+    validate_text_length,
+)
+from vembedding.ai.queue import (
+    embedding_queue,
+    fetch_embedding_status,
+    mark_embedding_ready,
+)
+from vembedding.applicants.bulk import ParsedRow
+from vembedding.applicants.matching import matching_jobs
 from vembedding.applicants.model import ApplicantCreate, ApplicantResponse
+from vembedding.jobs.recommendations import recommendations
+from vembedding.rate_limiter import ClientBudget
+from vembedding.search.engine import search_backend
+from vembedding.timing import stage
 
 
 class ApplicantService:
     TABLE_NAME = TableNamesConst.APPLICANTS
 
+    @staticmethod
+    def combine_text(payload: ApplicantCreate) -> str:
+        """text that represents an applicant for embedding"""
+        return f"{payload.name} {payload.email} {payload.resume_text} {payload.skills} {payload.experience}"
+
+    @staticmethod
+    def validate_text(combine_text: str) -> int:
+        """token count of the applicant text; chunking allows longer texts"""
+        if settings.EMBEDDING_CHUNKING_ENABLED:
+            return validate_text_length(
+                combine_text, max_tokens=settings.EMBEDDING_CHUNKED_MAX_TOKENS
+            )
+        return validate_text_length(combine_text)
+
+    @staticmethod
+    def embedding_texts(combine_text: str, token_count: int) -> List[str]:
+        """the text itself, or its overlapping token windows when it is long"""
+        if (
+            settings.EMBEDDING_CHUNKING_ENABLED
+            and token_count > settings.EMBEDDING_CHUNK_TOKENS
+        ):
+            return chunk_text(
+                combine_text,
+                size=settings.EMBEDDING_CHUNK_TOKENS,
+                overlap=settings.EMBEDDING_CHUNK_OVERLAP,
+            )
+        return [combine_text]
+
     async def create_applicant(
         self,
         payload: ApplicantCreate,
-        supabase: Client,
+        supabase: AsyncClient,
+        budget: Optional[ClientBudget] = None,
     ) -> ApplicantResponse:
         """Create a new applicant record"""
 
         # safety checks
-        combine_text = f"{payload.name} {payload.email} {payload.resume_text} {payload.skills} {payload.experience}"
-        token_count = validate_text_length(combine_text)
+        combine_text = self.combine_text(payload)
+        token_count = self.validate_text(combine_text)
+        if budget is not None:
+            budget.charge(token_count)
 
         logging.info(f"Token count: {token_count}")
 
-        # generate embedding for the applicant
-        try:
-            embedding = await openai_generate_embedding(combine_text)
-            if not embedding:
-                raise ValueError("Embedding generation returned empty result")
-
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error generating embedding: {e}",
-            )
-
-        # store the applicant in the database
+        # store the applicant now, background workers add the embedding
         try:
             applicant_data = payload.model_dump(mode="json")
-            applicant_data["embedding"] = embedding
-            response = supabase.table(self.TABLE_NAME).insert(applicant_data).execute()
+            applicant_data["embedding_status"] = EmbeddingStatusConst.PENDING
+            with stage("db"):
+                response = (
+                    await supabase.table(self.TABLE_NAME)
+                    .insert(applicant_data)
+                    .execute()
+                )
 
             if not response.data:
                 raise ValueError("Datatbase insertion returned empty result")
@@ -51,7 +97,387 @@ class ApplicantService:
                 detail=f"Error storing applicant: {e}",
             )
 
+        try:
+            await embedding_queue.enqueue(self.TABLE_NAME, [response.data[0]["id"]])
+        except sqlite3.Error as e:
+            # the row is stored: the periodic recovery queues it
+            logging.error(f"Error queueing {response.data[0]['id']} for embedding: {e}")
         return response.data[0]
 
+    async def get_embedding_status(self, applicant_id: str, supabase: AsyncClient):
+        """Embedding status of an applicant"""
+        return await fetch_embedding_status(
+            self.TABLE_NAME, applicant_id, "Applicant", supabase
+        )
+
+    async def get_matching_jobs(
+        self, applicant_id: str, limit: int, fresh: bool, supabase: AsyncClient
+    ):
+        """Jobs that fit an applicant, from the stored embeddings"""
+        return await matching_jobs(applicant_id, limit, fresh, supabase)
+
+    async def embed_pending(
+        self, applicant_ids: List[str], supabase: AsyncClient
+    ) -> Dict[str, str]:
+        """
+        Embed queued applicants (every text and chunk in as few calls as the
+        API limits allow) and mark them ready. Returns the error of every
+        applicant to retry.
+        """
+        with stage("db"):
+            response = await (
+                supabase.table(self.TABLE_NAME)
+                .select("id,name,email,resume_text,skills,experience,embedding_status")
+                .in_("id", applicant_ids)
+                .execute()
+            )
+        # deleted or already embedded applicants have nothing left to do
+        pending = [
+            row
+            for row in response.data
+            if row["embedding_status"] == EmbeddingStatusConst.PENDING
+        ]
+
+        chunked: Dict[str, List[str]] = {}
+        texts = []
+        for row in pending:
+            applicant_id = str(row["id"])
+            combine_text = self.combine_text(ApplicantCreate.model_validate(row))
+            token_count = count_tokens(combine_text)
+            chunks = self.embedding_texts(combine_text, token_count)
+            chunked[applicant_id] = chunks
+            texts.extend(
+                (
+                    (applicant_id, index),
+                    text,
+                    (
+                        token_count
+                        if len(chunks) == 1
+                        else settings.EMBEDDING_CHUNK_TOKENS
+                    ),
+                )
+                for index, text in enumerate(chunks)
+            )
+        vectors, batch_errors = await generate_embeddings_in_batches(texts)
+        errors = {
+            applicant_id: f"Error generating embedding: {error}"
+            for (applicant_id, _), error in batch_errors.items()
+        }
+
+        embedded = []
+        for row in pending:
+            applicant_id = str(row["id"])
+            if applicant_id in errors:
+                continue
+            chunks = chunked[applicant_id]
+            chunk_embeddings = [vectors[(applicant_id, i)] for i in range(len(chunks))]
+            if len(chunks) > 1:
+                embedded.append(
+                    (row, mean_embedding(chunk_embeddings), chunks, chunk_embeddings)
+                )
+            else:
+                embedded.append((row, chunk_embeddings[0], [], []))
+
+        # chunks first: an applicant is only searched once it is ready
+        try:
+            await self._insert_chunks(
+                [
+                    (row["id"], chunks, chunk_embeddings)
+                    for row, _, chunks, chunk_embeddings in embedded
+                ],
+                supabase,
+            )
+        except (APIError, ValueError) as e:
+            for row, _, chunks, _ in embedded:
+                if chunks:
+                    errors[str(row["id"])] = f"Error storing applicant chunks: {e}"
+            embedded = [item for item in embedded if not item[2]]
+
+        stored = await asyncio.gather(
+            *(
+                mark_embedding_ready(self.TABLE_NAME, row["id"], embedding, supabase)
+                for row, embedding, _, _ in embedded
+            ),
+            return_exceptions=True,
+        )
+        ready = []
+        for (row, embedding, _, chunk_embeddings), result in zip(embedded, stored):
+            if isinstance(result, Exception):
+                errors[str(row["id"])] = f"Error storing embedding: {result}"
+                continue
+            ready.append(row["id"])
+            _index_applicant(
+                {
+                    **row,
+                    "embedding": embedding,
+                    "embedding_status": EmbeddingStatusConst.READY,
+                    "chunk_embeddings": chunk_embeddings,
+                }
+            )
+        # the whole batch against every job's recommendations at once
+        await recommendations.add_applicants(ready, supabase)
+        return errors
+
+    async def _insert_chunks(
+        self,
+        applicants: List[Tuple[str, List[str], List[List[float]]]],
+        supabase: AsyncClient,
+    ) -> None:
+        """store (applicant id, chunk texts, chunk vectors) in one insert"""
+        rows = [
+            {
+                "applicant_id": applicant_id,
+                "chunk_index": index,
+                "content": text,
+                "embedding": embedding,
+            }
+            for applicant_id, texts, embeddings in applicants
+            for index, (text, embedding) in enumerate(zip(texts, embeddings))
+        ]
+        if not rows:
+            return
+        # an upsert, so a retried embedding rewrites the chunks it stored before
+        with stage("db"):
+            response = await (
+                supabase.table(TableNamesConst.APPLICANT_CHUNKS)
+                .upsert(rows, on_conflict="applicant_id,chunk_index")
+                .execute()
+            )
+        if len(response.data) != len(rows):
+            raise ValueError("Database insertion returned unexpected result")
+
+    async def _discard(self, applicant_ids: List[str], supabase: AsyncClient) -> None:
+        """delete applicants whose chunks could not be stored"""
+        if not applicant_ids:
+            return
+        try:
+            with stage("db"):
+                await (
+                    supabase.table(self.TABLE_NAME)
+                    .delete()
+                    .in_("id", applicant_ids)
+                    .execute()
+                )
+        except APIError as e:
+            logging.error(f"Error removing applicants without chunks: {e}")
+
+    async def bulk_create_applicants(
+        self,
+        rows: AsyncIterator[ParsedRow],
+        supabase: AsyncClient,
+        budget: Optional[ClientBudget] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Create applicants from a stream of parsed records.
+
+        Records are processed in chunks with a bounded number of chunks in
+        flight, so memory stays flat regardless of input size. Yields one
+        result per input row, in input order. Rows past the client's bulk token
+        budget are reported as errors; the ingest CLI passes no budget.
+        """
+        chunk_size = settings.BULK_INGEST_CHUNK_SIZE
+        inflight: Deque[asyncio.Task] = deque()
+        chunk: List[ParsedRow] = []
+
+        try:
+            async for row in rows:
+                chunk.append(row)
+                if len(chunk) < chunk_size:
+                    continue
+
+                inflight.append(
+                    asyncio.create_task(self._ingest_chunk(chunk, supabase, budget))
+                )
+                chunk = []
+                if len(inflight) >= settings.BULK_INGEST_CONCURRENCY:
+                    for result in await inflight.popleft():
+                        yield result
+
+            if chunk:
+                inflight.append(
+                    asyncio.create_task(self._ingest_chunk(chunk, supabase, budget))
+                )
+            while inflight:
+                for result in await inflight.popleft():
+                    yield result
+
+        finally:
+            # client went away or the stream failed: stop outstanding work
+            for task in inflight:
+                task.cancel()
+
+    async def _ingest_chunk(
+        self,
+        chunk: List[ParsedRow],
+        supabase: AsyncClient,
+        budget: Optional[ClientBudget] = None,
+    ) -> List[Dict]:
+        """validate, embed and insert one chunk of records"""
+        results: Dict[int, Dict] = {}
+        valid = []
+
+        # validate every record on its own so one bad row does not fail the chunk
+        for row, record in chunk:
+            if isinstance(record, Exception):
+                results[row] = _row_error(row, f"Invalid record: {record}")
+                continue
+            try:
+                payload = ApplicantCreate.model_validate(record)
+                combine_text = self.combine_text(payload)
+                token_count = self.validate_text(combine_text)
+                if budget is not None:
+                    budget.charge(token_count)
+            except ValidationError as e:
+                results[row] = _row_error(
+                    row,
+                    f"Invalid record: {e.errors(include_url=False, include_input=False)}",
+                )
+                continue
+            except HTTPException as e:
+                results[row] = _row_error(row, e.detail)
+                continue
+            chunks = self.embedding_texts(combine_text, token_count)
+            valid.append((row, payload, chunks, token_count))
+
+        # embed every text (or chunk) in as few calls as the API limits allow
+        texts = [
+            (
+                (row, index),
+                text,
+                token_count if len(chunks) == 1 else settings.EMBEDDING_CHUNK_TOKENS,
+            )
+            for row, _, chunks, token_count in valid
+            for index, text in enumerate(chunks)
+        ]
+        vectors, batch_errors = await generate_embeddings_in_batches(texts)
+        for (row, _), error in batch_errors.items():
+            results[row] = _row_error(row, f"Error generating embedding: {error}")
+
+        embedded = []
+        for row, payload, chunks, _ in valid:
+            if row in results:
+                continue
+            chunk_embeddings = [vectors[(row, index)] for index in range(len(chunks))]
+            applicant_data = payload.model_dump(mode="json")
+            if len(chunks) > 1:
+                applicant_data["embedding"] = mean_embedding(chunk_embeddings)
+                embedded.append((row, applicant_data, chunks, chunk_embeddings))
+            else:
+                applicant_data["embedding"] = chunk_embeddings[0]
+                embedded.append((row, applicant_data, [], []))
+
+        # one multi-row insert per chunk, falling back to row-by-row on failure
+        if embedded:
+            try:
+                with stage("db"):
+                    response = await (
+                        supabase.table(self.TABLE_NAME)
+                        .insert([data for _, data, _, _ in embedded])
+                        .execute()
+                    )
+                if len(response.data) != len(embedded):
+                    raise ValueError("Database insertion returned unexpected result")
+                inserted_rows = list(zip(embedded, response.data))
+
+            except (APIError, ValueError):
+                inserted = await asyncio.gather(
+                    *(self._insert_one(*item, supabase) for item in embedded)
+                )
+                for (row, _, _, _), result in zip(embedded, inserted):
+                    results[row] = result
+                await recommendations.add_applicants(_created_ids(results), supabase)
+                return [results[row] for row, _ in chunk]
+
+            try:
+                await self._insert_chunks(
+                    [
+                        (inserted["id"], chunks, chunk_embeddings)
+                        for (_, _, chunks, chunk_embeddings), inserted in inserted_rows
+                    ],
+                    supabase,
+                )
+                chunks_error = None
+            except (APIError, ValueError) as e:
+                chunks_error = f"Error storing applicant chunks: {e}"
+                # no applicant without its chunks: searches would miss them
+                await self._discard(
+                    [
+                        inserted["id"]
+                        for (_, _, chunks, _), inserted in inserted_rows
+                        if chunks
+                    ],
+                    supabase,
+                )
+
+            for (row, data, chunks, chunk_embeddings), inserted in inserted_rows:
+                if chunks and chunks_error:
+                    results[row] = _row_error(row, chunks_error)
+                    continue
+                _index_applicant(
+                    {
+                        **inserted,
+                        "embedding": data["embedding"],
+                        "chunk_embeddings": chunk_embeddings,
+                    }
+                )
+                results[row] = _row_created(row, inserted)
+            await recommendations.add_applicants(_created_ids(results), supabase)
+
+        return [results[row] for row, _ in chunk]
+
+    async def _insert_one(
+        self,
+        row: int,
+        applicant_data: Dict,
+        chunks: List[str],
+        chunk_embeddings: List[List[float]],
+        supabase: AsyncClient,
+    ) -> Dict:
+        try:
+            response = (
+                await supabase.table(self.TABLE_NAME).insert(applicant_data).execute()
+            )
+            if not response.data:
+                raise ValueError("Database insertion returned empty result")
+        except (APIError, ValueError) as e:
+            return _row_error(row, f"Error storing applicant: {e}")
+
+        try:
+            await self._insert_chunks(
+                [(response.data[0]["id"], chunks, chunk_embeddings)], supabase
+            )
+        except (APIError, ValueError) as e:
+            await self._discard([response.data[0]["id"]], supabase)
+            return _row_error(row, f"Error storing applicant chunks: {e}")
+
+        _index_applicant(
+            {
+                **response.data[0],
+                "embedding": applicant_data["embedding"],
+                "chunk_embeddings": chunk_embeddings,
+            }
+        )
+        return _row_created(row, response.data[0])
+
+
+def _index_applicant(applicant: Dict) -> None:
+    """best effort: the applicant is stored (and not retried) either way"""
+    try:
+        search_backend.on_applicant_created(applicant)
+    except Exception as e:
+        logging.warning(f"Error indexing applicant {applicant['id']}: {e}")
+
+
+def _row_created(row: int, inserted: Dict) -> Dict:
+    return {"row": row, "status": "created", "id": inserted["id"]}
+
+
+def _created_ids(results: Dict[int, Dict]) -> List[str]:
+    return [r["id"] for r in results.values() if r["status"] == "created"]
+
+
+def _row_error(row: int, error: str) -> Dict:
+    return {"row": row, "status": "error", "error": error}
+
 
 applicant = ApplicantService()
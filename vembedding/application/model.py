@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 from uuid import UUID
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ApplicationBase(BaseModel):
@@ -14,6 +14,11 @@ class ApplicationCreate(ApplicationBase):
     pass
 
 
+class ApplicationBulkCreate(BaseModel):
+    job_id: UUID
+    applicant_ids: List[UUID] = Field(min_length=1, max_length=1000)
+
+
 class ApplicationUpdate(BaseModel):
     job_id: Optional[UUID] = None
     applicant_id: Optional[UUID] = None
@@ -27,3 +32,17 @@ class ApplicationResponse(ApplicationBase):
 
     class Config:
         from_attributes = True
+
+
+class ApplicationBulkResult(BaseModel):
+    applicant_id: UUID
+    status: Literal["created", "duplicate", "not_found"]
+    id: Optional[UUID] = None
+
+
+class ApplicationBulkResponse(BaseModel):
+    job_id: UUID
+    created: int
+    duplicate: int
+    not_found: int
+    results: List[ApplicationBulkResult]
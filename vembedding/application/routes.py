@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, Request, status
-from supabase import Client
+from supabase import AsyncClient
 
 from vembedding.rate_limiter import limiter
 from vembedding.dependencies import get_supabase_client_no_auth, get_application_service
-from .model import ApplicationResponse, ApplicationCreate
+from .model import (
+    ApplicationBulkCreate,
+    ApplicationBulkResponse,
+    ApplicationResponse,
+    ApplicationCreate,
+)
 from .service import ApplicationService
 
-
 router = APIRouter(
     prefix="/api/applications",
     tags=["applications"],
@@ -17,11 +21,28 @@ router = APIRouter(
     "/", response_model=ApplicationResponse, status_code=status.HTTP_201_CREATED
 )
 @limiter.limit("1/minute")
-def create_application(
+async def create_application(
     request: Request,
     payload: ApplicationCreate,
-    supabase: Client = Depends(get_supabase_client_no_auth),
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
     service: ApplicationService = Depends(get_application_service),
 ) -> ApplicationResponse:
     """Create a new application"""
-    return service.create_application(payload, supabase)
+    return await service.create_application(payload, supabase)
+
+
+@router.post(
+    "/bulk", response_model=ApplicationBulkResponse, status_code=status.HTTP_200_OK
+)
+@limiter.limit("1/minute")
+async def bulk_create_applications(
+    request: Request,
+    payload: ApplicationBulkCreate,
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
+    service: ApplicationService = Depends(get_application_service),
+) -> ApplicationBulkResponse:
+    """
+    Link many applicants to a job in one batched insert.
+    Returns one result per applicant id plus counts per outcome.
+    """
+    return await service.bulk_create_applications(payload, supabase)
@@ -1,83 +1,189 @@
+from typing import Dict, List
 from fastapi import HTTPException, status
 from postgrest import APIError
-from supabase import Client
+from supabase import AsyncClient
 
 from vembedding.constant import TableNamesConst
-from vembedding.application.model import ApplicationCreate, ApplicationResponse
+from vembedding.application.model import (
+    ApplicationBulkCreate,
+    ApplicationBulkResponse,
+    ApplicationCreate,
+    ApplicationResponse,
+)
+from vembedding.jobs.cache import search_cache
+from vembedding.jobs.recommendations import recommendations
+from vembedding.search.engine import search_backend
+from vembedding.timing import stage
+
+# postgres error codes raised by the applications constraints
+FOREIGN_KEY_VIOLATION = "23503"
+UNIQUE_VIOLATION = "23505"
 
 
 class ApplicationService:
     TABLE_NAME = TableNamesConst.APPLICATIONS
 
-    def create_application(
+    async def create_application(
         self,
         payload: ApplicationCreate,
-        supabase: Client,
+        supabase: AsyncClient,
     ) -> ApplicationResponse:
         """Create a new application"""
 
+        # a single insert: the foreign keys and the (job_id, applicant_id)
+        # unique constraint do the existence and duplicate checks
         try:
-            job = (
-                supabase.table(TableNamesConst.JOBS)
-                .select("id")
-                .eq("id", payload.job_id)
-                .execute()
-            )
-            if not job.data:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Job not found",
+            application_data = payload.model_dump(mode="json")
+            application_data["status"] = "applied"
+            with stage("db"):
+                response = await (
+                    supabase.table(self.TABLE_NAME).insert(application_data).execute()
                 )
+            if not response.data:
+                raise ValueError("Database insertion returned empty result")
 
-            applicant = (
-                supabase.table(TableNamesConst.APPLICANTS)
-                .select("id")
-                .eq("id", payload.applicant_id)
-                .execute()
-            )
-            if not applicant.data:
+        except APIError as e:
+            if e.code == FOREIGN_KEY_VIOLATION:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Applicant not found",
+                    detail=f"{_missing_reference(e).capitalize()} not found",
                 )
-
-            existing_application = (
-                supabase.table(self.TABLE_NAME)
-                .select("id")
-                .eq("job_id", payload.job_id)
-                .eq("applicant_id", payload.applicant_id)
-                .execute()
-            )
-            if existing_application.data:
+            if e.code == UNIQUE_VIOLATION:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
                     detail="Application already exists",
                 )
-
-        except HTTPException:
-            raise
-        except APIError as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}",
-            )
-
-        try:
-            application_data = payload.model_dump(mode="json")
-            application_data["status"] = "applied"
-            response = (
-                supabase.table(self.TABLE_NAME).insert(application_data).execute()
+                detail=f"Error storing application: {e}",
             )
-            if not response.data:
-                raise ValueError("Database insertion returned empty result")
-
-        except (APIError, ValueError) as e:
+        except ValueError as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error storing application: {e}",
             )
 
+        # the job's candidate pool changed, cached searches are stale
+        search_cache.invalidate_job(payload.job_id)
+        with stage("search_index"):
+            await search_backend.on_application_created(
+                payload.job_id, payload.applicant_id, supabase
+            )
+        await recommendations.mark_applied(
+            payload.job_id, [payload.applicant_id], supabase
+        )
         return response.data[0]
 
+    async def bulk_create_applications(
+        self,
+        payload: ApplicationBulkCreate,
+        supabase: AsyncClient,
+    ) -> ApplicationBulkResponse:
+        """
+        Link many applicants to a job with one multi-row insert. Applicants
+        already linked (or repeated in the request) are reported as
+        `duplicate`, unknown ones as `not_found`.
+        """
+        job_id = str(payload.job_id)
+        # request order, repeats dropped
+        applicant_ids = list(dict.fromkeys(str(a) for a in payload.applicant_ids))
+        not_found: List[str] = []
+
+        try:
+            created = await self._insert_applications(job_id, applicant_ids, supabase)
+        except APIError as e:
+            if e.code != FOREIGN_KEY_VIOLATION:
+                raise _storage_error(e)
+            if _missing_reference(e) == "job":
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+                )
+            # only on this path: find the unknown applicants, insert the rest
+            try:
+                with stage("db"):
+                    response = await (
+                        supabase.table(TableNamesConst.APPLICANTS)
+                        .select("id")
+                        .in_("id", applicant_ids)
+                        .execute()
+                    )
+                known = {str(row["id"]) for row in response.data}
+                not_found = [a for a in applicant_ids if a not in known]
+                created = await self._insert_applications(
+                    job_id, [a for a in applicant_ids if a in known], supabase
+                )
+            except APIError as e:
+                if e.code == FOREIGN_KEY_VIOLATION and _missing_reference(e) == "job":
+                    # the job was deleted in between
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+                    )
+                raise _storage_error(e)
+
+        if created:
+            search_cache.invalidate_job(job_id)
+            with stage("search_index"):
+                await search_backend.on_applications_created(
+                    job_id, list(created), supabase
+                )
+            await recommendations.mark_applied(job_id, list(created), supabase)
+
+        missing = set(not_found)
+        results = []
+        for applicant_id in payload.applicant_ids:
+            applicant_id = str(applicant_id)
+            if applicant_id in missing:
+                results.append({"applicant_id": applicant_id, "status": "not_found"})
+            elif applicant_id in created:
+                # popped, so a repeat later in the request is a duplicate
+                results.append(
+                    {
+                        "applicant_id": applicant_id,
+                        "status": "created",
+                        "id": created.pop(applicant_id),
+                    }
+                )
+            else:
+                results.append({"applicant_id": applicant_id, "status": "duplicate"})
+
+        counts = {"created": 0, "duplicate": 0, "not_found": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return {"job_id": job_id, **counts, "results": results}
+
+    async def _insert_applications(
+        self, job_id: str, applicant_ids: List[str], supabase: AsyncClient
+    ) -> Dict[str, str]:
+        """
+        insert the links skipping existing ones (ON CONFLICT DO NOTHING),
+        returns the id of every application created by applicant id
+        """
+        if not applicant_ids:
+            return {}
+        rows = [
+            {"job_id": job_id, "applicant_id": applicant_id, "status": "applied"}
+            for applicant_id in applicant_ids
+        ]
+        with stage("db"):
+            response = await (
+                supabase.table(self.TABLE_NAME)
+                .upsert(rows, on_conflict="job_id,applicant_id", ignore_duplicates=True)
+                .execute()
+            )
+        return {str(row["applicant_id"]): str(row["id"]) for row in response.data}
+
+
+def _missing_reference(error: APIError) -> str:
+    """`job` or `applicant`: which foreign key a 23503 error is about"""
+    text = f"{error.message or ''} {error.details or ''}"
+    return "job" if "job_id" in text else "applicant"
+
+
+def _storage_error(error: APIError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Error storing applications: {error}",
+    )
+
 
 application = ApplicationService()
@@ -5,6 +5,146 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_ANON_KEY: str
     OPENAI_API_KEY: str
+
+    # OpenAI call layer: a call (retries included) must finish within its
+    # deadline and each attempt within its timeout; timeouts, connection
+    # errors, 429 and 5xx are retried with jittered exponential backoff (or
+    # after the Retry-After asked for)
+    OPENAI_BASE_URL: str = ""
+    OPENAI_EMBEDDING_DEADLINE_SECONDS: float = 30.0
+    OPENAI_EMBEDDING_ATTEMPT_TIMEOUT_SECONDS: float = 10.0
+    OPENAI_CHAT_DEADLINE_SECONDS: float = 120.0
+    OPENAI_CHAT_ATTEMPT_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_MAX_ATTEMPTS: int = 4
+    OPENAI_RETRY_BASE_SECONDS: float = 0.5
+    OPENAI_RETRY_MAX_SECONDS: float = 8.0
+    # duplicate an embedding request still running after this percentile of
+    # the recent embedding latencies, e.g. 95 (0 = off)
+    OPENAI_EMBEDDING_HEDGE_PERCENTILE: float = 0.0
+    # consecutive failed attempts that open an operation's circuit (0 = never),
+    # and how long it fails fast before letting a probe call through
+    OPENAI_BREAKER_FAILURE_THRESHOLD: int = 5
+    OPENAI_BREAKER_RESET_SECONDS: float = 30.0
+
+    # build the OpenAI clients and load the tokenizer during startup, before
+    # the worker reports ready, instead of on the first request that needs them
+    STARTUP_PREWARM: bool = True
+
+    # shared supabase connection pool
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 100
+    SUPABASE_POOL_MAX_KEEPALIVE: int = 20
+    SUPABASE_TIMEOUT_SECONDS: float = 30.0
+
+    # disable only for load tests
+    RATE_LIMIT_ENABLED: bool = True
+    # where limit counters live: "memory://" (per process), "sqlite:///path.db"
+    # (shared by the workers of a host) or "redis://host:6379" (needs `redis`)
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
+    # OpenAI tokens a client may spend per minute (embedded text, prompts and
+    # completion max_tokens), 0 = unlimited
+    RATE_LIMIT_TOKENS_PER_MINUTE: int = 100_000
+    # separate, larger budget for bulk ingestion, so a bulk upload neither
+    # starves nor is starved by the client's interactive calls (the ingest
+    # CLI is not budgeted)
+    RATE_LIMIT_BULK_TOKENS_PER_MINUTE: int = 2_000_000
+
+    # offline stand-ins for load tests and local runs: "fake" embeddings / chat
+    # (hash vectors, canned JSON) and a "memory" database
+    EMBEDDING_PROVIDER: str = "openai"
+    LLM_PROVIDER: str = "openai"
+    DATABASE_PROVIDER: str = "supabase"
+    FAKE_EMBEDDING_LATENCY_MS: float = 0.0
+    # fake chat: time to first token, then output speed (0 = instant)
+    FAKE_LLM_LATENCY_MS: float = 300.0
+    FAKE_LLM_TOKENS_PER_SECOND: float = 100.0
+    FAKE_LLM_TOKENS_PER_CANDIDATE: int = 60
+    FAKE_DATABASE_LATENCY_MS: float = 0.0
+
+    # compact embeddings: fewer dimensions (0 = model default, the database
+    # vector columns must match) and components rounded to this many decimals
+    # before they are sent as JSON (0 = full precision)
+    EMBEDDING_DIMENSIONS: int = 0
+    EMBEDDING_DECIMALS: int = 0
+
+    # embedding micro-batching
+    EMBEDDING_BATCH_WINDOW_MS: float = 10.0
+    EMBEDDING_BATCH_MAX_SIZE: int = 256
+    EMBEDDING_BATCH_MAX_TOKENS: int = 250_000
+
+    # embedding cache (empty path disables the on-disk tier, 0 disk entries
+    # leaves it unbounded); disk writes are committed in batches
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10_000
+    EMBEDDING_CACHE_PATH: str = ".cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_DISK_ENTRIES: int = 200_000
+    EMBEDDING_CACHE_FLUSH_SECONDS: float = 1.0
+
+    # search analysis: larger candidate pools are split into concurrent shards
+    LLM_ANALYSIS_SHARD_SIZE: int = 5
+    LLM_ANALYSIS_CONCURRENCY: int = 4
+    # input tokens per analysis prompt; resumes get more room the better they score
+    LLM_PROMPT_TOKEN_BUDGET: int = 12_000
+    LLM_RESUME_MIN_TOKENS: int = 60
+    LLM_RESUME_MAX_TOKENS: int = 1_000
+
+    # long applicant texts are embedded as overlapping token windows (one vector
+    # per chunk, scored by the best chunk) instead of being rejected
+    EMBEDDING_CHUNKING_ENABLED: bool = False
+    EMBEDDING_CHUNK_TOKENS: int = 512
+    EMBEDDING_CHUNK_OVERLAP: int = 64
+    EMBEDDING_CHUNKED_MAX_TOKENS: int = 100_000
+
+    # created jobs and applicants are embedded by background workers draining
+    # a durable queue in this SQLite file (empty = in memory, lost on restart)
+    EMBEDDING_QUEUE_PATH: str = ".cache/embedding_queue.sqlite3"
+    EMBEDDING_WORKERS: int = 2
+    # queued records embedded together per worker round
+    EMBEDDING_WORKER_BATCH_SIZE: int = 256
+    EMBEDDING_WORKER_POLL_SECONDS: float = 1.0
+    # a task not finished within the lease is picked up again
+    EMBEDDING_WORKER_LEASE_SECONDS: float = 300.0
+    # failed tasks are retried with exponential backoff, then marked failed
+    EMBEDDING_MAX_ATTEMPTS: int = 5
+    EMBEDDING_RETRY_BASE_SECONDS: float = 2.0
+    EMBEDDING_RETRY_MAX_SECONDS: float = 300.0
+    # pending rows are re-queued this often (a record that could not be
+    # queued when it was created), 0 = only at startup
+    EMBEDDING_RECOVERY_SECONDS: float = 300.0
+
+    # bulk applicant ingestion
+    BULK_INGEST_CHUNK_SIZE: int = 500
+    BULK_INGEST_CONCURRENCY: int = 4
+    BULK_INGEST_SPOOL_BYTES: int = 8 * 1024 * 1024
+
+    # applicant search ("rpc" scores in Postgres, "local" scores in-process)
+    SEARCH_BACKEND: str = "rpc"
+    SEARCH_TOP_K: int = 10
+    SEARCH_INDEX_DIR: str = ""
+    SEARCH_INDEX_MMAP: bool = True
+    # local backend: job indexes kept in memory (least recently searched are
+    # dropped), and seconds between checks against the database for writes
+    # made by other workers (0 = before every search)
+    SEARCH_INDEX_MAX_JOBS: int = 256
+    SEARCH_INDEX_REVALIDATE_SECONDS: float = 30.0
+    # local backend switches to an IVF index past this many applicant vectors
+    # per job (jobs are loaded page by page, so any size is reachable)
+    SEARCH_ANN_MIN_SIZE: int = 20_000
+    SEARCH_ANN_LISTS: int = 0  # 0 = about 4 * sqrt(n)
+    SEARCH_ANN_NPROBE: int = 8
+    # local backend vector storage: "float32", "int8" or "binary" (int8 + sign
+    # bits, Hamming shortlist of SEARCH_BINARY_RESCORE * k rescored with int8);
+    # applies to exact search only, IVF indexes keep float32 lists
+    SEARCH_VECTOR_PRECISION: str = "float32"
+    SEARCH_BINARY_RESCORE: int = 8
+
+    # recommended applicants materialized per job (by job vs applicant
+    # embedding similarity), kept current as jobs and applicants are embedded
+    RECOMMENDATIONS_ENABLED: bool = True
+    RECOMMENDATIONS_TOP_K: int = 50
+
+    # cache of full search responses (0 entries or 0 ttl disables it)
+    SEARCH_CACHE_MAX_ENTRIES: int = 1_000
+    SEARCH_CACHE_TTL_SECONDS: float = 600.0
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False)
 
 
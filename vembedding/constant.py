@@ -7,6 +7,21 @@ class TableNamesConst:
     JOBS = "jobs"
     APPLICANTS = "applicants"
     APPLICATIONS = "applications"
+    APPLICANT_CHUNKS = "applicant_chunks"
+    # shadow table filled by a re-embedding run until its cutover
+    APPLICANT_CHUNKS_NEXT = "applicant_chunks_next"
+    # materialized top-K applicants per job
+    JOB_RECOMMENDATIONS = "job_recommendations"
+    # best jobs per applicant, written by the nightly batch match
+    APPLICANT_JOB_MATCHES = "applicant_job_matches"
+
+
+class EmbeddingStatusConst:
+    """`embedding_status` of jobs and applicants (embedded by background workers)"""
+
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
 
 
 class RateLimitsConst:
@@ -22,6 +37,40 @@ class EmbeddingModelsConst:
     OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
 
 
+class SearchBackendsConst:
+    """Applicant search backends"""
+
+    RPC = "rpc"
+    LOCAL = "local"
+
+
+class VectorPrecisionsConst:
+    """How the local search backend stores vectors"""
+
+    FLOAT32 = "float32"
+    INT8 = "int8"
+    # int8 plus sign bits, ranked by Hamming distance then rescored
+    BINARY = "binary"
+
+
+class FusionModesConst:
+    """How hybrid search combines the vector and lexical (BM25) rankings"""
+
+    # reciprocal rank fusion
+    RRF = "rrf"
+    # weighted sum of the cosine and the max-normalized BM25 score
+    WEIGHTED = "weighted"
+
+
+class ProvidersConst:
+    """Backends for the external services ("fake" / "memory" run offline)"""
+
+    OPENAI = "openai"
+    FAKE = "fake"
+    SUPABASE = "supabase"
+    MEMORY = "memory"
+
+
 class LLMModelsConst:
     """LLM models for the application"""
 
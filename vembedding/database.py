@@ -0,0 +1,125 @@
+import asyncio
+import copy
+from typing import Optional, Union
+
+import httpx
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+
+from vembedding.config import settings
+from vembedding.constant import ProvidersConst
+from vembedding.providers.memory_db import MemorySupabase
+
+
+class SupabasePool:
+    """
+    One async Supabase client per process, backed by a pooled keep-alive
+    httpx client, instead of a fresh client (and TLS handshake) per request.
+
+    `with_auth` returns a client scoped to a user token that still shares the
+    same connection pool; only the request headers differ.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        max_connections: int,
+        max_keepalive_connections: int,
+        timeout: float,
+    ):
+        self.url = url
+        self.key = key
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.timeout = timeout
+        self._http: Optional[httpx.AsyncClient] = None
+        self._client: Optional[AsyncClient] = None
+        self._lock = asyncio.Lock()
+
+    async def open(self) -> AsyncClient:
+        """create the shared client (idempotent)"""
+        async with self._lock:
+            if self._client is None:
+                self._http = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                    ),
+                    timeout=self.timeout,
+                    follow_redirects=True,
+                )
+                self._client = await acreate_client(
+                    self.url,
+                    self.key,
+                    options=AsyncClientOptions(
+                        httpx_client=self._http,
+                        postgrest_client_timeout=self.timeout,
+                    ),
+                )
+            return self._client
+
+    async def close(self) -> None:
+        """close pooled connections; the next use reopens the pool"""
+        async with self._lock:
+            if self._http is not None:
+                await self._http.aclose()
+            self._http = None
+            self._client = None
+
+    async def get_client(self) -> AsyncClient:
+        return self._client or await self.open()
+
+    async def with_auth(self, token: str) -> AsyncClient:
+        """a client that sends `token` as the bearer, on the shared pool"""
+        base = await self.get_client()
+        scoped = copy.copy(base)
+        scoped.options = copy.copy(base.options)
+        scoped.options.headers = {
+            **base.options.headers,
+            "Authorization": f"Bearer {token}",
+        }
+        # sub-clients are built lazily from `options`, so drop the shared ones
+        scoped._postgrest = None
+        scoped._storage = None
+        scoped._functions = None
+        return scoped
+
+
+class MemoryPool:
+    """
+    SupabasePool interface over a single in-memory database
+    (DATABASE_PROVIDER=memory); data lives as long as the process
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.client = MemorySupabase(latency=latency)
+
+    async def open(self) -> MemorySupabase:
+        return self.client
+
+    async def close(self) -> None:
+        pass
+
+    async def get_client(self) -> MemorySupabase:
+        return self.client
+
+    async def with_auth(self, token: str) -> MemorySupabase:
+        return self.client
+
+
+def build_supabase_pool(provider: str) -> Union[SupabasePool, MemoryPool]:
+    """create the database pool selected in settings"""
+    if provider == ProvidersConst.MEMORY:
+        return MemoryPool(latency=settings.FAKE_DATABASE_LATENCY_MS / 1000)
+    if provider == ProvidersConst.SUPABASE:
+        return SupabasePool(
+            url=settings.SUPABASE_URL,
+            key=settings.SUPABASE_ANON_KEY,
+            max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+            timeout=settings.SUPABASE_TIMEOUT_SECONDS,
+        )
+    raise ValueError(f"Unknown database provider: {provider}")
+
+
+supabase_pool = build_supabase_pool(settings.DATABASE_PROVIDER)
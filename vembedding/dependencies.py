@@ -1,11 +1,13 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import Client, create_client
+from slowapi.util import get_remote_address
+from supabase import AsyncClient
 
 from vembedding.applicants.service import ApplicantService, applicant
 from vembedding.application.service import ApplicationService, application
 from vembedding.jobs.service import JobService, job
-from vembedding.config import settings
+from vembedding.database import supabase_pool
+from vembedding.rate_limiter import ClientBudget, bulk_token_budget, token_budget
 
 security = HTTPBearer()
 
@@ -13,31 +15,27 @@ security = HTTPBearer()
 # ========================#
 # Supabase Dependencies   #
 # ========================#
-def get_supabase_client_no_auth() -> Client:
-    """Create a supabase client without authentication"""
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
+async def get_supabase_client_no_auth() -> AsyncClient:
+    """Shared supabase client without authentication"""
+    return await supabase_pool.get_client()
 
 
-def get_supabase_client(
+async def get_supabase_client(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-) -> Client:
-    """Create a supabase client with auth context"""
-    client = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
-
+) -> AsyncClient:
+    """Shared supabase client with the request's auth context"""
     token = credentials.credentials
-    client.postgrest.auth(token)
-
-    return client
+    return await supabase_pool.with_auth(token)
 
 
-def get_user_id(
-    supabase: Client = Depends(get_supabase_client),
+async def get_user_id(
+    supabase: AsyncClient = Depends(get_supabase_client),
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> str:
     """Get the user ID from the credentials"""
     try:
         token = credentials.credentials
-        user = supabase.auth.get_user(token)
+        user = await supabase.auth.get_user(token)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -53,6 +51,19 @@ def get_user_id(
     return user.user.id
 
 
+# ========================#
+# Rate Limit Dependencies #
+# ========================#
+def get_token_budget(request: Request) -> ClientBudget:
+    """OpenAI token budget of the calling client (same key as the limiter)"""
+    return ClientBudget(token_budget, get_remote_address(request))
+
+
+def get_bulk_token_budget(request: Request) -> ClientBudget:
+    """the calling client's separate token budget for bulk ingestion"""
+    return ClientBudget(bulk_token_budget, get_remote_address(request))
+
+
 # ========================#
 # Service Dependencies    #
 # ========================#
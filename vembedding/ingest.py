@@ -0,0 +1,62 @@
+"""
+Bulk applicant ingestion from the command line.
+
+    python -m vembedding.ingest applicants.ndjson
+    python -m vembedding.ingest export.csv --format csv --report report.ndjson
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from typing import Optional
+
+from vembedding.applicants.bulk import (
+    CSV,
+    NDJSON,
+    encode_report,
+    iter_file,
+    parse_records,
+)
+from vembedding.applicants.service import applicant
+from vembedding.database import supabase_pool
+
+
+async def ingest(path: str, fmt: str, report_path: Optional[str]) -> dict:
+    """stream a file into the applicants table and write the per-row report"""
+    supabase = await supabase_pool.open()
+    rows = parse_records(iter_file(open(path, "rb")), fmt)
+    results = applicant.bulk_create_applicants(rows, supabase)
+
+    out = open(report_path, "wb") if report_path else sys.stdout.buffer
+    summary = {}
+    try:
+        async for line in encode_report(results):
+            out.write(line)
+            if line.startswith(b'{"summary"'):
+                summary = json.loads(line)["summary"]
+    finally:
+        if report_path:
+            out.close()
+        await supabase_pool.close()
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk ingest applicants")
+    parser.add_argument("path", help="NDJSON or CSV file with applicant records")
+    parser.add_argument(
+        "--format",
+        choices=[NDJSON, CSV],
+        help="record format (default: from the file extension)",
+    )
+    parser.add_argument("--report", help="write the per-row report here, not stdout")
+    args = parser.parse_args()
+
+    fmt = args.format or (CSV if args.path.lower().endswith(".csv") else NDJSON)
+    summary = asyncio.run(ingest(args.path, fmt, args.report))
+    print(f"Ingestion finished: {summary}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Set
+
+from vembedding.ai.cache import normalize_text
+from vembedding.config import settings
+from vembedding.metrics import counter, gauge
+
+CACHE_HITS = counter("search_cache_hits_total", "Search responses served from cache")
+CACHE_MISSES = counter("search_cache_misses_total", "Search response cache misses")
+CACHE_INVALIDATIONS = counter(
+    "search_cache_invalidations_total",
+    "Cached search responses dropped, by reason",
+    labelnames=("reason",),
+)
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    job_id: str
+    response: Dict
+
+
+class SearchResponseCache:
+    """
+    Bounded TTL cache of full search responses (results + AI analysis).
+
+    Keys cover the job (id and `updated_at`), the normalized query, the
+    search options that shape the response (must-have terms, fusion) and the
+    ranked candidate set (ids and scores), so a response is only reused when
+    the model would be shown exactly the same input: a newly embedded or
+    re-embedded applicant changes the candidate set, and so the key. Writes
+    that change a job's applications call `invalidate_job`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_job: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def make_key(
+        job_info: Dict,
+        query: str,
+        candidates: List[Dict],
+        options: Optional[Dict] = None,
+    ) -> str:
+        fingerprint = [
+            (str(c.get("id")), round(float(c.get("similarity_score") or 0.0), 6))
+            for c in candidates
+        ]
+        digest = hashlib.sha256()
+        digest.update(str(job_info.get("id")).encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(str(job_info.get("updated_at")).encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(normalize_text(query).lower().encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(json.dumps(options or {}, sort_keys=True).encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(json.dumps(fingerprint).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(
+        self,
+        job_info: Dict,
+        query: str,
+        candidates: List[Dict],
+        options: Optional[Dict] = None,
+    ) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        key = self.make_key(job_info, query, candidates, options)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self.clock():
+                self._drop(key)
+                CACHE_INVALIDATIONS.inc(reason="expired")
+                entry = None
+            if entry is None:
+                CACHE_MISSES.inc()
+                return None
+            self._entries.move_to_end(key)
+
+        CACHE_HITS.inc()
+        return copy.deepcopy(entry.response)
+
+    def put(
+        self,
+        job_info: Dict,
+        query: str,
+        candidates: List[Dict],
+        response: Dict,
+        options: Optional[Dict] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        key = self.make_key(job_info, query, candidates, options)
+        job_id = str(job_info.get("id"))
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(
+                expires_at=self.clock() + self.ttl_seconds,
+                job_id=job_id,
+                response=copy.deepcopy(response),
+            )
+            self._by_job.setdefault(job_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                CACHE_INVALIDATIONS.inc(reason="evicted")
+
+    def invalidate_job(self, job_id: str) -> int:
+        """drop every cached search of `job_id`"""
+        with self._lock:
+            keys = list(self._by_job.get(str(job_id), ()))
+            for key in keys:
+                self._drop(key)
+        if keys:
+            CACHE_INVALIDATIONS.inc(len(keys), reason="job")
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_job.clear()
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._discard(self._by_job, entry.job_id, key)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], name: str, key: str) -> None:
+        keys = index.get(name)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[name]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "jobs": len(self._by_job),
+            }
+
+
+search_cache = SearchResponseCache(
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+)
+
+gauge("search_cache_entries", "Search responses held in the cache").set_function(
+    lambda: len(search_cache)
+)
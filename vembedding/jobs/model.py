@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 from uuid import UUID
 
@@ -26,11 +26,50 @@ class JobResponse(JobBase):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    # pending until a background worker has embedded it, then ready (or failed)
+    embedding_status: Optional[str] = None
     # embedding: Optional[List[float]] = None
 
 
-class SearchApplicants(BaseModel):
+class RecommendedApplicant(BaseModel):
+    applicant_id: UUID
+    name: Optional[str] = None
+    email: Optional[str] = None
+    skills: Optional[str] = None
+    experience: Optional[str] = None
+    # cosine similarity of the job and applicant embeddings
+    score: float
+    # already applied to the job
+    applied: bool
+
+
+class RecommendedApplicantsResponse(BaseModel):
+    job_id: UUID
+    total: int
+    results: List[RecommendedApplicant]
+
+
+class SearchOptions(BaseModel):
+    # IVF lists to probe (local backend); higher = better recall, slower
+    nprobe: Optional[int] = Field(default=None, ge=1)
+    # terms (or phrases) every candidate's skills, experience or resume must
+    # contain; applicants without them are filtered out before scoring
+    must_have: List[str] = Field(default_factory=list, max_length=20)
+    # combine the vector ranking with a BM25 ranking of the query words
+    fusion: Optional[Literal["rrf", "weighted"]] = None
+    # share of the (max-normalized) BM25 score with "weighted" fusion
+    lexical_weight: float = Field(default=0.3, ge=0.0, le=1.0)
+
+
+class SearchApplicants(SearchOptions):
     query: str
 
     class Config:
         from_attributes = True
+
+
+class SearchApplicantsBatch(SearchOptions):
+    # variants of a search for the same job, each ranked on its own
+    queries: List[str] = Field(min_length=1, max_length=20)
+    # one AI analysis of every candidate found, each candidate analyzed once
+    analyze: bool = False
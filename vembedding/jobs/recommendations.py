@@ -0,0 +1,148 @@
+import logging
+from typing import Dict, Iterable, List
+from fastapi import HTTPException, status
+from postgrest import APIError
+from supabase import AsyncClient
+
+from vembedding.config import settings
+from vembedding.constant import EmbeddingStatusConst, TableNamesConst
+from vembedding.timing import stage
+
+RECOMMENDATION_COLUMNS = (
+    "applicant_id,score,applied,"
+    f"{TableNamesConst.APPLICANTS}(name,email,skills,experience)"
+)
+
+
+class Recommendations:
+    """
+    Materialized top-K applicants of every job, ranked by the similarity of
+    the job's and the applicants' embeddings, in `job_recommendations`
+    (see supabase/migrations). Reads are a single indexed lookup.
+
+    Lists are maintained incrementally: an embedded job gets its list from
+    one nearest-neighbour query, a batch of embedded applicants is scored
+    against every embedded job in one statement (and only lists whose K-th
+    score is beaten are written), a new application flags its row.
+    Maintenance is best effort: the embedding is stored either way, and a
+    job's empty list is rebuilt on read.
+    """
+
+    def __init__(self, top_k: int, enabled: bool = True):
+        self.top_k = top_k
+        self.enabled = enabled and top_k > 0
+
+    async def build_for_job(self, job_id: str, supabase: AsyncClient) -> None:
+        """(re)build an embedded job's list from every embedded applicant"""
+        if not self.enabled:
+            return
+        try:
+            with stage("recommendations"):
+                await supabase.rpc(
+                    "build_job_recommendations",
+                    {"job_id_param": job_id, "match_count": self.top_k},
+                ).execute()
+        except Exception as e:
+            # the job is already ready, its list is rebuilt on read
+            logging.warning(f"Error building recommendations of job {job_id}: {e}")
+
+    async def add_applicants(
+        self, applicant_ids: Iterable[str], supabase: AsyncClient
+    ) -> None:
+        """merge embedded applicants into every job list they rank in"""
+        applicant_ids = [str(applicant_id) for applicant_id in applicant_ids]
+        if not self.enabled or not applicant_ids:
+            return
+        try:
+            with stage("recommendations"):
+                await supabase.rpc(
+                    "add_applicant_recommendations",
+                    {"applicant_ids": applicant_ids, "match_count": self.top_k},
+                ).execute()
+        except Exception as e:
+            logging.warning(
+                f"Error adding {len(applicant_ids)} applicants to recommendations: {e}"
+            )
+
+    async def mark_applied(
+        self, job_id: str, applicant_ids: Iterable[str], supabase: AsyncClient
+    ) -> None:
+        """flag recommended applicants that have applied to the job"""
+        applicant_ids = [str(applicant_id) for applicant_id in applicant_ids]
+        if not self.enabled or not applicant_ids:
+            return
+        try:
+            with stage("recommendations"):
+                await (
+                    supabase.table(TableNamesConst.JOB_RECOMMENDATIONS)
+                    .update({"applied": True})
+                    .eq("job_id", str(job_id))
+                    .in_("applicant_id", applicant_ids)
+                    .execute()
+                )
+        except APIError as e:
+            logging.warning(f"Error flagging applications of job {job_id}: {e}")
+
+    async def get(self, job_id: str, limit: int, supabase: AsyncClient) -> Dict:
+        """the job's recommended applicants, best first"""
+        if not self.enabled:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Recommendations are disabled",
+            )
+        try:
+            rows = await self._read(job_id, limit, supabase)
+            if not rows:
+                job = await (
+                    supabase.table(TableNamesConst.JOBS)
+                    .select("id,embedding_status")
+                    .eq("id", job_id)
+                    .execute()
+                )
+                if not job.data:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail=f"Job with id {job_id} not found",
+                    )
+                # embedded, but its list was never built (or nobody was embedded)
+                if job.data[0]["embedding_status"] == EmbeddingStatusConst.READY:
+                    await self.build_for_job(job_id, supabase)
+                    rows = await self._read(job_id, limit, supabase)
+        except APIError as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {e}",
+            )
+
+        results = []
+        for row in rows:
+            applicant = row.get(TableNamesConst.APPLICANTS) or {}
+            results.append(
+                {
+                    "applicant_id": row["applicant_id"],
+                    "name": applicant.get("name"),
+                    "email": applicant.get("email"),
+                    "skills": applicant.get("skills"),
+                    "experience": applicant.get("experience"),
+                    "score": row["score"],
+                    "applied": row["applied"],
+                }
+            )
+        return {"job_id": job_id, "total": len(results), "results": results}
+
+    async def _read(self, job_id: str, limit: int, supabase: AsyncClient) -> List[Dict]:
+        with stage("db"):
+            response = await (
+                supabase.table(TableNamesConst.JOB_RECOMMENDATIONS)
+                .select(RECOMMENDATION_COLUMNS)
+                .eq("job_id", job_id)
+                .order("score", desc=True)
+                .limit(min(limit, self.top_k))
+                .execute()
+            )
+        return response.data
+
+
+recommendations = Recommendations(
+    top_k=settings.RECOMMENDATIONS_TOP_K, enabled=settings.RECOMMENDATIONS_ENABLED
+)
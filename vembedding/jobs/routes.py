@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends, Request, status
-from supabase import Client
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from supabase import AsyncClient
 
-from vembedding.rate_limiter import limiter
-from vembedding.dependencies import get_supabase_client_no_auth, get_job_service
+from vembedding.config import settings
+from vembedding.rate_limiter import ClientBudget, limiter
+from vembedding.dependencies import (
+    get_job_service,
+    get_supabase_client_no_auth,
+    get_token_budget,
+)
 from .service import JobService
-from .model import JobResponse, JobCreate, SearchApplicants
+from .model import (
+    JobResponse,
+    JobCreate,
+    RecommendedApplicantsResponse,
+    SearchApplicants,
+    SearchApplicantsBatch,
+)
 
 router = APIRouter(
     prefix="/api/jobs",
@@ -12,16 +24,53 @@ router = APIRouter(
 )
 
 
-@router.post("/", response_model=JobResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
 @limiter.limit("1/minute")
 async def create_job(
     request: Request,
+    response: Response,
     payload: JobCreate,
-    supabase: Client = Depends(get_supabase_client_no_auth),
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
     service: JobService = Depends(get_job_service),
+    budget: ClientBudget = Depends(get_token_budget),
 ) -> JobResponse:
-    """Create a new job"""
-    return await service.create_job(payload, supabase)
+    """
+    Create a new job. The embedding is computed in the background, poll the
+    `Location` (embedding status) until it is `ready`.
+    """
+    job = await service.create_job(payload, supabase, budget)
+    response.headers["Location"] = str(
+        request.url_for("get_job_embedding_status", job_id=job["id"])
+    )
+    return job
+
+
+@router.get("/{job_id}/status", status_code=status.HTTP_200_OK)
+async def get_job_embedding_status(
+    job_id: str,
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
+    service: JobService = Depends(get_job_service),
+):
+    """Embedding status of a job: pending, ready or failed"""
+    return await service.get_embedding_status(job_id, supabase)
+
+
+@router.get(
+    "/{job_id}/recommended-applicants",
+    response_model=RecommendedApplicantsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_recommended_applicants(
+    job_id: str,
+    limit: int = Query(default=settings.RECOMMENDATIONS_TOP_K, ge=1),
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
+    service: JobService = Depends(get_job_service),
+):
+    """
+    Applicants closest to the job post, best first. Served from a list kept
+    up to date as jobs and applicants are embedded, so no query is needed.
+    """
+    return await service.get_recommended_applicants(job_id, limit, supabase)
 
 
 @router.post("/{job_id}/search-applicants", status_code=status.HTTP_200_OK)
@@ -30,8 +79,49 @@ async def search_applicants(
     request: Request,
     job_id: str,
     payload: SearchApplicants,
-    supabase: Client = Depends(get_supabase_client_no_auth),
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
     service: JobService = Depends(get_job_service),
+    budget: ClientBudget = Depends(get_token_budget),
 ):
     """Search for applicants for a job"""
-    return await service.search_applicants(job_id, payload, supabase)
+    return await service.search_applicants(job_id, payload, supabase, budget)
+
+
+@router.post("/{job_id}/search-applicants/batch", status_code=status.HTTP_200_OK)
+@limiter.limit("1/minute")
+async def search_applicants_batch(
+    request: Request,
+    job_id: str,
+    payload: SearchApplicantsBatch,
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
+    service: JobService = Depends(get_job_service),
+    budget: ClientBudget = Depends(get_token_budget),
+):
+    """
+    Search for applicants for a job with several queries at once, one ranking
+    per query; `analyze` adds one AI analysis of every candidate found
+    """
+    return await service.search_applicants_batch(job_id, payload, supabase, budget)
+
+
+@router.post("/{job_id}/search-applicants/stream", status_code=status.HTTP_200_OK)
+@limiter.limit("1/minute")
+async def search_applicants_stream(
+    request: Request,
+    job_id: str,
+    payload: SearchApplicants,
+    supabase: AsyncClient = Depends(get_supabase_client_no_auth),
+    service: JobService = Depends(get_job_service),
+    budget: ClientBudget = Depends(get_token_budget),
+) -> StreamingResponse:
+    """
+    Search for applicants for a job, streaming Server-Sent Events: `results`
+    (ranked candidates), `summary`, one `candidate_analysis` per candidate,
+    then `done` with the full analysis (or `error`)
+    """
+    events = await service.search_applicants_stream(job_id, payload, supabase, budget)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,48 +1,74 @@
+import asyncio
+import json
 import logging
-import time
+import sqlite3
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
 from postgrest import APIError
-from supabase import Client
+from supabase import AsyncClient
 
-from vembedding.constant import TableNamesConst
-from vembedding.ai.llm import generate_search_explanation
-from vembedding.ai.embedding import openai_generate_embedding, validate_text_length
-from .model import JobCreate, JobResponse, SearchApplicants
+from vembedding.constant import EmbeddingStatusConst, TableNamesConst
+from vembedding.ai.llm import generate_search_explanation, stream_search_explanation
+from vembedding.ai.prompts import rank_score
+from vembedding.ai.embedding import (
+    count_tokens,
+    generate_embeddings_in_batches,
+    openai_generate_embedding,
+    openai_generate_query_embeddings,
+    validate_text_length,
+)
+from vembedding.ai.queue import (
+    embedding_queue,
+    fetch_embedding_status,
+    mark_embedding_ready,
+)
+from vembedding.rate_limiter import ClientBudget
+from vembedding.search.engine import search_backend
+from vembedding.search.lexical import LexicalQuery
+from vembedding.timing import stage, timed
+from .cache import search_cache
+from .recommendations import recommendations
+from .model import (
+    JobCreate,
+    JobResponse,
+    SearchApplicants,
+    SearchApplicantsBatch,
+    SearchOptions,
+)
 
 
 class JobService:
     TABLE_NAME = TableNamesConst.JOBS
 
+    @staticmethod
+    def combine_text(payload: JobCreate) -> str:
+        """text that represents a job post for embedding"""
+        return f"{payload.title} {payload.description} {payload.requirements}"
+
     async def create_job(
         self,
         payload: JobCreate,
-        supabase: Client,
+        supabase: AsyncClient,
+        budget: Optional[ClientBudget] = None,
     ) -> JobResponse:
         """Create a new job"""
 
         # safety checks
-        combine_text = f"{payload.title} {payload.description} {payload.requirements}"
+        combine_text = self.combine_text(payload)
         token_count = validate_text_length(combine_text)
+        if budget is not None:
+            budget.charge(token_count)
 
         logging.info(f"Token count: {token_count}")
 
-        # generate embedding for the job post
-        try:
-            embedding = await openai_generate_embedding(combine_text)
-            if not embedding:
-                raise ValueError("Embedding generation returned empty result")
-
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error generating embedding: {e}",
-            )
-
-        # store the job post in the database
+        # store the job post now, background workers add the embedding
         try:
             job_data = payload.model_dump(mode="json")
-            job_data["embedding"] = embedding
-            response = supabase.table(self.TABLE_NAME).insert(job_data).execute()
+            job_data["embedding_status"] = EmbeddingStatusConst.PENDING
+            with stage("db"):
+                response = (
+                    await supabase.table(self.TABLE_NAME).insert(job_data).execute()
+                )
 
             if not response.data:
                 raise ValueError("Database insertion returned empty result")
@@ -53,60 +79,252 @@ class JobService:
                 detail=f"Error storing job post: {e}",
             )
 
+        try:
+            await embedding_queue.enqueue(self.TABLE_NAME, [response.data[0]["id"]])
+        except sqlite3.Error as e:
+            # the row is stored: the periodic recovery queues it
+            logging.error(f"Error queueing {response.data[0]['id']} for embedding: {e}")
         return response.data[0]
 
-    async def search_applicants(
+    async def get_embedding_status(self, job_id: str, supabase: AsyncClient):
+        """Embedding status of a job post"""
+        return await fetch_embedding_status(self.TABLE_NAME, job_id, "Job", supabase)
+
+    async def embed_pending(
+        self, job_ids: List[str], supabase: AsyncClient
+    ) -> Dict[str, str]:
+        """
+        Embed queued job posts in as few calls as the API limits allow and
+        mark them ready. Returns the error of every job to retry.
+        """
+        with stage("db"):
+            response = await (
+                supabase.table(self.TABLE_NAME)
+                .select("id,title,description,requirements,author,embedding_status")
+                .in_("id", job_ids)
+                .execute()
+            )
+        # deleted or already embedded jobs have nothing left to do
+        pending = [
+            row
+            for row in response.data
+            if row["embedding_status"] == EmbeddingStatusConst.PENDING
+        ]
+
+        texts = []
+        for row in pending:
+            combine_text = self.combine_text(JobCreate.model_validate(row))
+            texts.append((str(row["id"]), combine_text, count_tokens(combine_text)))
+        vectors, batch_errors = await generate_embeddings_in_batches(texts)
+        errors = {
+            job_id: f"Error generating embedding: {error}"
+            for job_id, error in batch_errors.items()
+        }
+
+        embedded = [(job_id, vector) for job_id, vector in vectors.items() if vector]
+        stored = await asyncio.gather(
+            *(
+                mark_embedding_ready(self.TABLE_NAME, job_id, vector, supabase)
+                for job_id, vector in embedded
+            ),
+            return_exceptions=True,
+        )
+        for (job_id, _), result in zip(embedded, stored):
+            if isinstance(result, Exception):
+                errors[job_id] = f"Error storing embedding: {result}"
+        await asyncio.gather(
+            *(
+                recommendations.build_for_job(job_id, supabase)
+                for job_id, _ in embedded
+                if job_id not in errors
+            )
+        )
+        return errors
+
+    async def get_recommended_applicants(
+        self, job_id: str, limit: int, supabase: AsyncClient
+    ):
+        """Recommended applicants of a job, precomputed (no embedding call)"""
+        return await recommendations.get(job_id, limit, supabase)
+
+    @staticmethod
+    def lexical_query(options: SearchOptions, text: str) -> LexicalQuery:
+        """the lexical side of a search for `text`"""
+        return LexicalQuery(
+            text=text,
+            must_have=options.must_have,
+            fusion=options.fusion,
+            weight=options.lexical_weight,
+        )
+
+    @staticmethod
+    def cache_options(options: SearchOptions) -> Dict:
+        """the search options that change a response, for its cache key"""
+        return {
+            "must_have": sorted(term.lower() for term in options.must_have),
+            "fusion": options.fusion,
+            # only weighs in with weighted fusion
+            "lexical_weight": (
+                options.lexical_weight if options.fusion == "weighted" else None
+            ),
+        }
+
+    async def _find_candidates(
         self,
         job_id: str,
         payload: SearchApplicants,
-        supabase: Client,
-    ):
-        """Search applicants inside a job post"""
+        supabase: AsyncClient,
+        budget: Optional[ClientBudget] = None,
+    ) -> Tuple[Dict, List[Dict]]:
+        """Fetch the job and rank its applicants against the query"""
+
+        if budget is not None:
+            budget.charge(count_tokens(payload.query))
 
         try:
-            job = supabase.table(self.TABLE_NAME).select("*").eq("id", job_id).execute()
+            # the job lookup and the query embedding are independent, overlap them
+            job, query_embedding = await asyncio.gather(
+                timed(
+                    "db",
+                    supabase.table(self.TABLE_NAME)
+                    .select("*")
+                    .eq("id", job_id)
+                    .execute(),
+                ),
+                openai_generate_embedding(payload.query),
+            )
             if not job.data:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail=f"Job with id {job_id} not found",
                 )
-
-            # start_total = time.time()
-            # start_embedding = time.time()
-            query_embedding = await openai_generate_embedding(payload.query)
-            # embedding_time = (time.time() - start_embedding) * 1000
-            # print(f"⏱️ Embedding generation: {embedding_time:.0f}ms")
             if not query_embedding:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Error generating query embedding",
                 )
 
-            # start_db = time.time()
-            response = supabase.rpc(
-                "search_applicants_for_job",
-                {
-                    "job_id_param": job_id,
-                    "query_embedding": query_embedding,
-                },
-            ).execute()
-            # db_time = (time.time() - start_db) * 1000
-            # print(f"⏱️ Database query: {db_time:.0f}ms")
-            if not response.data:
+            with stage("search"):
+                candidates = await search_backend.search(
+                    job_id,
+                    query_embedding,
+                    supabase,
+                    nprobe=payload.nprobe,
+                    lexical=self.lexical_query(payload, payload.query),
+                )
+            # nobody having every must-have term is an answer, not an error
+            if not candidates and not payload.must_have:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Error searching applicants inside job",
                 )
 
-            # get explanation based on the user query
-            job_info = job.data[0]
-            candidates = response.data
-            ai_analysis = None
-            if candidates:
+        except APIError as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {e}",
+            )
+
+        return job.data[0], candidates
+
+    async def search_applicants(
+        self,
+        job_id: str,
+        payload: SearchApplicants,
+        supabase: AsyncClient,
+        budget: Optional[ClientBudget] = None,
+    ):
+        """Search applicants inside a job post"""
+
+        job_info, candidates = await self._find_candidates(
+            job_id, payload, supabase, budget
+        )
+
+        # same job, query, options and ranked candidates: reuse the previous
+        # analysis
+        options = self.cache_options(payload)
+        cached = search_cache.get(job_info, payload.query, candidates, options)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        # get explanation based on the user query
+        ai_analysis = None
+        if candidates:
+            with stage("llm"):
                 ai_analysis = await generate_search_explanation(
                     job_info=job_info,
                     candidates=candidates,
                     query=payload.query,
+                    charge=budget.charge if budget is not None else None,
+                )
+
+        response = {
+            "job_id": job_id,
+            "job_title": job_info["title"],
+            "query": payload.query,
+            "total_candidates": len(candidates),
+            "results": candidates,
+            "ai_analysis": ai_analysis,
+        }
+        search_cache.put(job_info, payload.query, candidates, response, options)
+        return {**response, "cached": False}
+
+    async def search_applicants_batch(
+        self,
+        job_id: str,
+        payload: SearchApplicantsBatch,
+        supabase: AsyncClient,
+        budget: Optional[ClientBudget] = None,
+    ):
+        """
+        Search applicants inside a job post with several queries: the job is
+        fetched once, every query embedded in one call and ranked in one pass.
+        The optional analysis covers each distinct candidate once.
+        """
+
+        # one over-long query would fail the whole embedding call
+        token_count = sum(
+            validate_text_length(query, min_tokens=1) for query in payload.queries
+        )
+        if budget is not None:
+            budget.charge(token_count)
+
+        try:
+            job, query_embeddings = await asyncio.gather(
+                timed(
+                    "db",
+                    supabase.table(self.TABLE_NAME)
+                    .select("*")
+                    .eq("id", job_id)
+                    .execute(),
+                ),
+                openai_generate_query_embeddings(payload.queries),
+            )
+            if not job.data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Job with id {job_id} not found",
+                )
+            if not all(query_embeddings):
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Error generating query embedding",
+                )
+
+            with stage("search"):
+                rankings = await search_backend.search_many(
+                    job_id,
+                    query_embeddings,
+                    supabase,
+                    nprobe=payload.nprobe,
+                    lexical=[
+                        self.lexical_query(payload, query) for query in payload.queries
+                    ],
+                )
+            if not any(rankings) and not payload.must_have:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Error searching applicants inside job",
                 )
 
         except APIError as e:
@@ -114,19 +332,136 @@ class JobService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Database error: {e}",
             )
-        except HTTPException as e:
-            raise
 
-        # total_time = (time.time() - start_total) * 1000
-        # print(f"⏱️ Total time: {total_time:.0f}ms")
+        job_info = job.data[0]
+        candidates = merge_rankings(rankings)
+        ai_analysis = None
+        if payload.analyze and candidates:
+            with stage("llm"):
+                ai_analysis = await generate_search_explanation(
+                    job_info=job_info,
+                    candidates=candidates,
+                    query="; ".join(payload.queries),
+                    charge=budget.charge if budget is not None else None,
+                )
+
         return {
             "job_id": job_id,
             "job_title": job_info["title"],
-            "query": payload.query,
+            "searches": [
+                {
+                    "query": query,
+                    "total_candidates": len(results),
+                    "results": results,
+                }
+                for query, results in zip(payload.queries, rankings)
+            ],
+            # distinct applicants over every query
             "total_candidates": len(candidates),
-            "results": candidates,
             "ai_analysis": ai_analysis,
         }
 
+    async def search_applicants_stream(
+        self,
+        job_id: str,
+        payload: SearchApplicants,
+        supabase: AsyncClient,
+        budget: Optional[ClientBudget] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Search applicants and stream the result as Server-Sent Events.
+
+        Lookup errors are raised before streaming starts so they keep their
+        HTTP status; the ranked candidates are sent first, then the analysis
+        of each candidate as soon as the model has finished writing it.
+        A spent token budget is only known once the analysis is planned, so
+        it arrives as an in-band `error` event.
+        """
+
+        job_info, candidates = await self._find_candidates(
+            job_id, payload, supabase, budget
+        )
+        return self._stream_search_events(
+            job_id, job_info, payload.query, candidates, budget
+        )
+
+    async def _stream_search_events(
+        self,
+        job_id: str,
+        job_info: Dict,
+        query: str,
+        candidates: List[Dict],
+        budget: Optional[ClientBudget] = None,
+    ) -> AsyncIterator[str]:
+        yield format_sse(
+            "results",
+            {
+                "job_id": job_id,
+                "job_title": job_info["title"],
+                "query": query,
+                "total_candidates": len(candidates),
+                "results": candidates,
+            },
+        )
+
+        if not candidates:
+            yield format_sse("done", {"ai_analysis": None})
+            return
+
+        try:
+            async for event, data in stream_search_explanation(
+                job_info=job_info,
+                candidates=candidates,
+                query=query,
+                charge=budget.charge if budget is not None else None,
+            ):
+                if event == "candidate":
+                    yield format_sse("candidate_analysis", data)
+                elif event == "overall_summary":
+                    yield format_sse("summary", {"overall_summary": data})
+                elif event == "analysis":
+                    yield format_sse("done", {"ai_analysis": data})
+
+        except HTTPException as e:
+            # the response has already started, report the failure in-band
+            yield format_sse(
+                "error", {"status_code": e.status_code, "detail": e.detail}
+            )
+        except Exception as e:
+            # e.g. a malformed chunk the incremental parser cannot read
+            logging.exception("Streaming the search analysis failed")
+            yield format_sse(
+                "error",
+                {
+                    "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    "detail": f"Error generating search analysis: {e}",
+                },
+            )
+
+
+def merge_rankings(rankings: List[List[Dict]]) -> List[Dict]:
+    """
+    the distinct candidates of several rankings, each with its best score and
+    the indexes of the queries that found it, best first
+    """
+    merged: Dict[str, Dict] = {}
+    for query_index, results in enumerate(rankings):
+        for candidate in results:
+            applicant_id = str(candidate["id"])
+            found = merged.get(applicant_id)
+            if found is None or rank_score(candidate) > rank_score(found):
+                queries = found["matched_queries"] if found else []
+                found = merged[applicant_id] = {
+                    **candidate,
+                    "matched_queries": queries,
+                }
+            found["matched_queries"].append(query_index)
+    return sorted(merged.values(), key=rank_score, reverse=True)
+
+
+def format_sse(event: str, data) -> str:
+    """encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
 
 job = JobService()
@@ -1,27 +1,65 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from slowapi.errors import RateLimitExceeded
 
 from vembedding.ai.embedding import (
     MAX_TOKEN_LENGTH,
     MIN_TOKEN_LENGTH,
+    cache as embedding_cache,
     validate_text_length,
 )
+from vembedding.config import settings
 from vembedding.jobs.routes import router as jobs_router
 from vembedding.applicants.routes import router as applicants_router
 from vembedding.application.routes import router as applications_router
+from vembedding.database import supabase_pool
+from vembedding.jobs.cache import search_cache
+from vembedding.metrics import registry
+from vembedding.providers.registry import providers
+from vembedding.providers.resilience import UpstreamError
+from vembedding.search.engine import search_backend
+from vembedding.timing import ServerTimingMiddleware, TimedJSONResponse
+from vembedding.workers import embedding_workers
 from .rate_limiter import limiter
 
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(levelname)s - %(message)s - %(asctime)s - %(name)s"
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    supabase = await supabase_pool.open()
+    if settings.STARTUP_PREWARM:
+        # clients and tokenizer are lazy, build them before serving traffic
+        timings = await asyncio.to_thread(providers.warm_up)
+        logging.info(
+            "Pre-warmed "
+            + ", ".join(
+                f"{name} in {seconds:.3f}s" for name, seconds in timings.items()
+            )
+        )
+    # embed the jobs and applicants created without waiting for the API
+    await embedding_workers.start(supabase)
+    yield
+    await embedding_workers.stop()
+    # write back search indexes changed since they were loaded
+    search_backend.flush()
+    # commit the embedding cache writes still queued
+    await asyncio.to_thread(embedding_cache.close)
+    await providers.close()
+    await supabase_pool.close()
+
+
 # initialize app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=TimedJSONResponse)
 app.state.limiter = limiter
+app.add_middleware(ServerTimingMiddleware)
 
 
 # handle rate limit exceeded exceptions
@@ -40,6 +78,25 @@ def rate_limit_exceeded(request: Request, exc: RateLimitExceeded) -> JSONRespons
     )
 
 
+# an OpenAI call the call layer gave up on (e.g. an embedding in a search)
+@app.exception_handler(UpstreamError)
+def upstream_unavailable(request: Request, exc: UpstreamError) -> JSONResponse:
+    """OpenAI unavailable exception handler"""
+    headers = {}
+    if exc.retry_after:
+        headers["Retry-After"] = str(max(1, round(exc.retry_after)))
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "error": "Upstream unavailable",
+            "message": "The AI provider is not answering. Please try again later.",
+            "detail": str(exc),
+            "endpoint": str(request.url.path),
+        },
+        headers=headers,
+    )
+
+
 @app.get("/")
 def root():
     return {"message": "Hello World"}
@@ -57,6 +114,25 @@ def check_token_size(request: Request, text: str):
     }
 
 
+@app.get("/metrics", tags=["Debug Endpoints"], response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint (stage latencies, tokens, caches, batches)"""
+    return PlainTextResponse(
+        registry.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.get("/debug/metrics", tags=["Debug Endpoints"])
+def debug_metrics():
+    """Debug endpoint to inspect in-process metrics (embedding batches, caches)"""
+    return {
+        **registry.snapshot(),
+        "embedding_cache": embedding_cache.stats(),
+        "search_cache": search_cache.stats(),
+    }
+
+
 # include routers
 app.include_router(jobs_router)
 app.include_router(applicants_router)
@@ -0,0 +1,114 @@
+"""
+Nightly batch of reverse matches: rank every embedded job for every embedded
+applicant and store the top k in `applicant_job_matches`, which the
+applicant matching endpoint serves until the next run.
+
+Jobs are loaded into one matrix once; applicants are read a page at a time
+(keyset on id) and a page is ranked with one matrix product. The next page
+is read and ranked while the previous one is written. Uses only the stored
+embeddings (no OpenAI calls).
+
+    python -m vembedding.match_jobs --top-k 20 --page-size 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+from postgrest import APIError
+from supabase import AsyncClient
+
+from vembedding.applicants.matching import (
+    load_job_matrix,
+    rank_jobs,
+    store_matches,
+    utc_now,
+)
+from vembedding.constant import EmbeddingStatusConst, TableNamesConst
+from vembedding.database import supabase_pool
+from vembedding.search.engine import parse_embedding
+
+
+async def match_all(
+    supabase: AsyncClient, top_k: int = 20, page_size: int = 1_000
+) -> int:
+    """match every embedded applicant, returns how many were matched"""
+    started = time.perf_counter()
+    jobs = await load_job_matrix(supabase)
+    logging.info(f"Loaded {len(jobs)} jobs in {time.perf_counter() - started:.1f}s")
+
+    computed_at = utc_now()
+    matched, after = 0, None
+    writing: Optional[asyncio.Task] = None
+    try:
+        while True:
+            query = (
+                supabase.table(TableNamesConst.APPLICANTS)
+                .select("id,embedding")
+                .eq("embedding_status", EmbeddingStatusConst.READY)
+                .order("id")
+                .limit(page_size)
+            )
+            if after:
+                query = query.gt("id", after)
+            page = (await query.execute()).data
+            if not page:
+                break
+            after = str(page[-1]["id"])
+
+            vectors = np.asarray(
+                [parse_embedding(row["embedding"]) for row in page], dtype=np.float32
+            )
+            ranked = rank_jobs(jobs, vectors, top_k)
+            if writing is not None:
+                await writing
+            writing = asyncio.create_task(
+                store_matches(
+                    [str(row["id"]) for row in page], ranked, computed_at, supabase
+                )
+            )
+            matched += len(page)
+        if writing is not None:
+            await writing
+    finally:
+        if writing is not None and not writing.done():
+            writing.cancel()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Matched {matched} applicants against {len(jobs)} jobs in {elapsed:.1f}s "
+        f"({matched / elapsed if elapsed else 0:.0f} applicants/s)",
+        file=sys.stderr,
+    )
+    return matched
+
+
+async def run(args) -> None:
+    supabase = await supabase_pool.open()
+    try:
+        await match_all(supabase, top_k=args.top_k, page_size=args.page_size)
+    finally:
+        await supabase_pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Store the best jobs of every applicant"
+    )
+    parser.add_argument("--top-k", type=int, default=20, help="jobs per applicant")
+    parser.add_argument("--page-size", type=int, default=1_000)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except APIError as e:
+        print(f"Matching stopped: {e.message}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""In-process metrics for the application"""
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Counter:
+    """Monotonically increasing value, optionally split by labels"""
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            {"labels": dict(zip(self.labelnames, key)), "value": value}
+            for key, value in items
+        ]
+
+
+class Gauge:
+    """Value that goes up and down, set directly or read from a callback"""
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """read the (unlabelled) value from `function` at collection time"""
+        self._function = function
+
+    def snapshot(self) -> List[Dict]:
+        if self._function is not None:
+            return [{"labels": {}, "value": float(self._function())}]
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            {"labels": dict(zip(self.labelnames, key)), "value": value}
+            for key, value in items
+        ]
+
+
+class Histogram:
+    """Bucketed distribution of observed values, optionally split by labels"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        labelnames: Iterable[str] = (),
+    ):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # per label key: [bucket counts..., +Inf count], sum, count
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            items = [(key, list(s[0]), s[1], s[2]) for key, s in self._series.items()]
+        result = []
+        for key, counts, total, count in items:
+            cumulative, running = {}, 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                running += bucket_count
+                cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+            result.append(
+                {
+                    "labels": dict(zip(self.labelnames, key)),
+                    "buckets": cumulative,
+                    "sum": total,
+                    "count": count,
+                }
+            )
+        return result
+
+
+class MetricsRegistry:
+    """Collection of every metric registered in the process"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {
+                "type": type(metric).__name__.lower(),
+                "description": metric.description,
+                "series": metric.snapshot(),
+            }
+            for metric in metrics
+        }
+
+    def render_prometheus(self) -> str:
+        """every metric in the Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for name, metric in self.snapshot().items():
+            lines.append(f"# HELP {name} {_escape_help(metric['description'])}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for series in metric["series"]:
+                labels = series["labels"]
+                if metric["type"] != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {_number(series['value'])}")
+                    continue
+                for bound, count in series["buckets"].items():
+                    bucket_labels = _labels({**labels, "le": bound})
+                    lines.append(f"{name}_bucket{bucket_labels} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(series['sum'])}")
+                lines.append(f"{name}_count{_labels(labels)} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+
+def counter(name: str, description: str, labelnames: Iterable[str] = ()) -> Counter:
+    """Create (or fetch) a counter in the process registry"""
+    return registry.register(Counter(name, description, labelnames))
+
+
+def gauge(name: str, description: str, labelnames: Iterable[str] = ()) -> Gauge:
+    """Create (or fetch) a gauge in the process registry"""
+    return registry.register(Gauge(name, description, labelnames))
+
+
+def histogram(
+    name: str,
+    description: str,
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+    labelnames: Iterable[str] = (),
+) -> Histogram:
+    """Create (or fetch) a histogram in the process registry"""
+    return registry.register(Histogram(name, description, buckets, labelnames))
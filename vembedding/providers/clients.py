@@ -0,0 +1,79 @@
+import sys
+from typing import TYPE_CHECKING, Optional, Tuple, Type, Union
+
+from vembedding.config import settings
+from vembedding.constant import ProvidersConst
+from vembedding.metrics import counter
+from vembedding.providers.fake_openai import FakeOpenAI
+from vembedding.providers.registry import providers
+from vembedding.providers.resilience import UpstreamError
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+OPENAI_TOKENS = counter(
+    "openai_tokens_total",
+    "OpenAI tokens billed, by model and direction (input / output)",
+    labelnames=("model", "direction"),
+)
+
+
+def record_usage(model: str, usage: Optional[object]) -> None:
+    """count the `usage` block of an embeddings or chat response"""
+    if usage is None:
+        return
+    OPENAI_TOKENS.inc(
+        getattr(usage, "prompt_tokens", 0) or 0, model=model, direction="input"
+    )
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    if completion_tokens:
+        OPENAI_TOKENS.inc(completion_tokens, model=model, direction="output")
+
+
+def build_openai_client(provider: str) -> Union["AsyncOpenAI", FakeOpenAI]:
+    """the OpenAI client, or its offline stand-in, selected in settings"""
+    if provider == ProvidersConst.FAKE:
+        return FakeOpenAI(
+            latency=settings.FAKE_LLM_LATENCY_MS / 1000,
+            tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+            tokens_per_candidate=settings.FAKE_LLM_TOKENS_PER_CANDIDATE,
+            embedding_latency=settings.FAKE_EMBEDDING_LATENCY_MS / 1000,
+        )
+    if provider == ProvidersConst.OPENAI:
+        # the SDK takes about half a second to import, only pay it when used
+        from openai import AsyncOpenAI
+
+        # retries and timeouts are the call layer's (providers.resilience)
+        return AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            max_retries=0,
+            timeout=max(
+                settings.OPENAI_EMBEDDING_ATTEMPT_TIMEOUT_SECONDS,
+                settings.OPENAI_CHAT_ATTEMPT_TIMEOUT_SECONDS,
+            ),
+        )
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+def register_openai_client(provider: str) -> str:
+    """
+    register the client of `provider` (built on first use, shared by every
+    caller of the same provider), returns its registry name
+    """
+    return providers.register(
+        f"openai_client:{provider}",
+        lambda: build_openai_client(provider),
+        close=lambda client: client.close() if hasattr(client, "close") else None,
+    )
+
+
+def openai_errors() -> Tuple[Type[Exception], ...]:
+    """
+    the errors of a failed OpenAI call: the call layer giving up, and the
+    SDK's own once it is loaded (nothing can raise them before)
+    """
+    openai = sys.modules.get("openai")
+    if openai is None:
+        return (UpstreamError,)
+    return (UpstreamError, openai.OpenAIError)
@@ -0,0 +1,247 @@
+"""
+Offline stand-in for the parts of the OpenAI client the app uses
+(`embeddings.create` and `chat.completions.create`, streamed or not), for
+load tests and local development without network access or API spend.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+# the text-embedding-3-small default
+DEFAULT_DIMENSIONS = 1536
+# rough characters per token, the fake does not load a tokenizer
+CHARS_PER_TOKEN = 4
+# characters sent per streamed chunk
+STREAM_CHUNK_CHARS = 16
+
+_WORD = re.compile(r"[a-z0-9+#]+")
+_CANDIDATE = re.compile(
+    r"## Candidate \d+: (?P<name>.*?) \(ID: (?P<id>[^)]+)\)"
+    r".*?\*\*Similarity Score:\*\* (?P<score>[-\d.]+)",
+    re.DOTALL,
+)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def hash_embedding(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> List[float]:
+    """
+    Deterministic unit vector of `text`: every lowercase word and word bigram
+    adds +/-1 to a hashed component, so texts sharing vocabulary score closer
+    than unrelated ones (like a real embedding, only much cruder).
+    """
+    words = _WORD.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        features = [text]
+
+    hashes = np.array([_hash(feature) for feature in features], dtype=np.uint64)
+    vector = np.zeros(dimensions, dtype=np.float64)
+    signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+    np.add.at(vector, (hashes % np.uint64(dimensions)).astype(np.int64), signs)
+
+    norm = float(np.linalg.norm(vector))
+    if not norm:
+        vector[_hash(text) % dimensions] = 1.0
+        norm = 1.0
+    return (vector / norm).tolist()
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _quality(score: float) -> str:
+    if score >= 0.8:
+        return "Excellent Match"
+    if score >= 0.65:
+        return "Strong Match"
+    if score >= 0.5:
+        return "Good Match"
+    if score >= 0.35:
+        return "Moderate Match"
+    return "Weak Match"
+
+
+def _filler(tokens: int) -> str:
+    """about `tokens` tokens of text"""
+    return " ".join(["evidence"] * max(tokens, 0))
+
+
+def fake_completion(user_prompt: str, tokens_per_candidate: int) -> str:
+    """
+    JSON answer in the shape the prompt asks for: one entry per candidate
+    section (ids, names and scores copied from the prompt) and the overall
+    summary when the output format includes it
+    """
+    answer: Dict = {}
+    if '"overall_summary"' in user_prompt:
+        answer["overall_summary"] = "A synthetic summary of the candidate pool."
+
+    candidates = []
+    for match in _CANDIDATE.finditer(user_prompt):
+        score = float(match.group("score"))
+        candidates.append(
+            {
+                "candidate_id": match.group("id"),
+                "candidate_name": match.group("name"),
+                "similarity_score": round(score, 2),
+                "match_quality": _quality(score),
+                "match_explanation": _filler(tokens_per_candidate),
+                "key_strengths": ["Synthetic strength"],
+                "potential_concerns": [],
+                "relevant_experience_highlights": ["Synthetic experience"],
+                "hiring_recommendation": "Synthetic recommendation",
+            }
+        )
+    if candidates or "## Candidate" in user_prompt:
+        answer["candidates"] = candidates
+    return json.dumps(answer)
+
+
+class _Embeddings:
+    def __init__(self, owner: "FakeOpenAI"):
+        self._owner = owner
+
+    async def create(self, model: str, input, dimensions=None, **kwargs):
+        texts = [input] if isinstance(input, str) else list(input)
+        if self._owner.embedding_latency:
+            await asyncio.sleep(self._owner.embedding_latency)
+        size = dimensions if isinstance(dimensions, int) else DEFAULT_DIMENSIONS
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return SimpleNamespace(
+            model=model,
+            data=[
+                SimpleNamespace(index=i, embedding=hash_embedding(text, size))
+                for i, text in enumerate(texts)
+            ],
+            usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens),
+        )
+
+
+class _Completions:
+    def __init__(self, owner: "FakeOpenAI"):
+        self._owner = owner
+
+    async def create(
+        self,
+        model: str,
+        messages: List[Dict],
+        max_tokens: Optional[int] = None,
+        stream: bool = False,
+        stream_options: Optional[Dict] = None,
+        **kwargs,
+    ):
+        owner = self._owner
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        content = fake_completion(
+            messages[-1].get("content", ""), owner.tokens_per_candidate
+        )
+        finish_reason = "stop"
+        if max_tokens and estimate_tokens(content) > max_tokens:
+            # like the real model, an answer over budget is cut mid-JSON
+            content = content[: max_tokens * CHARS_PER_TOKEN]
+            finish_reason = "length"
+        usage = SimpleNamespace(
+            prompt_tokens=estimate_tokens(prompt),
+            completion_tokens=estimate_tokens(content),
+            total_tokens=estimate_tokens(prompt) + estimate_tokens(content),
+        )
+
+        if stream:
+            include_usage = bool((stream_options or {}).get("include_usage"))
+            return self._stream(
+                model, content, finish_reason, usage if include_usage else None
+            )
+
+        await asyncio.sleep(owner.generation_seconds(content))
+        return SimpleNamespace(
+            model=model,
+            choices=[
+                SimpleNamespace(
+                    index=0,
+                    message=SimpleNamespace(role="assistant", content=content),
+                    finish_reason=finish_reason,
+                )
+            ],
+            usage=usage,
+        )
+
+    async def _stream(
+        self,
+        model: str,
+        content: str,
+        finish_reason: str,
+        usage: Optional[SimpleNamespace],
+    ) -> AsyncIterator[SimpleNamespace]:
+        owner = self._owner
+        if owner.latency:
+            await asyncio.sleep(owner.latency)
+        per_chunk = (
+            STREAM_CHUNK_CHARS / CHARS_PER_TOKEN / owner.tokens_per_second
+            if owner.tokens_per_second
+            else 0.0
+        )
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            if per_chunk:
+                await asyncio.sleep(per_chunk)
+            yield self._chunk(model, content[start : start + STREAM_CHUNK_CHARS])
+        yield self._chunk(model, None, finish_reason)
+        if usage is not None:
+            yield SimpleNamespace(model=model, choices=[], usage=usage)
+
+    @staticmethod
+    def _chunk(
+        model: str, content: Optional[str], finish_reason: Optional[str] = None
+    ) -> SimpleNamespace:
+        return SimpleNamespace(
+            model=model,
+            choices=[
+                SimpleNamespace(
+                    index=0,
+                    delta=SimpleNamespace(content=content),
+                    finish_reason=finish_reason,
+                )
+            ],
+            usage=None,
+        )
+
+
+class FakeOpenAI:
+    """
+    Hash-embedding and canned-JSON chat stand-in for `AsyncOpenAI`.
+
+    Chat answers take `latency` seconds to the first token, then stream at
+    `tokens_per_second` (0 = instantly); each candidate analysis is padded to
+    about `tokens_per_candidate` tokens so output size can be dialed in.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+        tokens_per_candidate: int = 60,
+        embedding_latency: float = 0.0,
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.tokens_per_candidate = tokens_per_candidate
+        self.embedding_latency = embedding_latency
+        self.embeddings = _Embeddings(self)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def generation_seconds(self, content: str) -> float:
+        seconds = self.latency
+        if self.tokens_per_second:
+            seconds += estimate_tokens(content) / self.tokens_per_second
+        return seconds
@@ -0,0 +1,200 @@
+"""
+Local HTTP server speaking the OpenAI embeddings and chat completions API,
+answered by `FakeOpenAI`, that injects latency and errors. It lets the real
+client and the call layer (providers.resilience) run against a throttled,
+slow or failing upstream.
+
+    python -m vembedding.providers.fake_openai_server --port 8090 \\
+        --error-rate 0.1 --throttle-rate 0.05 --slow-rate 0.02 --slow-ms 5000
+
+then start the app with EMBEDDING_PROVIDER=openai, LLM_PROVIDER=openai and
+OPENAI_BASE_URL=http://127.0.0.1:8090/v1. Faults can be changed while it
+runs with PUT /faults; GET /stats counts what was injected.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from vembedding.providers.fake_openai import FakeOpenAI
+
+
+class Faults(BaseModel):
+    # added to every request
+    latency_ms: float = Field(default=0.0, ge=0)
+    # share of requests answered 500
+    error_rate: float = Field(default=0.0, ge=0, le=1)
+    # share of requests answered 429 with Retry-After
+    throttle_rate: float = Field(default=0.0, ge=0, le=1)
+    retry_after_seconds: float = Field(default=1.0, ge=0)
+    # share of requests stalled for `slow_ms` before answering
+    slow_rate: float = Field(default=0.0, ge=0, le=1)
+    slow_ms: float = Field(default=5_000.0, ge=0)
+
+
+def _plain(value: Any) -> Any:
+    """the JSON form of the fake client's SimpleNamespace responses"""
+    if isinstance(value, SimpleNamespace):
+        return {key: _plain(item) for key, item in vars(value).items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+def _error(status_code: int, message: str, headers: Optional[Dict] = None):
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": "server_error", "code": None}},
+        headers=headers,
+    )
+
+
+def create_app(
+    faults: Optional[Faults] = None,
+    seed: Optional[int] = None,
+    fake: Optional[FakeOpenAI] = None,
+) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    app.state.faults = faults or Faults()
+    app.state.stats = {
+        "requests": 0,
+        "errors": 0,
+        "throttled": 0,
+        "slowed": 0,
+        "cancelled": 0,
+    }
+    rng = random.Random(seed)
+    fake = fake or FakeOpenAI()
+
+    async def inject() -> Optional[JSONResponse]:
+        """the injected failure to answer with, after the injected delay"""
+        faults: Faults = app.state.faults
+        stats = app.state.stats
+        stats["requests"] += 1
+        delay = faults.latency_ms / 1000
+        roll = rng.random()
+        response = None
+        if roll < faults.error_rate:
+            stats["errors"] += 1
+            response = _error(500, "Injected server error")
+        elif roll < faults.error_rate + faults.throttle_rate:
+            stats["throttled"] += 1
+            response = _error(
+                429,
+                "Injected rate limit",
+                headers={"retry-after": str(faults.retry_after_seconds)},
+            )
+        elif roll < faults.error_rate + faults.throttle_rate + faults.slow_rate:
+            stats["slowed"] += 1
+            delay += faults.slow_ms / 1000
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # the client hung up (timeout or a hedge won)
+            stats["cancelled"] += 1
+            raise
+        return response
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        failure = await inject()
+        if failure is not None:
+            return failure
+        response = _plain(
+            await fake.embeddings.create(
+                model=body["model"],
+                input=body["input"],
+                dimensions=body.get("dimensions"),
+            )
+        )
+        for item in response["data"]:
+            item["object"] = "embedding"
+            if body.get("encoding_format") == "base64":
+                vector = np.asarray(item["embedding"], dtype=np.float32)
+                item["embedding"] = base64.b64encode(vector.tobytes()).decode()
+        return {"object": "list", **response}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        failure = await inject()
+        if failure is not None:
+            return failure
+        identity = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+        }
+        response = await fake.chat.completions.create(
+            model=body["model"],
+            messages=body["messages"],
+            max_tokens=body.get("max_tokens"),
+            stream=bool(body.get("stream")),
+            stream_options=body.get("stream_options"),
+        )
+        if not body.get("stream"):
+            return {**identity, "object": "chat.completion", **_plain(response)}
+
+        async def events():
+            async for chunk in response:
+                payload = {**identity, "object": "chat.completion.chunk"}
+                yield f"data: {json.dumps({**payload, **_plain(chunk)})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/faults")
+    def get_faults() -> Faults:
+        return app.state.faults
+
+    @app.put("/faults")
+    def set_faults(faults: Faults) -> Faults:
+        app.state.faults = faults
+        return faults
+
+    @app.get("/stats")
+    def get_stats():
+        return app.state.stats
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI server with faults")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after-seconds", type=float, default=1.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=5_000.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    faults = Faults(
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after_seconds=args.retry_after_seconds,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+    )
+    uvicorn.run(create_app(faults, seed=args.seed), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,770 @@
+"""
+In-memory stand-in for the Supabase client's PostgREST and RPC surface.
+
+Covers what the services use: `table(...)` with select (including embedded
+resources such as `applicants(...)`), insert / upsert / update / delete,
+the common filters and modifiers, and `rpc(...)` for the SQL functions in
+supabase/migrations. Primary keys, foreign keys and unique constraints
+raise `APIError` with the Postgres error codes PostgREST would return, and
+pgvector columns come back as '[...]' strings, as they do over the wire.
+"""
+
+import asyncio
+import copy
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+from postgrest.exceptions import APIError
+
+from vembedding.constant import EmbeddingStatusConst, TableNamesConst
+from vembedding.search.lexical import LexicalIndex, fuse
+
+# columns that make a row unique, per table (the first one is the primary key)
+UNIQUE_KEYS: Dict[str, List[Tuple[str, ...]]] = {
+    TableNamesConst.JOBS: [("id",)],
+    TableNamesConst.APPLICANTS: [("id",)],
+    TableNamesConst.APPLICATIONS: [("id",), ("job_id", "applicant_id")],
+    TableNamesConst.APPLICANT_CHUNKS: [("applicant_id", "chunk_index")],
+    TableNamesConst.APPLICANT_CHUNKS_NEXT: [("applicant_id", "chunk_index")],
+    TableNamesConst.JOB_RECOMMENDATIONS: [("job_id", "applicant_id")],
+    TableNamesConst.APPLICANT_JOB_MATCHES: [("applicant_id", "job_id")],
+}
+# column -> referenced table (its "id")
+FOREIGN_KEYS: Dict[str, Dict[str, str]] = {
+    TableNamesConst.APPLICATIONS: {
+        "job_id": TableNamesConst.JOBS,
+        "applicant_id": TableNamesConst.APPLICANTS,
+    },
+    TableNamesConst.APPLICANT_CHUNKS: {"applicant_id": TableNamesConst.APPLICANTS},
+    TableNamesConst.APPLICANT_CHUNKS_NEXT: {"applicant_id": TableNamesConst.APPLICANTS},
+    TableNamesConst.JOB_RECOMMENDATIONS: {
+        "job_id": TableNamesConst.JOBS,
+        "applicant_id": TableNamesConst.APPLICANTS,
+    },
+    TableNamesConst.APPLICANT_JOB_MATCHES: {
+        "applicant_id": TableNamesConst.APPLICANTS,
+        "job_id": TableNamesConst.JOBS,
+    },
+}
+# columns filled with the current time on insert (and `updated_at` on update)
+TIMESTAMP_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    TableNamesConst.JOBS: ("created_at", "updated_at"),
+    TableNamesConst.APPLICANTS: ("created_at", "updated_at"),
+    TableNamesConst.APPLICATIONS: ("applied_at", "updated_at"),
+    TableNamesConst.APPLICANT_CHUNKS: ("created_at",),
+    TableNamesConst.APPLICANT_CHUNKS_NEXT: ("created_at",),
+}
+DEFAULTS: Dict[str, Dict] = {
+    TableNamesConst.APPLICATIONS: {"status": "pending"},
+    TableNamesConst.APPLICANTS: {"embedding_status": EmbeddingStatusConst.READY},
+    TableNamesConst.JOBS: {"embedding_status": EmbeddingStatusConst.READY},
+    TableNamesConst.JOB_RECOMMENDATIONS: {"applied": False},
+}
+
+Row = Dict
+Column = Union[str, Tuple[str, list]]
+
+
+class Response:
+    def __init__(self, data: List[Row], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _api_error(code: str, message: str, details: str = "") -> APIError:
+    return APIError({"code": code, "message": message, "details": details})
+
+
+def _split_top_level(text: str) -> List[str]:
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current.append(char)
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+def parse_columns(text: str) -> List[Column]:
+    """'a, b, rel!hint(c, d)' -> ['a', 'b', ('rel', ['c', 'd'])]"""
+    columns: List[Column] = []
+    for part in _split_top_level(text or "*"):
+        if "(" in part and part.endswith(")"):
+            name, inner = part[:-1].split("(", 1)
+            name = name.split("!", 1)[0].split(":")[-1].strip()
+            columns.append((name, parse_columns(inner)))
+        else:
+            columns.append(part.split(":")[-1].strip())
+    return columns
+
+
+def _singular(table: str) -> str:
+    return table[:-1] if table.endswith("s") else table
+
+
+def _wire_value(column: str, value):
+    """pgvector columns are serialized as text by PostgREST"""
+    if column.startswith("embedding") and isinstance(value, (list, tuple)):
+        return json.dumps(list(value), separators=(",", ":"))
+    return value
+
+
+def _as_vector(value) -> Optional[np.ndarray]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    vector = np.asarray(value, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def _comparable(value):
+    return value if isinstance(value, (int, float)) else str(value)
+
+
+class QueryBuilder:
+    """one `table(...)` request; filters and modifiers chain, `execute` runs it"""
+
+    def __init__(self, db: "MemorySupabase", table: str):
+        self._db = db
+        self._table = table
+        self._action = "select"
+        self._columns: List[Column] = ["*"]
+        self._payload = None
+        self._ignore_duplicates = False
+        self._filters: List[Callable[[Row], bool]] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._count: Optional[str] = None
+
+    # actions
+    def select(self, *columns: str, count: Optional[str] = None) -> "QueryBuilder":
+        self._action = "select"
+        self._columns = parse_columns(",".join(columns) or "*")
+        self._count = count
+        return self
+
+    def insert(self, json, **kwargs) -> "QueryBuilder":
+        self._action = "insert"
+        self._payload = json
+        return self
+
+    def upsert(
+        self,
+        json,
+        on_conflict: str = "",
+        ignore_duplicates: bool = False,
+        **kwargs,
+    ) -> "QueryBuilder":
+        self._action = "upsert"
+        # conflicts are detected on every unique key, `on_conflict` is ignored
+        self._payload = json
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json, **kwargs) -> "QueryBuilder":
+        self._action = "update"
+        self._payload = json
+        return self
+
+    def delete(self, **kwargs) -> "QueryBuilder":
+        self._action = "delete"
+        return self
+
+    # filters
+    def _filter(self, predicate: Callable[[Row], bool]) -> "QueryBuilder":
+        self._filters.append(predicate)
+        return self
+
+    def eq(self, column: str, value) -> "QueryBuilder":
+        return self._filter(lambda row: str(row.get(column)) == str(value))
+
+    def neq(self, column: str, value) -> "QueryBuilder":
+        return self._filter(lambda row: str(row.get(column)) != str(value))
+
+    def gt(self, column: str, value) -> "QueryBuilder":
+        return self._compare(column, value, lambda a, b: a > b)
+
+    def gte(self, column: str, value) -> "QueryBuilder":
+        return self._compare(column, value, lambda a, b: a >= b)
+
+    def lt(self, column: str, value) -> "QueryBuilder":
+        return self._compare(column, value, lambda a, b: a < b)
+
+    def lte(self, column: str, value) -> "QueryBuilder":
+        return self._compare(column, value, lambda a, b: a <= b)
+
+    def in_(self, column: str, values) -> "QueryBuilder":
+        allowed = {str(value) for value in values}
+        return self._filter(lambda row: str(row.get(column)) in allowed)
+
+    def is_(self, column: str, value) -> "QueryBuilder":
+        if value in (None, "null"):
+            return self._filter(lambda row: row.get(column) is None)
+        return self._filter(lambda row: row.get(column) is not None)
+
+    def _compare(self, column: str, value, op) -> "QueryBuilder":
+        value = _comparable(value)
+
+        def predicate(row: Row) -> bool:
+            current = row.get(column)
+            return current is not None and op(_comparable(current), value)
+
+        return self._filter(predicate)
+
+    # modifiers
+    def order(self, column: str, desc: bool = False, **kwargs) -> "QueryBuilder":
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs) -> "QueryBuilder":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs) -> "QueryBuilder":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    async def execute(self) -> Response:
+        await self._db.round_trip()
+        with_count = self._count is not None
+        if self._action == "select":
+            rows = self._matching()
+            total = len(rows)
+            rows = self._page(rows)
+            data = [self._db.project(self._table, row, self._columns) for row in rows]
+            return Response(data, total if with_count else None)
+        if self._action in ("insert", "upsert"):
+            payload = self._payload
+            rows = payload if isinstance(payload, list) else [payload]
+            data = self._db.insert_rows(
+                self._table,
+                rows,
+                upsert=self._action == "upsert",
+                ignore_duplicates=self._ignore_duplicates,
+            )
+            return Response(data, len(data) if with_count else None)
+        if self._action == "update":
+            data = self._db.update_rows(self._table, self._matching(), self._payload)
+            return Response(data, len(data) if with_count else None)
+        data = self._db.delete_rows(self._table, self._matching())
+        return Response(data, len(data) if with_count else None)
+
+    def _matching(self) -> List[Row]:
+        rows = self._db.tables.setdefault(self._table, [])
+        return [row for row in rows if all(f(row) for f in self._filters)]
+
+    def _page(self, rows: List[Row]) -> List[Row]:
+        for column, desc in reversed(self._order):
+            rows = sorted(
+                rows,
+                key=lambda row: (
+                    row.get(column) is None,
+                    _comparable(row.get(column) or ""),
+                ),
+                reverse=desc,
+            )
+        end = None if self._limit is None else self._offset + self._limit
+        return rows[self._offset : end]
+
+
+class RpcCall:
+    def __init__(self, db: "MemorySupabase", name: str, params: Dict):
+        self._db = db
+        self._name = name
+        self._params = params
+
+    async def execute(self) -> Response:
+        await self._db.round_trip()
+        function = self._db.functions.get(self._name)
+        if function is None:
+            raise _api_error(
+                "PGRST202", f"Could not find the function public.{self._name}"
+            )
+        return Response(function(**self._params))
+
+
+class MemorySupabase:
+    """
+    Supabase client double holding every table in process memory.
+
+    `latency` seconds are awaited per request, to stand in for the network
+    round trip. One instance is shared by every request of the process, like
+    the pooled client it replaces.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, List[Row]] = {}
+        self.functions: Dict[str, Callable[..., List[Row]]] = {
+            "search_applicants_for_job": self.search_applicants_for_job,
+            "search_applicants_for_job_batch": self.search_applicants_for_job_batch,
+            "search_applicants_hybrid": self.search_applicants_hybrid,
+            "build_job_recommendations": self.build_job_recommendations,
+            "add_applicant_recommendations": self.add_applicant_recommendations,
+            "search_jobs_for_applicant": self.search_jobs_for_applicant,
+            "cutover_embeddings": self.cutover_embeddings,
+            "job_applicants_version": self.job_applicants_version,
+        }
+
+    def table(self, name: str) -> QueryBuilder:
+        return QueryBuilder(self, name)
+
+    def from_(self, name: str) -> QueryBuilder:
+        return self.table(name)
+
+    def rpc(self, name: str, params: Optional[Dict] = None) -> RpcCall:
+        return RpcCall(self, name, params or {})
+
+    async def round_trip(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def reset(self) -> None:
+        self.tables.clear()
+
+    # storage
+    def _find(self, table: str, key: Tuple[str, ...], row: Row) -> Optional[Row]:
+        values = tuple(str(row.get(column)) for column in key)
+        for existing in self.tables.get(table, ()):
+            if tuple(str(existing.get(column)) for column in key) == values:
+                return existing
+        return None
+
+    def _check_foreign_keys(self, table: str, row: Row) -> None:
+        for column, target in FOREIGN_KEYS.get(table, {}).items():
+            value = row.get(column)
+            if value is not None and self._find(target, ("id",), {"id": value}) is None:
+                raise _api_error(
+                    "23503",
+                    f'insert or update on table "{table}" violates foreign key '
+                    f'constraint "{table}_{column}_fkey"',
+                    f'Key ({column})=({value}) is not present in table "{target}".',
+                )
+
+    def _with_defaults(self, table: str, row: Row) -> Row:
+        row = {**DEFAULTS.get(table, {}), **copy.deepcopy(row)}
+        keys = UNIQUE_KEYS.get(table, [])
+        if keys and keys[0] == ("id",) and row.get("id") is None:
+            row["id"] = str(uuid.uuid4())
+        now = _now()
+        for column in TIMESTAMP_COLUMNS.get(table, ()):
+            row.setdefault(column, now)
+        return row
+
+    def insert_rows(
+        self,
+        table: str,
+        rows: List[Row],
+        upsert: bool = False,
+        ignore_duplicates: bool = False,
+    ):
+        """
+        all-or-nothing, like a single INSERT statement; with `ignore_duplicates`
+        (ON CONFLICT DO NOTHING) conflicting rows are skipped and not returned
+        """
+        staged: List[Row] = []
+        replaced: List[Tuple[Row, Row]] = []
+        for payload in rows:
+            row = self._with_defaults(table, payload)
+            self._check_foreign_keys(table, row)
+            conflict = None
+            for key in UNIQUE_KEYS.get(table, []):
+                existing = self._find(table, key, row)
+                clash = next(
+                    (
+                        other
+                        for other in staged
+                        if all(str(other.get(c)) == str(row.get(c)) for c in key)
+                    ),
+                    None,
+                )
+                if existing is None and clash is None:
+                    continue
+                if upsert and ignore_duplicates:
+                    conflict = existing or clash
+                    break
+                if upsert and existing is not None:
+                    conflict = existing
+                    break
+                raise _api_error(
+                    "23505",
+                    f'duplicate key value violates unique constraint "{table}_'
+                    f'{"_".join(key)}_key"',
+                    f"Key ({', '.join(key)})=("
+                    f"{', '.join(str(row.get(c)) for c in key)}) already exists.",
+                )
+            if conflict is not None and ignore_duplicates:
+                continue
+            if conflict is not None:
+                # an upsert only overwrites the columns it was given
+                changes = copy.deepcopy(payload)
+                if "updated_at" in TIMESTAMP_COLUMNS.get(table, ()):
+                    changes.setdefault("updated_at", _now())
+                replaced.append((conflict, changes))
+            else:
+                staged.append(row)
+
+        target = self.tables.setdefault(table, [])
+        for existing, changes in replaced:
+            existing.update(changes)
+        target.extend(staged)
+        written = staged + [existing for existing, _ in replaced]
+        return [self._wire(row) for row in written]
+
+    def update_rows(self, table: str, rows: List[Row], values: Dict) -> List[Row]:
+        changes = copy.deepcopy(values)
+        if "updated_at" in TIMESTAMP_COLUMNS.get(table, ()):
+            changes.setdefault("updated_at", _now())
+        for row in rows:
+            self._check_foreign_keys(table, {**row, **changes})
+        for row in rows:
+            row.update(changes)
+        return [self._wire(row) for row in rows]
+
+    def delete_rows(self, table: str, rows: List[Row]) -> List[Row]:
+        doomed = {id(row) for row in rows}
+        self.tables[table] = [
+            row for row in self.tables.get(table, []) if id(row) not in doomed
+        ]
+        # on delete cascade
+        for child, references in FOREIGN_KEYS.items():
+            for column, parent in references.items():
+                if parent != table:
+                    continue
+                ids = {str(row.get("id")) for row in rows}
+                self.tables[child] = [
+                    row
+                    for row in self.tables.get(child, [])
+                    if str(row.get(column)) not in ids
+                ]
+        return [self._wire(row) for row in rows]
+
+    @staticmethod
+    def _wire(row: Row) -> Row:
+        return {column: _wire_value(column, value) for column, value in row.items()}
+
+    def project(self, table: str, row: Row, columns: List[Column]) -> Row:
+        """the selected columns of `row`, with embedded resources resolved"""
+        result: Row = {}
+        for column in columns:
+            if isinstance(column, tuple):
+                name, inner = column
+                result[name] = self._embed(table, row, name, inner)
+            elif column == "*":
+                result.update(self._wire(row))
+            else:
+                result[column] = _wire_value(column, row.get(column))
+        return result
+
+    def _embed(self, table: str, row: Row, name: str, columns: List[Column]):
+        # many-to-one when this row holds the reference (applications.applicant_id)
+        reference = f"{_singular(name)}_id"
+        if FOREIGN_KEYS.get(table, {}).get(reference) == name:
+            parent = self._find(name, ("id",), {"id": row.get(reference)})
+            return None if parent is None else self.project(name, parent, columns)
+        # one-to-many otherwise (applicants -> applicant_chunks.applicant_id)
+        back_reference = f"{_singular(table)}_id"
+        return [
+            self.project(name, child, columns)
+            for child in self.tables.get(name, [])
+            if str(child.get(back_reference)) == str(row.get("id"))
+        ]
+
+    # rpc functions (see supabase/migrations)
+    def search_applicants_for_job(
+        self, job_id_param: str, query_embedding, match_count: int = 10
+    ) -> List[Row]:
+        query = _as_vector(query_embedding)
+        applicant_ids = {
+            str(row["applicant_id"])
+            for row in self.tables.get(TableNamesConst.APPLICATIONS, [])
+            if str(row.get("job_id")) == str(job_id_param)
+        }
+        chunks: Dict[str, List[np.ndarray]] = {}
+        for chunk in self.tables.get(TableNamesConst.APPLICANT_CHUNKS, []):
+            applicant_id = str(chunk.get("applicant_id"))
+            if applicant_id in applicant_ids:
+                chunks.setdefault(applicant_id, []).append(
+                    _as_vector(chunk["embedding"])
+                )
+
+        results = []
+        for applicant in self.tables.get(TableNamesConst.APPLICANTS, []):
+            applicant_id = str(applicant.get("id"))
+            if (
+                applicant_id not in applicant_ids
+                or applicant.get("embedding") is None
+                or applicant.get("embedding_status") != EmbeddingStatusConst.READY
+            ):
+                continue
+            vectors = chunks.get(applicant_id) or [_as_vector(applicant["embedding"])]
+            score = max(float(vector @ query) for vector in vectors)
+            results.append(
+                {
+                    "id": applicant["id"],
+                    "name": applicant.get("name"),
+                    "email": applicant.get("email"),
+                    "resume_text": applicant.get("resume_text"),
+                    "skills": applicant.get("skills"),
+                    "experience": applicant.get("experience"),
+                    "similarity_score": score,
+                }
+            )
+        results.sort(key=lambda row: row["similarity_score"], reverse=True)
+        return results[:match_count]
+
+    def search_applicants_for_job_batch(
+        self, job_id_param: str, query_embeddings, match_count: int = 10
+    ) -> List[Row]:
+        return [
+            {"query_index": query_index, **row}
+            for query_index, query_embedding in enumerate(query_embeddings)
+            for row in self.search_applicants_for_job(
+                job_id_param, query_embedding, match_count
+            )
+        ]
+
+    def search_applicants_hybrid(
+        self,
+        job_id_param: str,
+        query_embedding,
+        query_text: str = "",
+        must_have: Optional[List[str]] = None,
+        fusion: Optional[str] = None,
+        lexical_weight: float = 0.3,
+        match_count: int = 10,
+    ) -> List[Row]:
+        """must-have filter and fusion like the SQL function, BM25 for ts_rank"""
+        rows = self.search_applicants_for_job(
+            job_id_param,
+            query_embedding,
+            match_count=len(self.tables.get(TableNamesConst.APPLICANTS, [])),
+        )
+        lexicon = LexicalIndex()
+        for row in rows:
+            lexicon.add(str(row["id"]), row)
+        allowed = lexicon.matching_all(must_have or [])
+        rows = [row for row in rows if str(row["id"]) in allowed]
+
+        similarity = {str(row["id"]): row["similarity_score"] for row in rows}
+        lexical = lexicon.scores(query_text or "", allowed)
+        hybrid = (
+            fuse(similarity, lexical, fusion, lexical_weight) if fusion else similarity
+        )
+        for row in rows:
+            row["lexical_score"] = lexical.get(str(row["id"]), 0.0)
+            row["hybrid_score"] = hybrid[str(row["id"])]
+        rows.sort(key=lambda row: row["hybrid_score"], reverse=True)
+        return rows[:match_count]
+
+    def search_jobs_for_applicant(
+        self, applicant_id_param: str, match_count: int = 10
+    ) -> List[Row]:
+        applicant = self._find(
+            TableNamesConst.APPLICANTS, ("id",), {"id": applicant_id_param}
+        )
+        jobs = self._embedded(TableNamesConst.JOBS)
+        if (
+            applicant is None
+            or applicant.get("embedding") is None
+            or applicant.get("embedding_status") != EmbeddingStatusConst.READY
+            or not jobs
+        ):
+            return []
+        query = _as_vector(applicant["embedding"])
+        results = [
+            {
+                "id": job["id"],
+                "title": job.get("title"),
+                "author": job.get("author"),
+                "similarity_score": float(_as_vector(job["embedding"]) @ query),
+            }
+            for job in jobs
+        ]
+        results.sort(key=lambda row: row["similarity_score"], reverse=True)
+        return results[:match_count]
+
+    def job_applicants_version(self, job_id_param: str) -> List[Row]:
+        """linked applicants and their latest change, like the SQL function"""
+        links = [
+            row
+            for row in self.tables.get(TableNamesConst.APPLICATIONS, [])
+            if str(row.get("job_id")) == str(job_id_param)
+        ]
+        applicant_ids = {str(row["applicant_id"]) for row in links}
+        changes = [row.get("updated_at") for row in links]
+        changes += [
+            row.get("updated_at")
+            for row in self.tables.get(TableNamesConst.APPLICANTS, [])
+            if str(row.get("id")) in applicant_ids
+        ]
+        changes += [
+            row.get("created_at")
+            for row in self.tables.get(TableNamesConst.APPLICANT_CHUNKS, [])
+            if str(row.get("applicant_id")) in applicant_ids
+        ]
+        changes = [change for change in changes if change is not None]
+        return [
+            {
+                "applicant_count": len(links),
+                "last_change": max(changes) if changes else None,
+            }
+        ]
+
+    def _embedded(self, table: str) -> List[Row]:
+        return [
+            row
+            for row in self.tables.get(table, [])
+            if row.get("embedding") is not None
+            and row.get("embedding_status") == EmbeddingStatusConst.READY
+        ]
+
+    def _applied(self) -> Set[Tuple[str, str]]:
+        return {
+            (str(row.get("job_id")), str(row.get("applicant_id")))
+            for row in self.tables.get(TableNamesConst.APPLICATIONS, [])
+        }
+
+    def build_job_recommendations(
+        self, job_id_param: str, match_count: int = 50
+    ) -> List[Row]:
+        """replace a job's list with its nearest embedded applicants"""
+        table = TableNamesConst.JOB_RECOMMENDATIONS
+        self.tables[table] = [
+            row
+            for row in self.tables.get(table, [])
+            if str(row["job_id"]) != str(job_id_param)
+        ]
+        job = self._find(TableNamesConst.JOBS, ("id",), {"id": job_id_param})
+        applicants = self._embedded(TableNamesConst.APPLICANTS)
+        if job is None or job.get("embedding") is None or not applicants:
+            return []
+
+        vectors = np.stack([_as_vector(a["embedding"]) for a in applicants])
+        scores = vectors @ _as_vector(job["embedding"])
+        applied = self._applied()
+        rows = [
+            {
+                "job_id": job["id"],
+                "applicant_id": applicants[i]["id"],
+                "score": float(scores[i]),
+                "applied": (str(job["id"]), str(applicants[i]["id"])) in applied,
+            }
+            for i in np.argsort(-scores)[:match_count]
+        ]
+        self.tables[table].extend(rows)
+        return [self._wire(row) for row in rows]
+
+    def add_applicant_recommendations(
+        self, applicant_ids: List[str], match_count: int = 50
+    ) -> List[Row]:
+        """merge new applicants into the lists they rank in, like the SQL function"""
+        table = TableNamesConst.JOB_RECOMMENDATIONS
+        wanted = {str(applicant_id) for applicant_id in applicant_ids}
+        applicants = [
+            a
+            for a in self._embedded(TableNamesConst.APPLICANTS)
+            if str(a["id"]) in wanted
+        ]
+        jobs = self._embedded(TableNamesConst.JOBS)
+        if not applicants or not jobs:
+            return []
+
+        # every job against every new applicant in one product
+        scores = (
+            np.stack([_as_vector(j["embedding"]) for j in jobs])
+            @ np.stack([_as_vector(a["embedding"]) for a in applicants]).T
+        )
+        lists: Dict[str, List[Row]] = {}
+        for row in self.tables.get(table, []):
+            lists.setdefault(str(row["job_id"]), []).append(row)
+        batch = {str(a["id"]): i for i, a in enumerate(applicants)}
+        applied = self._applied()
+        inserted = []
+        for j, job in enumerate(jobs):
+            # pairs already listed are rescored whatever their new score
+            listed = set()
+            for row in lists.get(str(job["id"]), []):
+                i = batch.get(str(row["applicant_id"]))
+                if i is not None:
+                    row["score"] = float(scores[j, i])
+                    listed.add(str(row["applicant_id"]))
+            ranked = sorted(
+                lists.get(str(job["id"]), []), key=lambda r: r["score"], reverse=True
+            )
+            threshold = (
+                ranked[match_count - 1]["score"]
+                if len(ranked) >= match_count
+                else -np.inf
+            )
+            beaten = [
+                i
+                for i in np.flatnonzero(scores[j] > threshold)
+                if str(applicants[i]["id"]) not in listed
+            ]
+            if not beaten and not listed:
+                continue
+            new = {str(applicants[i]["id"]): float(scores[j, i]) for i in beaten}
+            for applicant_id, score in new.items():
+                row = {
+                    "job_id": job["id"],
+                    "applicant_id": applicant_id,
+                    "score": score,
+                    "applied": (str(job["id"]), applicant_id) in applied,
+                }
+                ranked.append(row)
+            ranked.sort(key=lambda r: r["score"], reverse=True)
+            lists[str(job["id"])] = ranked[:match_count]
+            inserted.extend(
+                r
+                for r in ranked[:match_count]
+                if str(r["applicant_id"]) in new or str(r["applicant_id"]) in listed
+            )
+        self.tables[table] = [row for rows in lists.values() for row in rows]
+        return [self._wire(row) for row in inserted]
+
+    def cutover_embeddings(self) -> List[Row]:
+        """swap in the `embedding_next` vectors and chunks, like the SQL function"""
+        vector_tables = (TableNamesConst.JOBS, TableNamesConst.APPLICANTS)
+        missing = [
+            sum(
+                1
+                for row in self.tables.get(table, [])
+                if row.get("embedding") is not None
+                and row.get("embedding_next") is None
+            )
+            for table in vector_tables
+        ]
+        if any(missing):
+            raise _api_error(
+                "P0001",
+                f"Re-embedding incomplete: {missing[0]} jobs and {missing[1]} "
+                "applicants have no embedding_next",
+            )
+        for table in vector_tables:
+            for row in self.tables.get(table, []):
+                row["embedding_previous"] = row.get("embedding")
+                row["embedding"] = row.get("embedding_next")
+                row["embedding_next"] = None
+        self.tables["applicant_chunks_previous"] = self.tables.pop(
+            TableNamesConst.APPLICANT_CHUNKS, []
+        )
+        self.tables[TableNamesConst.APPLICANT_CHUNKS] = self.tables.pop(
+            TableNamesConst.APPLICANT_CHUNKS_NEXT, []
+        )
+        return []
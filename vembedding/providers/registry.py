@@ -0,0 +1,77 @@
+"""
+Shared provider objects that are slow to create (the OpenAI clients, the
+tokenizer with its BPE file), built on first use instead of at import time.
+The app lifespan warms them up before the worker reports ready.
+"""
+
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class ProviderRegistry:
+    """
+    Named lazy singletons. Modules register a factory at import (cheap) and
+    `get` builds the object once, on the first call from any thread.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._closers: Dict[str, Callable[[Any], Optional[Awaitable]]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        close: Optional[Callable[[Any], Optional[Awaitable]]] = None,
+    ) -> str:
+        """add a factory (the first registration of a name wins), returns the name"""
+        with self._lock:
+            self._factories.setdefault(name, factory)
+            if close is not None:
+                self._closers.setdefault(name, close)
+        return name
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def warm_up(self) -> Dict[str, float]:
+        """build every registered object, returns the seconds each one took"""
+        timings = {}
+        for name in list(self._factories):
+            started = time.perf_counter()
+            self.get(name)
+            timings[name] = time.perf_counter() - started
+        return timings
+
+    async def close(self) -> None:
+        """close and forget the built objects (the next `get` builds anew)"""
+        with self._lock:
+            instances, self._instances = self._instances, {}
+        for name, instance in instances.items():
+            close = self._closers.get(name)
+            if close is None:
+                continue
+            try:
+                result = close(instance)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logging.warning(f"Closing {name} failed: {e}")
+
+
+providers = ProviderRegistry()
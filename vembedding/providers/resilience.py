@@ -0,0 +1,355 @@
+"""
+Call layer for the OpenAI API.
+
+Every call runs under a per-operation deadline (retries included) and each
+attempt under its own timeout. Timeouts, connection errors, 429 and 5xx
+answers are retried with exponential backoff and full jitter, or after the
+`Retry-After` the upstream asked for. A circuit breaker per operation fails
+fast while the upstream keeps failing and lets a single probe call through
+once it has cooled down. Embedding calls can be hedged: a duplicate request
+is sent when the first is still running after a latency percentile of the
+recent calls, and the first answer wins.
+"""
+
+import asyncio
+import random
+import sys
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Deque, NamedTuple, Optional, TypeVar
+
+from vembedding.config import settings
+from vembedding.metrics import counter, gauge
+
+T = TypeVar("T")
+
+ATTEMPTS = counter(
+    "openai_call_attempts_total",
+    "OpenAI call attempts, by operation and outcome",
+    labelnames=("operation", "outcome"),
+)
+RETRIES = counter(
+    "openai_call_retries_total",
+    "OpenAI call attempts retried after a transient failure",
+    labelnames=("operation",),
+)
+GAVE_UP = counter(
+    "openai_call_failures_total",
+    "OpenAI calls that failed for good, by reason",
+    labelnames=("operation", "reason"),
+)
+HEDGES = counter(
+    "openai_call_hedges_total",
+    "Duplicate (hedged) OpenAI requests sent, by the request that answered",
+    labelnames=("operation", "winner"),
+)
+HEDGE_DELAY = gauge(
+    "openai_call_hedge_delay_seconds",
+    "Latency after which an OpenAI request is duplicated",
+    labelnames=("operation",),
+)
+CIRCUIT_STATE = gauge(
+    "openai_circuit_state",
+    "OpenAI circuit breaker state: 0 closed, 1 half-open, 2 open",
+    labelnames=("operation",),
+)
+CIRCUIT_REJECTIONS = counter(
+    "openai_circuit_rejections_total",
+    "OpenAI calls failed fast by an open circuit",
+    labelnames=("operation",),
+)
+
+# recent successful latencies kept per operation, and the fewest that set a
+# hedge delay
+LATENCY_WINDOW = 500
+HEDGE_MIN_SAMPLES = 20
+# status codes worth another attempt
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+class UpstreamError(Exception):
+    """an OpenAI call gave up (deadline, retries exhausted or open circuit)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        # seconds before calling again is worth it, when known
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamError):
+    """the operation's circuit is open, the call was not sent"""
+
+
+class CallPolicy(NamedTuple):
+    # seconds for the whole call, retries and backoff included
+    deadline: float
+    # seconds for one attempt
+    attempt_timeout: float
+    max_attempts: int = 4
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    # duplicate a request still running after this percentile of the recent
+    # latencies (0 = never)
+    hedge_percentile: float = 0.0
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed attempts; calls are
+    then rejected for `reset_seconds`, after which one probe call is let
+    through (half-open) and closes the circuit again if it succeeds.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        operation: str,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.operation = operation
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_STATE.set(self._STATE_VALUES[state], operation=self.operation)
+
+    def retry_after(self) -> float:
+        """seconds until an open circuit lets a probe through"""
+        return max(0.0, self._opened_at + self.reset_seconds - self.clock())
+
+    def before_call(self) -> None:
+        """raise `CircuitOpenError` unless a call may be sent now"""
+        if self.failure_threshold <= 0 or self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and self.retry_after() <= 0:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        CIRCUIT_REJECTIONS.inc(operation=self.operation)
+        raise CircuitOpenError(
+            f"OpenAI {self.operation} circuit is open",
+            retry_after=self.retry_after() or None,
+        )
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def release_probe(self) -> None:
+        """the probe call was abandoned (cancelled) without an outcome"""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        probe_failed = self._probing
+        self._probing = False
+        if self.failure_threshold <= 0:
+            return
+        if probe_failed or self.failures >= self.failure_threshold:
+            self._opened_at = self.clock()
+            self._set_state(self.OPEN)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """timeouts, connection errors, throttling and server errors"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    openai = sys.modules.get("openai")
+    if openai is None:
+        return False
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """the wait the upstream asked for (`retry-after-ms` or `Retry-After`)"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            # an HTTP date
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenAICallLayer:
+    """Runs one operation's calls under its `CallPolicy` and circuit breaker"""
+
+    def __init__(
+        self,
+        operation: str,
+        policy: CallPolicy,
+        breaker: Optional[CircuitBreaker] = None,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.operation = operation
+        self.policy = policy
+        self.breaker = breaker or CircuitBreaker(operation)
+        self.sleep = sleep
+        self.clock = clock
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def hedge_delay(self) -> Optional[float]:
+        """the latency percentile after which a request is duplicated"""
+        if not self.policy.hedge_percentile or (
+            len(self._latencies) < HEDGE_MIN_SAMPLES
+        ):
+            return None
+        latencies = sorted(self._latencies)
+        index = int(len(latencies) * self.policy.hedge_percentile / 100)
+        delay = latencies[min(index, len(latencies) - 1)]
+        HEDGE_DELAY.set(delay, operation=self.operation)
+        return delay
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """seconds to wait before retry number `attempt`"""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # a little jitter so throttled callers do not come back together
+            return retry_after + random.uniform(0, self.policy.backoff_base)
+        ceiling = min(
+            self.policy.backoff_max, self.policy.backoff_base * 2 ** (attempt - 1)
+        )
+        return random.uniform(0, ceiling)
+
+    async def call(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        """
+        `make_call()` returns a fresh request coroutine per attempt. Non
+        retryable errors (bad requests, auth) are raised as they are, giving
+        up raises `UpstreamError` chained to the last failure.
+        """
+        policy = self.policy
+        deadline_at = self.clock() + policy.deadline
+        error: Optional[BaseException] = None
+        for attempt in range(1, policy.max_attempts + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                GAVE_UP.inc(operation=self.operation, reason="circuit_open")
+                raise
+
+            remaining = deadline_at - self.clock()
+            started = self.clock()
+            try:
+                result = await asyncio.wait_for(
+                    self._attempt(make_call),
+                    timeout=max(0.0, min(policy.attempt_timeout, remaining)),
+                )
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # the upstream answered, it is the request that is wrong
+                    self.breaker.record_success()
+                    ATTEMPTS.inc(operation=self.operation, outcome="error")
+                    raise
+                error = e
+                self.breaker.record_failure()
+                outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "retry"
+                ATTEMPTS.inc(operation=self.operation, outcome=outcome)
+            else:
+                self.breaker.record_success()
+                self._latencies.append(self.clock() - started)
+                ATTEMPTS.inc(operation=self.operation, outcome="success")
+                return result
+
+            if attempt == policy.max_attempts:
+                GAVE_UP.inc(operation=self.operation, reason="attempts")
+                break
+            delay = self.backoff(attempt, error)
+            if self.clock() + delay >= deadline_at:
+                GAVE_UP.inc(operation=self.operation, reason="deadline")
+                break
+            RETRIES.inc(operation=self.operation)
+            await self.sleep(delay)
+
+        raise UpstreamError(
+            f"OpenAI {self.operation} failed after {attempt} attempts: " f"{error!r}",
+            retry_after=retry_after_seconds(error),
+        ) from error
+
+    async def _attempt(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await make_call()
+
+        primary = asyncio.ensure_future(make_call())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+            hedge = asyncio.ensure_future(make_call())
+            tasks.add(hedge)
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        winner = "primary" if task is primary else "hedge"
+                        HEDGES.inc(operation=self.operation, winner=winner)
+                        return task.result()
+                    error = task.exception()
+            HEDGES.inc(operation=self.operation, winner="none")
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+def build_call_layer(
+    operation: str,
+    deadline: float,
+    attempt_timeout: float,
+    hedge_percentile: float = 0.0,
+) -> OpenAICallLayer:
+    """a call layer with the retry and breaker settings"""
+    return OpenAICallLayer(
+        operation,
+        CallPolicy(
+            deadline=deadline,
+            attempt_timeout=attempt_timeout,
+            max_attempts=max(1, settings.OPENAI_MAX_ATTEMPTS),
+            backoff_base=settings.OPENAI_RETRY_BASE_SECONDS,
+            backoff_max=settings.OPENAI_RETRY_MAX_SECONDS,
+            hedge_percentile=hedge_percentile,
+        ),
+        CircuitBreaker(
+            operation,
+            failure_threshold=settings.OPENAI_BREAKER_FAILURE_THRESHOLD,
+            reset_seconds=settings.OPENAI_BREAKER_RESET_SECONDS,
+        ),
+    )
@@ -1,4 +1,192 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException, status
+from limits import RateLimitItemPerMinute
+from limits.storage import Storage, storage_from_string
+from limits.strategies import FixedWindowRateLimiter
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
+from vembedding.config import settings
+from vembedding.metrics import counter
+
+BUDGET_REJECTIONS = counter(
+    "token_budget_rejections_total",
+    "Requests rejected because the client's OpenAI token budget was spent",
+)
+BUDGET_TOKENS = counter(
+    "token_budget_charged_total", "OpenAI tokens charged against client budgets"
+)
+
+
+class SQLiteStorage(Storage):
+    """
+    `limits` storage in a SQLite file, so every worker process on a host
+    shares the same counters: `sqlite:///abs/path.db` or `sqlite://rel/path.db`.
+
+    Each increment is a single upsert statement, atomic across processes;
+    expired windows restart at the increment that finds them.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+    # drop expired rows every this many increments
+    PRUNE_EVERY = 1_000
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri.split("://", 1)[1]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._increments = 0
+        self._db = sqlite3.connect(
+            self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            (value,) = self._db.execute(
+                "INSERT INTO rate_limits (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "value = CASE WHEN expires_at <= ? THEN excluded.value "
+                "ELSE value + excluded.value END, "
+                "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at "
+                "ELSE expires_at END "
+                "RETURNING value",
+                (key, amount, now + expiry, now, now),
+            ).fetchone()
+            self._increments += 1
+            if self._increments % self.PRUNE_EVERY == 0:
+                self._db.execute(
+                    "DELETE FROM rate_limits WHERE expires_at <= ?", (now,)
+                )
+        return value
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM rate_limits WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+        return row[0] if row else now
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._db.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self._lock:
+            return self._db.execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+
+class TokenBudget:
+    """
+    Per-client budget of OpenAI tokens per minute, kept in the same storage as
+    the request limits (so it is shared across workers too).
+
+    Callers charge what a call may cost before making it: the tokens of the
+    text to embed, the prompt plus `max_tokens` of a completion. A charge
+    that does not fit the client's remaining budget is rejected with a 429.
+    """
+
+    def __init__(
+        self,
+        storage_uri: str,
+        tokens_per_minute: int,
+        enabled: bool,
+        name: str = "openai-tokens",
+    ):
+        self.enabled = enabled and tokens_per_minute > 0
+        self.name = name
+        self.item = RateLimitItemPerMinute(max(tokens_per_minute, 1))
+        self._strategy = FixedWindowRateLimiter(storage_from_string(storage_uri))
+
+    def charge(self, client: str, tokens: int) -> None:
+        if not self.enabled or tokens <= 0:
+            return
+        if tokens > self.item.amount:
+            BUDGET_REJECTIONS.inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=(
+                    f"Request needs {tokens} tokens, more than the budget of "
+                    f"{self.item.amount} tokens per minute"
+                ),
+            )
+        if not self._strategy.test(self.item, self.name, client, cost=tokens):
+            BUDGET_REJECTIONS.inc()
+            stats = self._strategy.get_window_stats(self.item, self.name, client)
+            retry_after = max(1, int(stats.reset_time - time.time()) + 1)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=(
+                    f"Token budget exceeded: {tokens} tokens requested, "
+                    f"{stats.remaining} of {self.item.amount} left this minute"
+                ),
+                headers={"Retry-After": str(retry_after)},
+            )
+        # test-then-hit keeps rejected charges off the budget; concurrent
+        # charges can overshoot it by at most one request each
+        self._strategy.hit(self.item, self.name, client, cost=tokens)
+        BUDGET_TOKENS.inc(tokens)
+
+
+class ClientBudget:
+    """the token budget of one client, handed to the services per request"""
+
+    def __init__(self, budget: TokenBudget, client: str):
+        self.budget = budget
+        self.client = client
+
+    def charge(self, tokens: int) -> None:
+        self.budget.charge(self.client, tokens)
+
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    enabled=settings.RATE_LIMIT_ENABLED,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+)
+token_budget = TokenBudget(
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    tokens_per_minute=settings.RATE_LIMIT_TOKENS_PER_MINUTE,
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
+bulk_token_budget = TokenBudget(
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    tokens_per_minute=settings.RATE_LIMIT_BULK_TOKENS_PER_MINUTE,
+    enabled=settings.RATE_LIMIT_ENABLED,
+    name="openai-bulk-tokens",
+)
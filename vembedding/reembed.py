@@ -0,0 +1,399 @@
+"""
+Re-embed every job and applicant with the configured embedding model, after
+a change of `EmbeddingModelsConst.OPENAI_EMBEDDING_MODEL` or
+EMBEDDING_DIMENSIONS.
+
+Vectors are written to the shadow column `embedding_next` (chunk vectors to
+`applicant_chunks_next`), so searches keep using the current vectors until
+`--cutover` swaps them all in one transaction. A killed run resumes from its
+checkpoint file.
+
+    EMBEDDING_DIMENSIONS=512 python -m vembedding.reembed --rpm 3000 --tpm 1000000
+    python -m vembedding.reembed --cutover
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from postgrest import APIError
+from supabase import AsyncClient
+
+from vembedding.ai.chunking import mean_embedding
+from vembedding.ai.embedding import (
+    CACHE_MODEL_KEY,
+    count_tokens,
+    openai_generate_embeddings,
+    token_batches,
+)
+from vembedding.applicants.model import ApplicantCreate
+from vembedding.applicants.service import ApplicantService
+from vembedding.config import settings
+from vembedding.constant import TableNamesConst
+from vembedding.database import supabase_pool
+from vembedding.jobs.model import JobCreate
+from vembedding.jobs.service import JobService
+
+TABLES = (TableNamesConst.JOBS, TableNamesConst.APPLICANTS)
+SELECT_COLUMNS = {
+    TableNamesConst.JOBS: "id,title,description,requirements,author",
+    TableNamesConst.APPLICANTS: "id,name,email,resume_text,skills,experience",
+}
+# attempts per embedding call before the run stops (it can be resumed)
+MAX_ATTEMPTS = 6
+
+
+class Throttle:
+    """
+    Requests- and tokens-per-minute ceilings shared by concurrent calls, as
+    token buckets holding up to six seconds of budget.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.request_rate = requests_per_minute / 60
+        self.token_rate = tokens_per_minute / 60
+        self.request_capacity = max(1.0, self.request_rate * 6)
+        self.token_capacity = self.token_rate * 6
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                elapsed, self._updated = now - self._updated, now
+                self._requests = min(
+                    self.request_capacity,
+                    self._requests + elapsed * self.request_rate,
+                )
+                self._tokens = min(
+                    self.token_capacity, self._tokens + elapsed * self.token_rate
+                )
+                # a batch larger than the bucket waits for a full bucket and
+                # leaves it in debt, so the average rate still holds
+                needed = min(tokens, self.token_capacity)
+                if self._requests >= 1 and self._tokens >= needed:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep(
+                    max(
+                        (1 - self._requests) / self.request_rate,
+                        (needed - self._tokens) / self.token_rate,
+                    )
+                )
+
+
+class Checkpoint:
+    """
+    Last id re-embedded per table, in a JSON file rewritten atomically after
+    every page. A checkpoint made for another model is ignored.
+    """
+
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        self.tables: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("model") == model:
+                self.tables = saved.get("tables", {})
+            else:
+                logging.warning(
+                    f"Ignoring checkpoint for model {saved.get('model')}, "
+                    f"re-embedding with {model} from the start"
+                )
+
+    def last_id(self, table: str) -> Optional[str]:
+        return self.tables.get(table, {}).get("last_id")
+
+    def done(self, table: str) -> int:
+        return self.tables.get(table, {}).get("done", 0)
+
+    def advance(self, table: str, last_id: str, rows: int) -> None:
+        self.tables[table] = {"last_id": last_id, "done": self.done(table) + rows}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump({"model": self.model, "tables": self.tables}, f)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def clear(self) -> None:
+        self.tables = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Progress:
+    """rows/sec and ETA of one table, printed every `interval` seconds"""
+
+    def __init__(self, table: str, total: int, interval: float = 5.0):
+        self.table = table
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    def advance(self, rows: int) -> None:
+        self.done += rows
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self) -> None:
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        remaining = max(self.total - self.done, 0)
+        eta = format_seconds(remaining / rate) if rate else "?"
+        percent = 100 * self.done / self.total if self.total else 100.0
+        print(
+            f"{self.table}: {self.done}/{self.total} rows ({percent:.1f}%) "
+            f"{rate:.1f} rows/s, ETA {eta}",
+            file=sys.stderr,
+        )
+
+
+def format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+def record_texts(table: str, row: Dict) -> List[str]:
+    """what gets embedded for a row: the text itself or its chunks"""
+    if table == TableNamesConst.JOBS:
+        return [JobService.combine_text(JobCreate.model_validate(row))]
+    combine_text = ApplicantService.combine_text(ApplicantCreate.model_validate(row))
+    return ApplicantService.embedding_texts(combine_text, count_tokens(combine_text))
+
+
+async def embed_with_retries(
+    texts: List[str], tokens: int, throttle: Throttle
+) -> List[List[float]]:
+    """one throttled embedding call, retried with jittered exponential backoff"""
+    for attempt in range(MAX_ATTEMPTS):
+        await throttle.acquire(tokens)
+        try:
+            return await openai_generate_embeddings(texts)
+        except Exception as e:
+            if attempt + 1 == MAX_ATTEMPTS:
+                raise
+            delay = min(60.0, 2.0**attempt) * random.uniform(0.5, 1.0)
+            logging.warning(f"Embedding call failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def reembed_page(
+    table: str, rows: List[Dict], supabase: AsyncClient, throttle: Throttle
+) -> None:
+    """embed one page of rows and store the vectors in the shadow column/table"""
+    texts = {str(row["id"]): record_texts(table, row) for row in rows}
+    items = []
+    for row_id, chunks in texts.items():
+        for index, text in enumerate(chunks):
+            tokens = count_tokens(text)
+            items.append(((row_id, index, text, tokens), tokens))
+    vectors: Dict[Tuple[str, int], List[float]] = {}
+    for batch in token_batches(
+        items,
+        max_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+    ):
+        embeddings = await embed_with_retries(
+            [text for _, _, text, _ in batch],
+            sum(tokens for _, _, _, tokens in batch),
+            throttle,
+        )
+        for (row_id, index, _, _), embedding in zip(batch, embeddings):
+            vectors[(row_id, index)] = embedding
+
+    chunk_rows = []
+    updates = []
+    for row_id, chunks in texts.items():
+        embeddings = [vectors[(row_id, index)] for index in range(len(chunks))]
+        if len(chunks) > 1:
+            chunk_rows.extend(
+                {
+                    "applicant_id": row_id,
+                    "chunk_index": index,
+                    "content": text,
+                    "embedding": embedding,
+                }
+                for index, (text, embedding) in enumerate(zip(chunks, embeddings))
+            )
+            updates.append((row_id, mean_embedding(embeddings)))
+        else:
+            updates.append((row_id, embeddings[0]))
+
+    # chunks before the row vector: a row with `embedding_next` is complete
+    if chunk_rows:
+        await (
+            supabase.table(TableNamesConst.APPLICANT_CHUNKS_NEXT)
+            .upsert(chunk_rows, on_conflict="applicant_id,chunk_index")
+            .execute()
+        )
+    await asyncio.gather(
+        *(
+            supabase.table(table)
+            .update({"embedding_next": embedding})
+            .eq("id", row_id)
+            .execute()
+            for row_id, embedding in updates
+        )
+    )
+
+
+async def reembed_table(
+    table: str,
+    supabase: AsyncClient,
+    throttle: Throttle,
+    checkpoint: Checkpoint,
+    page_size: int,
+    concurrency: int,
+) -> int:
+    """
+    Re-embed the rows of `table` that have no `embedding_next` yet, in id
+    order (keyset pagination) after the checkpoint. Up to `concurrency`
+    pages are in flight; the checkpoint only moves past a page once it and
+    every page before it are stored. Returns the rows re-embedded.
+    """
+    after = checkpoint.last_id(table)
+    remaining = (
+        supabase.table(table).select("id", count="exact").is_("embedding_next", "null")
+    )
+    if after:
+        remaining = remaining.gt("id", after)
+    total = (await remaining.limit(1).execute()).count or 0
+    progress = Progress(table, total)
+    inflight: Deque[Tuple[str, int, asyncio.Task]] = deque()
+
+    async def commit_oldest() -> None:
+        last_id, rows, task = inflight.popleft()
+        await task
+        checkpoint.advance(table, last_id, rows)
+        progress.advance(rows)
+
+    try:
+        while True:
+            query = (
+                supabase.table(table)
+                .select(SELECT_COLUMNS[table])
+                .is_("embedding_next", "null")
+                .order("id")
+                .limit(page_size)
+            )
+            if after:
+                query = query.gt("id", after)
+            page = (await query.execute()).data
+            if not page:
+                break
+            after = str(page[-1]["id"])
+            inflight.append(
+                (
+                    after,
+                    len(page),
+                    asyncio.create_task(reembed_page(table, page, supabase, throttle)),
+                )
+            )
+            if len(inflight) >= concurrency:
+                await commit_oldest()
+        while inflight:
+            await commit_oldest()
+    finally:
+        # a failed page stops the run; the checkpoint is before it
+        for _, _, task in inflight:
+            task.cancel()
+
+    progress.report()
+    return progress.done
+
+
+async def cutover(supabase: AsyncClient) -> None:
+    """swap the shadow vectors in (fails if any row still lacks one)"""
+    await supabase.rpc("cutover_embeddings", {}).execute()
+    # on-disk local search indexes hold the old vectors
+    if settings.SEARCH_INDEX_DIR:
+        for path in glob.glob(os.path.join(settings.SEARCH_INDEX_DIR, "job-*")):
+            os.remove(path)
+
+
+async def run(args) -> None:
+    supabase = await supabase_pool.open()
+    checkpoint = Checkpoint(args.checkpoint, CACHE_MODEL_KEY)
+    throttle = Throttle(args.rpm, args.tpm)
+    try:
+        if args.cutover:
+            # catch up on rows created since the last run, then swap
+            checkpoint.clear()
+        tables = TABLES if args.table == "all" else (args.table,)
+        for table in tables:
+            rows = await reembed_table(
+                table,
+                supabase,
+                throttle,
+                checkpoint,
+                page_size=args.page_size,
+                concurrency=args.concurrency,
+            )
+            print(f"Re-embedded {rows} {table}", file=sys.stderr)
+        if args.cutover:
+            await cutover(supabase)
+            checkpoint.clear()
+            print(
+                f"Cutover done, vectors are now {CACHE_MODEL_KEY}; restart the "
+                "API with the same embedding settings",
+                file=sys.stderr,
+            )
+    finally:
+        await supabase_pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Re-embed jobs and applicants into shadow vectors"
+    )
+    parser.add_argument("--table", choices=("all",) + TABLES, default="all")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="pages embedded at once"
+    )
+    parser.add_argument("--rpm", type=float, default=3_000, help="requests/minute")
+    parser.add_argument("--tpm", type=float, default=1_000_000, help="tokens/minute")
+    parser.add_argument("--checkpoint", default=".cache/reembed-checkpoint.json")
+    parser.add_argument(
+        "--cutover",
+        action="store_true",
+        help="re-embed what is still missing, then swap the shadow vectors in",
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except APIError as e:
+        print(f"Re-embedding stopped: {e.message}", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Re-embedding stopped ({e}), run again to resume", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
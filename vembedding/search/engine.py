@@ -0,0 +1,830 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from supabase import AsyncClient
+
+from vembedding.config import settings
+from vembedding.constant import (
+    EmbeddingStatusConst,
+    SearchBackendsConst,
+    TableNamesConst,
+    VectorPrecisionsConst,
+)
+from vembedding.search.ivf import IVFIndex, default_n_lists
+from vembedding.search.lexical import FUSION_DEPTH, LexicalIndex, LexicalQuery, fuse
+from vembedding.search.matrix import VectorMatrix
+from vembedding.search.quantization import QuantizedMatrix
+
+# applicant columns returned with every search result
+RESULT_COLUMNS = ("id", "name", "email", "resume_text", "skills", "experience")
+
+
+# chunk vectors of an applicant are indexed as "<applicant id>:<chunk index>"
+CHUNK_ID_SEPARATOR = ":"
+CHUNK_SELECT = f"{TableNamesConst.APPLICANT_CHUNKS}(chunk_index,embedding)"
+# applications read per page when building a job's index (PostgREST caps a
+# response at its max-rows, 1000 on Supabase)
+APPLICATION_PAGE_SIZE = 1_000
+
+
+def parse_embedding(value) -> List[float]:
+    """PostgREST returns pgvector columns as a '[0.1,0.2,...]' string"""
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def applicant_vectors(applicant: Dict) -> List[Tuple[str, List[float]]]:
+    """
+    the (row id, vector) pairs an applicant adds to a job index: one per
+    chunk for chunked applicants, otherwise its single embedding
+    """
+    applicant_id = str(applicant["id"])
+    chunks = applicant.get("chunk_embeddings")
+    if chunks is None:
+        rows = applicant.get(TableNamesConst.APPLICANT_CHUNKS) or []
+        rows = sorted(rows, key=lambda chunk: chunk["chunk_index"])
+        chunks = [parse_embedding(chunk["embedding"]) for chunk in rows]
+    if chunks:
+        return [
+            (f"{applicant_id}{CHUNK_ID_SEPARATOR}{index}", vector)
+            for index, vector in enumerate(chunks)
+        ]
+    if applicant.get("embedding"):
+        return [(applicant_id, parse_embedding(applicant["embedding"]))]
+    return []
+
+
+def applicant_item_ids(
+    matrix: Union[VectorMatrix, IVFIndex], applicant_ids: Iterable[str]
+) -> List[str]:
+    """the index row ids of the given applicants (their vector or chunks)"""
+    item_ids = []
+    for applicant_id in applicant_ids:
+        if applicant_id in matrix:
+            item_ids.append(applicant_id)
+            continue
+        chunk = 0
+        while f"{applicant_id}{CHUNK_ID_SEPARATOR}{chunk}" in matrix:
+            item_ids.append(f"{applicant_id}{CHUNK_ID_SEPARATOR}{chunk}")
+            chunk += 1
+    return item_ids
+
+
+def top_k_applicants(
+    rank: Callable[[int], List[Tuple[Hashable, float]]], k: int
+) -> List[Tuple[str, float]]:
+    """
+    Max-sim: an applicant scores as its best vector. `rank(m)` returns the m
+    best rows; the window grows until it covers k distinct applicants, which
+    for single-vector indexes is the first call.
+    """
+    window = k
+    while True:
+        ranked = rank(window)
+        best: Dict[str, float] = {}
+        for item_id, score in ranked:
+            applicant_id = str(item_id).split(CHUNK_ID_SEPARATOR, 1)[0]
+            if applicant_id not in best:
+                best[applicant_id] = score
+                if len(best) == k:
+                    return list(best.items())
+        if len(ranked) < window:
+            return list(best.items())
+        window *= 4
+
+
+class SearchBackend:
+    """Ranks a job's applicants against a query embedding"""
+
+    name: str
+
+    async def search(
+        self,
+        job_id: str,
+        query_embedding: List[float],
+        supabase: AsyncClient,
+        nprobe: Optional[int] = None,
+        lexical: Optional[LexicalQuery] = None,
+    ) -> List[Dict]:
+        """
+        Return the job's best matching applicants, best first. Every row has
+        the applicant columns plus `similarity_score`. `nprobe` tunes recall
+        against speed where the backend has an approximate index.
+
+        With an active `lexical` query only applicants containing every
+        must-have term are scored, rows also carry `lexical_score` and
+        `hybrid_score` (the fused score, the order of the rows).
+        """
+        raise NotImplementedError
+
+    async def search_many(
+        self,
+        job_id: str,
+        query_embeddings: List[List[float]],
+        supabase: AsyncClient,
+        nprobe: Optional[int] = None,
+        lexical: Optional[List[LexicalQuery]] = None,
+    ) -> List[List[Dict]]:
+        """
+        `search` for several queries against the same job (`lexical` holds
+        one lexical query per embedding), one ranking per query
+        """
+        lexical = lexical or [None] * len(query_embeddings)
+        return list(
+            await asyncio.gather(
+                *(
+                    self.search(job_id, embedding, supabase, nprobe, lexical_query)
+                    for embedding, lexical_query in zip(query_embeddings, lexical)
+                )
+            )
+        )
+
+    def on_applicant_created(self, applicant: Dict) -> None:
+        """hook: an applicant row (with embedding, chunk vectors) was inserted"""
+
+    async def on_application_created(
+        self, job_id: str, applicant_id: str, supabase: AsyncClient
+    ) -> None:
+        """hook: an applicant was linked to a job"""
+
+    async def on_applications_created(
+        self, job_id: str, applicant_ids: List[str], supabase: AsyncClient
+    ) -> None:
+        """hook: several applicants were linked to a job at once"""
+        for applicant_id in applicant_ids:
+            await self.on_application_created(job_id, applicant_id, supabase)
+
+    def on_application_removed(self, job_id: str, applicant_id: str) -> None:
+        """hook: an applicant was unlinked from a job"""
+
+    def flush(self) -> None:
+        """persist any in-memory state"""
+
+
+class RpcSearchBackend(SearchBackend):
+    """
+    Scores inside Postgres with the `search_applicants_for_job` function
+    (max-sim over `applicant_chunks` for chunked applicants), with
+    `search_applicants_for_job_batch` for several queries, or
+    `search_applicants_hybrid` for lexical filtering and fusion (full-text
+    search on a generated tsvector column), see supabase/migrations
+    """
+
+    name = SearchBackendsConst.RPC
+
+    async def search(
+        self,
+        job_id: str,
+        query_embedding: List[float],
+        supabase: AsyncClient,
+        nprobe: Optional[int] = None,
+        lexical: Optional[LexicalQuery] = None,
+    ) -> List[Dict]:
+        if lexical is not None and lexical.active:
+            response = await supabase.rpc(
+                "search_applicants_hybrid",
+                {
+                    "job_id_param": job_id,
+                    "query_embedding": query_embedding,
+                    "query_text": lexical.text,
+                    "must_have": list(lexical.must_have),
+                    "fusion": lexical.fusion,
+                    "lexical_weight": lexical.weight,
+                },
+            ).execute()
+            return response.data
+
+        response = await supabase.rpc(
+            "search_applicants_for_job",
+            {
+                "job_id_param": job_id,
+                "query_embedding": query_embedding,
+            },
+        ).execute()
+        return response.data
+
+    async def search_many(
+        self,
+        job_id: str,
+        query_embeddings: List[List[float]],
+        supabase: AsyncClient,
+        nprobe: Optional[int] = None,
+        lexical: Optional[List[LexicalQuery]] = None,
+    ) -> List[List[Dict]]:
+        if lexical is not None and any(query.active for query in lexical):
+            # hybrid searches are one `search_applicants_hybrid` call each
+            return await super().search_many(
+                job_id, query_embeddings, supabase, nprobe, lexical
+            )
+
+        response = await supabase.rpc(
+            "search_applicants_for_job_batch",
+            {"job_id_param": job_id, "query_embeddings": query_embeddings},
+        ).execute()
+        rankings: List[List[Dict]] = [[] for _ in query_embeddings]
+        for row in response.data:
+            row = dict(row)
+            rankings[row.pop("query_index")].append(row)
+        return rankings
+
+
+class _JobIndex:
+    def __init__(
+        self,
+        matrix: Union[VectorMatrix, IVFIndex],
+        applicants: Dict[str, Dict],
+        version: Optional[List] = None,
+    ):
+        self.matrix = matrix
+        self.applicants = applicants
+        self.dirty = False
+        # the job's applicant set this index was built from (see
+        # `job_applicants_version`), and when it was last compared with it
+        self.version = version
+        self.checked_at = 0.0
+        # scoring and updates of this job, searches of other jobs do not wait
+        self.lock = threading.RLock()
+        # BM25 index of the applicants, built by the first lexical search
+        self.lexicon: Optional[LexicalIndex] = None
+
+    def lexical_index(self) -> LexicalIndex:
+        if self.lexicon is None:
+            self.lexicon = LexicalIndex()
+            for applicant_id, applicant in self.applicants.items():
+                self.lexicon.add(applicant_id, applicant)
+        return self.lexicon
+
+
+class LocalSearchBackend(SearchBackend):
+    """
+    In-process search. Each job's applicant embeddings are kept in a
+    contiguous float32 matrix, loaded on first use from disk (memory-mapped)
+    or from the database, and kept current through the create hooks.
+
+    Once a job has `ann_min_size` applicants its matrix is replaced by an
+    IVF index (retrained whenever it doubles in size); probing every list
+    is still an exact search. IVF lists are float32: `precision` (int8 or
+    binary) only applies to the exact, flat matrix.
+
+    Lexical queries use a per-job BM25 index over the applicants' text:
+    must-have terms select the candidates through its postings before any
+    vector is scored, and the BM25 ranking is fused with the vector one.
+
+    Other workers (and writes made while this one was down) do not go
+    through its hooks, so a job's index is compared with the database's
+    `job_applicants_version` at most every `revalidate_seconds` (and when
+    read from disk) and rebuilt when it changed. At most `max_jobs` indexes
+    are kept, the least recently searched are dropped (and saved if dirty).
+    """
+
+    name = SearchBackendsConst.LOCAL
+
+    def __init__(
+        self,
+        top_k: int,
+        index_dir: Optional[str] = None,
+        mmap: bool = True,
+        applicant_cache_size: int = 10_000,
+        ann_min_size: int = 20_000,
+        ann_lists: Optional[int] = None,
+        ann_nprobe: int = 8,
+        multi_vector: bool = False,
+        precision: str = VectorPrecisionsConst.FLOAT32,
+        binary_rescore: int = 8,
+        max_jobs: int = 256,
+        revalidate_seconds: float = 30.0,
+    ):
+        self.top_k = top_k
+        self.precision = precision
+        self.binary_rescore = binary_rescore
+        # also load applicant chunk vectors (chunked ingestion)
+        self.multi_vector = multi_vector
+        self.index_dir = index_dir
+        self.mmap = mmap
+        self.ann_min_size = ann_min_size
+        self.ann_lists = ann_lists
+        self.ann_nprobe = ann_nprobe
+        self.applicant_cache_size = applicant_cache_size
+        self.max_jobs = max_jobs
+        self.revalidate_seconds = revalidate_seconds
+        self._jobs: "OrderedDict[str, _JobIndex]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Lock] = {}
+        # recently created applicants, so linking them to a job needs no fetch
+        self._applicants: "OrderedDict[str, Dict]" = OrderedDict()
+        # loaded jobs of applicants linked while their embedding was pending
+        self._pending_links: Dict[str, Set[str]] = {}
+        # guards the dicts above, each job index has its own lock
+        self._lock = threading.RLock()
+
+    def _new_matrix(self, dim: int, capacity: int = 64) -> VectorMatrix:
+        """an empty exact-search matrix in the configured precision"""
+        if self.precision == VectorPrecisionsConst.FLOAT32:
+            return VectorMatrix(dim=dim, capacity=capacity)
+        return QuantizedMatrix(
+            dim=dim,
+            capacity=capacity,
+            binary=self.precision == VectorPrecisionsConst.BINARY,
+            rescore=self.binary_rescore,
+        )
+
+    def _index_path(self, job_id: str) -> Optional[str]:
+        if not self.index_dir:
+            return None
+        return os.path.join(self.index_dir, f"job-{job_id}")
+
+    async def _load_job(self, job_id: str, supabase: AsyncClient) -> _JobIndex:
+        index = self._cached_job(job_id)
+        if index is not None and not self._revalidation_due(index):
+            return index
+
+        # concurrent first searches for a job wait for a single load
+        lock = self._loading.setdefault(job_id, asyncio.Lock())
+        async with lock:
+            index = self._cached_job(job_id)
+            if index is not None and not self._revalidation_due(index):
+                return index
+
+            version = await self._fetch_version(job_id, supabase)
+            path = self._index_path(job_id)
+            if index is None and path and os.path.exists(f"{path}.meta.json"):
+                index = await asyncio.to_thread(self._read_job, path)
+            if index is None or index.version != version:
+                if index is not None:
+                    logging.info(f"Search index of job {job_id} is stale, rebuilding")
+                index = await self._build_job(job_id, supabase, expected=version[0])
+                index.version = version
+                await asyncio.to_thread(self._maybe_build_ann, index)
+                await asyncio.to_thread(self._save, job_id, index)
+            index.checked_at = time.monotonic()
+
+            evicted = self._store_job(job_id, index)
+            self._loading.pop(job_id, None)
+
+        for evicted_id, evicted_index in evicted:
+            await asyncio.to_thread(self._save_if_dirty, evicted_id, evicted_index)
+        return index
+
+    def _cached_job(self, job_id: str) -> Optional[_JobIndex]:
+        with self._lock:
+            index = self._jobs.get(job_id)
+            if index is not None:
+                self._jobs.move_to_end(job_id)
+            return index
+
+    def _revalidation_due(self, index: _JobIndex) -> bool:
+        return time.monotonic() - index.checked_at >= self.revalidate_seconds
+
+    def _store_job(self, job_id: str, index: _JobIndex) -> List[Tuple[str, _JobIndex]]:
+        """keep the index, returns the least recently used ones dropped for it"""
+        evicted = []
+        with self._lock:
+            self._jobs[job_id] = index
+            self._jobs.move_to_end(job_id)
+            while self.max_jobs > 0 and len(self._jobs) > self.max_jobs:
+                evicted.append(self._jobs.popitem(last=False))
+        return evicted
+
+    @staticmethod
+    async def _fetch_version(job_id: str, supabase: AsyncClient) -> List:
+        """the number of applicants linked to the job and their latest change"""
+        response = await supabase.rpc(
+            "job_applicants_version", {"job_id_param": job_id}
+        ).execute()
+        row = response.data[0] if response.data else {}
+        return [row.get("applicant_count") or 0, row.get("last_change")]
+
+    def _read_job(self, path: str) -> Optional[_JobIndex]:
+        """the saved index, None when saved with another vector precision"""
+        with open(f"{path}.meta.json") as f:
+            meta = json.load(f)
+        if meta.get("format") == "ivf":
+            # IVF lists are float32 whatever the configured precision
+            matrix = IVFIndex.load(path, mmap=self.mmap)
+        elif meta.get("precision") != self.precision:
+            return None
+        elif self.precision == VectorPrecisionsConst.FLOAT32:
+            matrix = VectorMatrix.load(path, mmap=self.mmap)
+        else:
+            matrix = QuantizedMatrix.load(
+                path,
+                mmap=self.mmap,
+                binary=self.precision == VectorPrecisionsConst.BINARY,
+                rescore=self.binary_rescore,
+            )
+        with open(f"{path}.applicants.json") as f:
+            applicants = json.load(f)
+        index = _JobIndex(matrix, applicants, version=meta.get("version"))
+        self._maybe_build_ann(index)
+        return index
+
+    def _applicant_columns(self) -> str:
+        columns = ",".join(RESULT_COLUMNS + ("embedding", "embedding_status"))
+        if self.multi_vector:
+            columns = f"{columns},{CHUNK_SELECT}"
+        return columns
+
+    async def _build_job(
+        self, job_id: str, supabase: AsyncClient, expected: int = 0
+    ) -> _JobIndex:
+        """
+        every linked applicant, page by page; `expected` (their number) sizes
+        the matrix once, so a job past SEARCH_ANN_MIN_SIZE is not regrown
+        page after page before its IVF index is built
+        """
+        columns = self._applicant_columns()
+        matrix, applicants = None, {}
+        after = None
+        while True:
+            query = (
+                supabase.table(TableNamesConst.APPLICATIONS)
+                .select(f"applicant_id, {TableNamesConst.APPLICANTS}({columns})")
+                .eq("job_id", job_id)
+                .order("applicant_id")
+                .limit(APPLICATION_PAGE_SIZE)
+            )
+            if after:
+                query = query.gt("applicant_id", after)
+            page = (await query.execute()).data
+            if not page:
+                break
+            after = str(page[-1]["applicant_id"])
+
+            for row in page:
+                applicant = row.get(TableNamesConst.APPLICANTS)
+                vectors = applicant_vectors(applicant) if applicant else []
+                if not vectors:
+                    if applicant:
+                        self._link_pending(job_id, applicant)
+                    continue
+                if matrix is None:
+                    matrix = self._new_matrix(
+                        dim=len(vectors[0][1]), capacity=max(len(page), expected)
+                    )
+                for item_id, vector in vectors:
+                    matrix.add(item_id, vector)
+                applicants[applicant["id"]] = {
+                    column: applicant.get(column) for column in RESULT_COLUMNS
+                }
+            if len(page) < APPLICATION_PAGE_SIZE:
+                break
+
+        logging.info(f"Loaded {len(applicants)} applicants for job {job_id}")
+        return _JobIndex(matrix or self._new_matrix(dim=1), applicants)
+
+    def _maybe_build_ann(self, index: _JobIndex) -> None:
+        """switch to (or retrain) the IVF index once the job is large enough"""
+        with index.lock:
+            matrix = index.matrix
+            if isinstance(matrix, IVFIndex):
+                if len(matrix) <= 2 * matrix.trained_size:
+                    return
+                ids, vectors = matrix.export()
+            elif len(matrix) >= self.ann_min_size:
+                ids, vectors = matrix.ids, matrix.vectors
+            else:
+                return
+
+            index.matrix = IVFIndex.build(
+                ids,
+                vectors,
+                n_lists=self.ann_lists or default_n_lists(len(ids)),
+                nprobe=self.ann_nprobe,
+            )
+            index.dirty = True
+        logging.info(
+            f"Built IVF index with {index.matrix.n_lists} lists over {len(ids)} vectors"
+        )
+
+    def _save(self, job_id: str, index: _JobIndex) -> None:
+        path = self._index_path(job_id)
+        if not path or not len(index.matrix):
+            return
+        index.matrix.save(path)
+        with open(f"{path}.applicants.json", "w") as f:
+            json.dump(index.applicants, f)
+        # written last: what the files hold, and the version they were built from
+        ivf = isinstance(index.matrix, IVFIndex)
+        with open(f"{path}.meta.json", "w") as f:
+            json.dump(
+                {
+                    "format": "ivf" if ivf else "flat",
+                    "precision": (
+                        VectorPrecisionsConst.FLOAT32 if ivf else self.precision
+                    ),
+                    "version": index.version,
+                },
+                f,
+            )
+        index.dirty = False
+
+    def _save_if_dirty(self, job_id: str, index: _JobIndex) -> None:
+        with index.lock:
+            if index.dirty:
+                self._save(job_id, index)
+
+    async def search(
+        self,
+        job_id: str,
+        query_embedding: List[float],
+        supabase: AsyncClient,
+        nprobe: Optional[int] = None,
+        lexical: Optional[LexicalQuery] = None,
+    ) -> List[Dict]:
+        index = await self._load_job(job_id, supabase)
+        # scoring is CPU bound (numpy releases the GIL), keep it off the event loop
+        if lexical is not None and lexical.active:
+            return await asyncio.to_thread(
+                self._rank_hybrid, index, query_embedding, nprobe, lexical
+            )
+        return await asyncio.to_thread(self._rank, index, query_embedding, nprobe)
+
+    async def search_many(
+        self,
+        job_id: str,
+        query_embeddings: List[List[float]],
+        supabase: AsyncClient,
+        nprobe: Optional[int] = None,
+        lexical: Optional[List[LexicalQuery]] = None,
+    ) -> List[List[Dict]]:
+        index = await self._load_job(job_id, supabase)
+        if lexical is not None and any(query.active for query in lexical):
+            return await asyncio.to_thread(
+                lambda: [
+                    self._rank_hybrid(index, embedding, nprobe, lexical_query)
+                    for embedding, lexical_query in zip(query_embeddings, lexical)
+                ]
+            )
+        return await asyncio.to_thread(self._rank_many, index, query_embeddings, nprobe)
+
+    def _rank(
+        self, index: _JobIndex, query_embedding: List[float], nprobe: Optional[int]
+    ) -> List[Dict]:
+        with index.lock:
+            if not len(index.matrix):
+                return []
+            return [
+                {**index.applicants[applicant_id], "similarity_score": score}
+                for applicant_id, score in self._top_k(
+                    index.matrix, query_embedding, nprobe, self.top_k
+                )
+            ]
+
+    def _rank_many(
+        self,
+        index: _JobIndex,
+        query_embeddings: List[List[float]],
+        nprobe: Optional[int],
+    ) -> List[List[Dict]]:
+        with index.lock:
+            if not len(index.matrix):
+                return [[] for _ in query_embeddings]
+            matrix = index.matrix
+            if isinstance(matrix, IVFIndex):
+                # each query probes its own lists
+                ranked = [
+                    self._top_k(matrix, embedding, nprobe, self.top_k)
+                    for embedding in query_embeddings
+                ]
+            else:
+                # every query scored in one matrix product
+                ranked = [
+                    top_k_applicants(rank, self.top_k)
+                    for rank in matrix.rankers(query_embeddings)
+                ]
+            return [
+                [
+                    {**index.applicants[applicant_id], "similarity_score": score}
+                    for applicant_id, score in applicants
+                ]
+                for applicants in ranked
+            ]
+
+    @staticmethod
+    def _top_k(
+        matrix: Union[VectorMatrix, IVFIndex],
+        query_embedding: List[float],
+        nprobe: Optional[int],
+        k: int,
+    ) -> List[Tuple[str, float]]:
+        if isinstance(matrix, IVFIndex):
+            return top_k_applicants(
+                lambda m: matrix.top_k(query_embedding, m, nprobe), k
+            )
+        # score every row once, then widen the selection if needed
+        return top_k_applicants(matrix.ranker(query_embedding), k)
+
+    def _rank_hybrid(
+        self,
+        index: _JobIndex,
+        query_embedding: List[float],
+        nprobe: Optional[int],
+        lexical: LexicalQuery,
+    ) -> List[Dict]:
+        with index.lock:
+            if not len(index.matrix):
+                return []
+            matrix = index.matrix
+            lexicon = index.lexical_index()
+            allowed = None
+            if lexical.must_have:
+                allowed = lexicon.matching_all(lexical.must_have)
+                if not allowed:
+                    return []
+
+            depth = self.top_k * FUSION_DEPTH if lexical.fusion else self.top_k
+            if allowed is None:
+                vector = dict(self._top_k(matrix, query_embedding, nprobe, depth))
+            else:
+                # pre-filter: only the applicants with every must-have are scored
+                rank = matrix.subset_ranker(
+                    query_embedding, applicant_item_ids(matrix, allowed)
+                )
+                vector = dict(top_k_applicants(rank, depth))
+            lexical_scores = lexicon.scores(lexical.text, allowed)
+
+            if lexical.fusion:
+                # the best lexical matches compete too, with their exact cosine
+                best_lexical = sorted(
+                    lexical_scores, key=lexical_scores.get, reverse=True
+                )[:depth]
+                extra = [
+                    applicant_id
+                    for applicant_id in best_lexical
+                    if applicant_id not in vector
+                ]
+                if extra:
+                    rank = matrix.subset_ranker(
+                        query_embedding, applicant_item_ids(matrix, extra)
+                    )
+                    vector.update(top_k_applicants(rank, len(extra)))
+                hybrid = fuse(vector, lexical_scores, lexical.fusion, lexical.weight)
+            else:
+                hybrid = vector
+            ranked = sorted(hybrid, key=hybrid.get, reverse=True)[: self.top_k]
+            return [
+                {
+                    **index.applicants[applicant_id],
+                    "similarity_score": vector[applicant_id],
+                    "lexical_score": lexical_scores.get(applicant_id, 0.0),
+                    "hybrid_score": hybrid[applicant_id],
+                }
+                for applicant_id in ranked
+            ]
+
+    def on_applicant_created(self, applicant: Dict) -> None:
+        if not applicant.get("embedding"):
+            return
+        applicant_id = str(applicant["id"])
+        with self._lock:
+            self._applicants[applicant_id] = applicant
+            self._applicants.move_to_end(applicant_id)
+            while len(self._applicants) > self.applicant_cache_size:
+                self._applicants.popitem(last=False)
+
+            # embedded after being linked: add it to the jobs already loaded
+            indexes = [
+                self._jobs.get(job_id)
+                for job_id in self._pending_links.pop(applicant_id, ())
+            ]
+        for index in indexes:
+            if index is None:
+                continue
+            with index.lock:
+                if not self._add_applicant(index, applicant):
+                    continue
+                index.dirty = True
+            self._maybe_build_ann(index)
+
+    def _link_pending(self, job_id: str, applicant: Dict) -> None:
+        """remember a job link of an applicant whose embedding is on its way"""
+        if applicant.get("embedding_status") == EmbeddingStatusConst.PENDING:
+            with self._lock:
+                self._pending_links.setdefault(str(applicant["id"]), set()).add(job_id)
+
+    def _add_applicant(self, index: _JobIndex, applicant: Dict) -> bool:
+        """add the applicant's vectors to a job index (caller holds its lock)"""
+        vectors = applicant_vectors(applicant)
+        if not vectors:
+            return False
+        if not len(index.matrix):
+            index.matrix = self._new_matrix(dim=len(vectors[0][1]))
+        for item_id, vector in vectors:
+            index.matrix.add(item_id, vector)
+        row = {column: applicant.get(column) for column in RESULT_COLUMNS}
+        index.applicants[str(applicant["id"])] = row
+        if index.lexicon is not None:
+            index.lexicon.add(str(applicant["id"]), row)
+        return True
+
+    async def on_application_created(
+        self, job_id: str, applicant_id: str, supabase: AsyncClient
+    ) -> None:
+        await self.on_applications_created(job_id, [applicant_id], supabase)
+
+    async def on_applications_created(
+        self, job_id: str, applicant_ids: List[str], supabase: AsyncClient
+    ) -> None:
+        job_id = str(job_id)
+        applicant_ids = [str(applicant_id) for applicant_id in applicant_ids]
+        with self._lock:
+            index = self._jobs.get(job_id)
+            if index is None:
+                # not loaded yet, the first search will read it from the database
+                return
+            applicants = {
+                applicant_id: self._applicants.get(applicant_id)
+                for applicant_id in applicant_ids
+            }
+
+        missing = [
+            applicant_id
+            for applicant_id, applicant in applicants.items()
+            if applicant is None
+        ]
+        if missing:
+            # one query for every applicant the backend has not seen yet
+            response = await (
+                supabase.table(TableNamesConst.APPLICANTS)
+                .select(self._applicant_columns())
+                .in_("id", missing)
+                .execute()
+            )
+            for applicant in response.data:
+                applicants[str(applicant["id"])] = applicant
+
+        added = False
+        with index.lock:
+            for applicant in applicants.values():
+                if applicant is None:
+                    continue
+                if self._add_applicant(index, applicant):
+                    added = True
+                else:
+                    self._link_pending(job_id, applicant)
+            if added:
+                index.dirty = True
+        if added:
+            await asyncio.to_thread(self._maybe_build_ann, index)
+
+    def on_application_removed(self, job_id: str, applicant_id: str) -> None:
+        job_id, applicant_id = str(job_id), str(applicant_id)
+        with self._lock:
+            index = self._jobs.get(job_id)
+        if index is None:
+            return
+        with index.lock:
+            removed = False
+            for item_id in applicant_item_ids(index.matrix, [applicant_id]):
+                removed = index.matrix.remove(item_id) or removed
+            if removed:
+                index.applicants.pop(applicant_id, None)
+                if index.lexicon is not None:
+                    index.lexicon.remove(applicant_id)
+                index.dirty = True
+
+    def flush(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.items())
+        for job_id, index in jobs:
+            self._save_if_dirty(job_id, index)
+
+
+def build_search_backend(name: str) -> SearchBackend:
+    """create the search backend selected in settings"""
+    if name == SearchBackendsConst.LOCAL:
+        return LocalSearchBackend(
+            top_k=settings.SEARCH_TOP_K,
+            index_dir=settings.SEARCH_INDEX_DIR or None,
+            mmap=settings.SEARCH_INDEX_MMAP,
+            ann_min_size=settings.SEARCH_ANN_MIN_SIZE,
+            ann_lists=settings.SEARCH_ANN_LISTS or None,
+            ann_nprobe=settings.SEARCH_ANN_NPROBE,
+            multi_vector=settings.EMBEDDING_CHUNKING_ENABLED,
+            precision=settings.SEARCH_VECTOR_PRECISION,
+            binary_rescore=settings.SEARCH_BINARY_RESCORE,
+            max_jobs=settings.SEARCH_INDEX_MAX_JOBS,
+            revalidate_seconds=settings.SEARCH_INDEX_REVALIDATE_SECONDS,
+        )
+    if name == SearchBackendsConst.RPC:
+        return RpcSearchBackend()
+    raise ValueError(f"Unknown search backend: {name}")
+
+
+search_backend = build_search_backend(settings.SEARCH_BACKEND)
@@ -0,0 +1,227 @@
+import json
+import os
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vembedding.search.matrix import VectorMatrix, normalize_rows, top_k_ids
+
+# rows scored per matmul while assigning vectors to lists
+ASSIGN_CHUNK = 16_384
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """index of the most similar centroid for every row"""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        chunk = vectors[start : start + ASSIGN_CHUNK]
+        labels[start : start + ASSIGN_CHUNK] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(
+    vectors: np.ndarray,
+    n_lists: int,
+    iterations: int = 10,
+    sample_size: Optional[int] = None,
+    seed: int = 0,
+) -> np.ndarray:
+    """spherical k-means over (a sample of) unit vectors"""
+    rng = np.random.default_rng(seed)
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    n_lists = max(1, min(n_lists, len(vectors)))
+
+    sample_size = sample_size or 64 * n_lists
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=n_lists)
+
+        # re-seed empty lists from random points so every list stays useful
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF-flat) approximate index.
+
+    Vectors are partitioned by their nearest k-means centroid. A query scores
+    the centroids, then only the `nprobe` closest lists, so `nprobe` trades
+    recall for speed; `nprobe == n_lists` is an exact search.
+    """
+
+    def __init__(self, centroids: np.ndarray, nprobe: int = 8):
+        self.centroids = normalize_rows(np.asarray(centroids, dtype=np.float32))
+        self.dim = self.centroids.shape[1]
+        self.nprobe = nprobe
+        self.lists = [VectorMatrix(self.dim, capacity=16) for _ in self.centroids]
+        self._list_of: Dict[Hashable, int] = {}
+        self.trained_size = 0
+
+    @classmethod
+    def build(
+        cls,
+        item_ids: Sequence[Hashable],
+        vectors: np.ndarray,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        iterations: int = 10,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """train centroids on the vectors and add them all"""
+        n_lists = n_lists or default_n_lists(len(item_ids))
+        index = cls(train_centroids(vectors, n_lists, iterations, seed=seed), nprobe)
+        index.add_many(item_ids, vectors)
+        index.trained_size = len(item_ids)
+        return index
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.lists)
+
+    def __len__(self) -> int:
+        return len(self._list_of)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._list_of
+
+    @property
+    def ids(self) -> List[Hashable]:
+        return list(self._list_of)
+
+    def add(self, item_id: Hashable, vector: Sequence[float]) -> None:
+        self.add_many([item_id], np.asarray([vector], dtype=np.float32))
+
+    def add_many(self, item_ids: Sequence[Hashable], vectors: np.ndarray) -> None:
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        labels = _assign(vectors, self.centroids)
+        for item_id in item_ids:
+            # a re-added id may land in a different list
+            self.remove(item_id)
+        for label in np.unique(labels):
+            rows = np.flatnonzero(labels == label)
+            self.lists[label].add_many([item_ids[row] for row in rows], vectors[rows])
+            for row in rows:
+                self._list_of[item_ids[row]] = int(label)
+
+    def remove(self, item_id: Hashable) -> bool:
+        label = self._list_of.pop(item_id, None)
+        if label is None:
+            return False
+        return self.lists[label].remove(item_id)
+
+    def top_k(
+        self, query: Sequence[float], k: int, nprobe: Optional[int] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """ids and scores of the (approximately) k most similar vectors"""
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        nprobe = max(1, min(nprobe or self.nprobe, self.n_lists))
+
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = range(self.n_lists)
+
+        ids: List[Hashable] = []
+        scores = []
+        for label in probe:
+            matrix = self.lists[label]
+            if len(matrix):
+                ids.extend(matrix._ids)
+                scores.append(matrix.vectors @ query)
+        if not scores:
+            return []
+        return top_k_ids(ids, np.concatenate(scores), k)
+
+    def subset_ranker(
+        self, query: Sequence[float], item_ids: Iterable[Hashable]
+    ) -> Callable[[int], List[Tuple[Hashable, float]]]:
+        """exact ranking of only the given ids, whichever lists hold them"""
+        members: Dict[int, List[Hashable]] = {}
+        for item_id in item_ids:
+            label = self._list_of.get(item_id)
+            if label is not None:
+                members.setdefault(label, []).append(item_id)
+
+        ids: List[Hashable] = []
+        scores = [np.zeros(0, dtype=np.float32)]
+        for label, list_ids in members.items():
+            found, list_scores = self.lists[label].subset_scores(query, list_ids)
+            ids.extend(found)
+            scores.append(list_scores)
+        scores = np.concatenate(scores)
+        return lambda k: top_k_ids(ids, scores, k)
+
+    def export(self) -> Tuple[List[Hashable], np.ndarray]:
+        """all ids and their vectors, e.g. to retrain on the current data"""
+        ids = [item_id for m in self.lists for item_id in m._ids]
+        vectors = [m.vectors for m in self.lists if len(m)]
+        if not vectors:
+            return ids, np.zeros((0, self.dim), dtype=np.float32)
+        return ids, np.concatenate(vectors)
+
+    def memory_bytes(self) -> int:
+        """bytes held by centroids and list buffers (including spare capacity)"""
+        return self.centroids.nbytes + sum(m._data.nbytes for m in self.lists)
+
+    def save(self, path: str) -> None:
+        """write the centroids and all lists as one concatenated array"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        offsets = np.cumsum([0] + [len(m) for m in self.lists])
+        ids, vectors = self.export()
+        np.save(f"{path}.ivf.centroids.npy", self.centroids)
+        np.save(f"{path}.ivf.offsets.npy", offsets)
+        np.save(f"{path}.ivf.vectors.npy", vectors)
+        with open(f"{path}.ivf.json", "w") as f:
+            json.dump(
+                {
+                    "nprobe": self.nprobe,
+                    "trained_size": self.trained_size,
+                    "ids": [str(item_id) for item_id in ids],
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "IVFIndex":
+        """load a saved index; with mmap the lists are read-only views on disk"""
+        mode = "r" if mmap else None
+        centroids = np.load(f"{path}.ivf.centroids.npy")
+        offsets = np.load(f"{path}.ivf.offsets.npy")
+        vectors = np.load(f"{path}.ivf.vectors.npy", mmap_mode=mode)
+        with open(f"{path}.ivf.json") as f:
+            meta = json.load(f)
+
+        index = cls(centroids, nprobe=meta["nprobe"])
+        index.trained_size = meta["trained_size"]
+        ids = meta["ids"]
+        for label, matrix in enumerate(index.lists):
+            start, end = int(offsets[label]), int(offsets[label + 1])
+            matrix._data = vectors[start:end]
+            matrix._ids = ids[start:end]
+            matrix._rows = {item_id: row for row, item_id in enumerate(matrix._ids)}
+            for item_id in matrix._ids:
+                index._list_of[item_id] = label
+        return index
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(f"{path}.ivf.json")
+
+
+def default_n_lists(size: int) -> int:
+    """the usual rule of thumb: about 4 * sqrt(n) lists"""
+    return max(1, int(4 * np.sqrt(size)))
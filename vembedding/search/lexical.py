@@ -0,0 +1,154 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from vembedding.constant import FusionModesConst
+
+# applicant fields the lexical index covers
+LEXICAL_FIELDS = ("skills", "experience", "resume_text")
+# reciprocal rank fusion constant (the usual 60)
+RRF_K = 60
+# fusion looks at this many times k candidates from each ranking
+FUSION_DEPTH = 4
+
+# words keep inner '+', '#', '.' and '-' ("c++", "c#", "node.js", "ci-cd")
+_TOKEN = re.compile(r"[a-z0-9]+(?:[+#]+|(?:[.\-][a-z0-9]+)+)?")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def applicant_document(applicant: Dict) -> List[str]:
+    return [
+        token for field in LEXICAL_FIELDS for token in tokenize(applicant.get(field))
+    ]
+
+
+class LexicalQuery(NamedTuple):
+    """the lexical side of a search: free text, required terms, fusion mode"""
+
+    text: str
+    must_have: Sequence[str] = ()
+    # None ranks by the vector score alone
+    fusion: Optional[str] = None
+    # share of the BM25 score in weighted fusion
+    weight: float = 0.3
+
+    @property
+    def active(self) -> bool:
+        return bool(self.must_have) or self.fusion is not None
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the applicants' skills, experience and resume.
+    Applicants are added and removed one at a time, so it is kept current
+    by the same hooks as the vector index.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> applicant id -> term frequency
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # applicant id -> its distinct terms, so removing one is cheap
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, applicant_id: str, applicant: Dict) -> None:
+        """index (or re-index) an applicant"""
+        self.remove(applicant_id)
+        tokens = applicant_document(applicant)
+        counts = Counter(tokens)
+        for term, count in counts.items():
+            self._postings.setdefault(term, {})[applicant_id] = count
+        self._terms[applicant_id] = tuple(counts)
+        self._lengths[applicant_id] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, applicant_id: str) -> None:
+        length = self._lengths.pop(applicant_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._terms.pop(applicant_id):
+            postings = self._postings[term]
+            del postings[applicant_id]
+            if not postings:
+                del self._postings[term]
+
+    def matching_all(self, phrases: Iterable[str]) -> Set[str]:
+        """applicants containing every word of every phrase"""
+        matches: Optional[Set[str]] = None
+        for phrase in phrases:
+            for term in tokenize(phrase):
+                postings = self._postings.get(term, {})
+                matches = (
+                    set(postings) if matches is None else matches & postings.keys()
+                )
+                if not matches:
+                    return set()
+        return matches if matches is not None else set(self._lengths)
+
+    def scores(
+        self, query: str, applicant_ids: Optional[Set[str]] = None
+    ) -> Dict[str, float]:
+        """BM25 score of every applicant sharing a term with the query"""
+        if not self._lengths:
+            return {}
+        average_length = self._total_length / len(self._lengths) or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(
+                1 + (len(self._lengths) - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for applicant_id, frequency in postings.items():
+                if applicant_ids is not None and applicant_id not in applicant_ids:
+                    continue
+                norm = self.k1 * (
+                    1 - self.b + self.b * self._lengths[applicant_id] / average_length
+                )
+                scores[applicant_id] = scores.get(applicant_id, 0.0) + idf * (
+                    frequency * (self.k1 + 1) / (frequency + norm)
+                )
+        return scores
+
+
+def fuse(
+    vector_scores: Dict[str, float],
+    lexical_scores: Dict[str, float],
+    mode: str,
+    weight: float,
+) -> Dict[str, float]:
+    """
+    Hybrid score of every candidate in `vector_scores`: reciprocal rank
+    fusion of the two rankings, or the weighted sum of the cosine and the
+    max-normalized BM25 score
+    """
+    if mode == FusionModesConst.RRF:
+        fused = dict.fromkeys(vector_scores, 0.0)
+        for scores in (vector_scores, lexical_scores):
+            ranked = sorted(
+                (item for item in scores.items() if item[0] in fused),
+                key=lambda item: item[1],
+                reverse=True,
+            )
+            for rank, (applicant_id, _) in enumerate(ranked, start=1):
+                fused[applicant_id] += 1.0 / (RRF_K + rank)
+        return fused
+
+    top = max(lexical_scores.values(), default=0.0) or 1.0
+    return {
+        applicant_id: (1 - weight) * score
+        + weight * lexical_scores.get(applicant_id, 0.0) / top
+        for applicant_id, score in vector_scores.items()
+    }
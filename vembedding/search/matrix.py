@@ -0,0 +1,211 @@
+import json
+import os
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """scale rows to unit length so a dot product is the cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorMatrix:
+    """
+    Row-major float32 matrix of unit vectors with stable external ids.
+
+    Rows live in one contiguous buffer that grows geometrically, so adds are
+    amortized O(d) and a query is a single matrix-vector product. Removing
+    an id moves the last row into its slot.
+    """
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.dim = dim
+        self._data = np.zeros((max(capacity, 1), dim), dtype=np.float32)
+        self._ids: List[Hashable] = []
+        self._rows: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._rows
+
+    @property
+    def ids(self) -> List[Hashable]:
+        return list(self._ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """view of the populated rows (no copy)"""
+        return self._data[: len(self._ids)]
+
+    def memory_bytes(self) -> int:
+        """bytes held by the row buffer (including spare capacity)"""
+        return self._data.nbytes
+
+    def _ensure_writable(self, rows: int) -> None:
+        if not self._data.flags.writeable or rows > self._data.shape[0]:
+            self._resize(max(rows, self._data.shape[0] * 2))
+
+    def _resize(self, capacity: int) -> None:
+        """copy the populated rows into a new writable buffer"""
+        self._data = _resized(self._data, capacity, len(self._ids))
+
+    def _write(self, row: int, vector: np.ndarray) -> None:
+        self._data[row] = vector
+
+    def _move(self, source: int, target: int) -> None:
+        self._data[target] = self._data[source]
+
+    def add(self, item_id: Hashable, vector: Sequence[float]) -> None:
+        """insert or replace the vector stored for an id"""
+        self.add_many([item_id], np.asarray([vector], dtype=np.float32))
+
+    def add_many(self, item_ids: Sequence[Hashable], vectors: np.ndarray) -> None:
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[1:] != (self.dim,):
+            raise ValueError(
+                f"Expected vectors of dimension {self.dim}, got {vectors.shape[1:]}"
+            )
+
+        self._ensure_writable(len(self._ids) + len(item_ids))
+        for item_id, vector in zip(item_ids, vectors):
+            row = self._rows.get(item_id)
+            if row is None:
+                row = len(self._ids)
+                self._ids.append(item_id)
+                self._rows[item_id] = row
+            self._write(row, vector)
+
+    def remove(self, item_id: Hashable) -> bool:
+        """drop an id, returning False if it was not present"""
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+
+        self._ensure_writable(len(self._ids))
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._move(last, row)
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._ids.pop()
+        return True
+
+    def scores(self, query: Sequence[float]) -> np.ndarray:
+        """cosine similarity of the query against every row"""
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        return self.vectors @ query
+
+    def top_k(
+        self, query: Sequence[float], k: int, scores: Optional[np.ndarray] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """ids and scores of the k most similar rows, best first"""
+        if scores is None:
+            scores = self.scores(query)
+        return top_k_ids(self._ids, scores, k)
+
+    def ranker(
+        self, query: Sequence[float]
+    ) -> Callable[[int], List[Tuple[Hashable, float]]]:
+        """`top_k` for one query at any k, scoring the rows only once"""
+        scores = self.scores(query)
+        return lambda k: top_k_ids(self._ids, scores, k)
+
+    def rankers(
+        self, queries: Sequence[Sequence[float]]
+    ) -> List[Callable[[int], List[Tuple[Hashable, float]]]]:
+        """`ranker` for several queries, scored in one matrix product"""
+        queries = normalize_rows(np.asarray(queries, dtype=np.float32))
+        scores = queries @ self.vectors.T
+        return [lambda k, row=row: top_k_ids(self._ids, row, k) for row in scores]
+
+    def _row_scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return self._data[rows] @ query
+
+    def subset_scores(
+        self, query: Sequence[float], item_ids: Iterable[Hashable]
+    ) -> Tuple[List[Hashable], np.ndarray]:
+        """exact scores of only the given ids (unknown ids are skipped)"""
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        ids = [item_id for item_id in item_ids if item_id in self._rows]
+        rows = np.fromiter((self._rows[item_id] for item_id in ids), np.int64, len(ids))
+        return ids, self._row_scores(rows, query)
+
+    def subset_ranker(
+        self, query: Sequence[float], item_ids: Iterable[Hashable]
+    ) -> Callable[[int], List[Tuple[Hashable, float]]]:
+        """`ranker` over a subset of the rows, e.g. pre-filtered candidates"""
+        ids, scores = self.subset_scores(query, item_ids)
+        return lambda k: top_k_ids(ids, scores, k)
+
+    def save(self, path: str) -> None:
+        """write `<path>.npy` (vectors) and `<path>.ids.json` (ids)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.save(f"{path}.npy", np.ascontiguousarray(self.vectors))
+        with open(f"{path}.ids.json", "w") as f:
+            json.dump([str(item_id) for item_id in self._ids], f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "VectorMatrix":
+        """load a saved matrix, optionally memory-mapped read-only from disk"""
+        data = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+        with open(f"{path}.ids.json") as f:
+            ids = json.load(f)
+
+        matrix = cls(dim=data.shape[1], capacity=1)
+        matrix._data = data
+        matrix._ids = ids
+        matrix._rows = {item_id: row for row, item_id in enumerate(ids)}
+        return matrix
+
+
+def _resized(data: np.ndarray, capacity: int, rows: int) -> np.ndarray:
+    resized = np.zeros((capacity,) + data.shape[1:], dtype=data.dtype)
+    resized[:rows] = data[:rows]
+    return resized
+
+
+def top_k_ids(
+    ids: Sequence[Hashable], scores: np.ndarray, k: int
+) -> List[Tuple[Hashable, float]]:
+    """select the k best scores with argpartition, then sort only those"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return [(ids[row], float(scores[row])) for row in best]
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    `top_k_ids` for every row of a (queries x items) score matrix at once:
+    the k best columns of each row and their scores, best first
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.zeros((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return (
+        np.take_along_axis(best, order, axis=1),
+        np.take_along_axis(best_scores, order, axis=1),
+    )
@@ -0,0 +1,202 @@
+import json
+import os
+from typing import Callable, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vembedding.search.matrix import (
+    VectorMatrix,
+    _resized,
+    normalize_rows,
+    top_k_ids,
+)
+
+# rows dequantized per matmul; small enough for the float32 scratch to stay in cache
+SCORE_CHUNK = 128
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """symmetric int8 codes with one float32 scale per vector (x ~ code * scale)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=-1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[..., None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[..., None]
+
+
+def binary_codes(vectors: np.ndarray) -> np.ndarray:
+    """sign bits packed 8 per byte"""
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+
+if hasattr(np, "bitwise_count"):
+
+    def popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+
+else:
+    _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(values: np.ndarray) -> np.ndarray:
+        return _POPCOUNT[values]
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    return popcount(np.bitwise_xor(codes, query_code)).sum(axis=-1, dtype=np.int32)
+
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    dot products of the (dequantized) rows with a float32 query, or with
+    every column of a (dim x queries) matrix
+    """
+    scores = np.empty((len(codes),) + query.shape[1:], dtype=np.float32)
+    for start in range(0, len(codes), SCORE_CHUNK):
+        chunk = codes[start : start + SCORE_CHUNK].astype(np.float32)
+        scores[start : start + SCORE_CHUNK] = chunk @ query
+    scales = scales[: len(codes)]
+    return scores * (scales[:, None] if scores.ndim == 2 else scales)
+
+
+def truncate_dimensions(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """keep the first `dimensions` components and renormalize, like the API does"""
+    return normalize_rows(np.asarray(vectors, dtype=np.float32)[..., :dimensions])
+
+
+class QuantizedMatrix(VectorMatrix):
+    """
+    VectorMatrix that stores int8 codes and a per-row scale instead of
+    float32, a quarter of the memory (and of the index file on disk).
+
+    With `binary=True` it also keeps packed sign bits: a query ranks every row
+    by Hamming distance first and only rescores the `rescore * k` closest with
+    the int8 codes.
+    """
+
+    def __init__(
+        self, dim: int, capacity: int = 64, binary: bool = False, rescore: int = 8
+    ):
+        super().__init__(dim, capacity)
+        self.binary = binary
+        self.rescore = rescore
+        self._data = np.zeros((max(capacity, 1), dim), dtype=np.int8)
+        self._scales = np.zeros(max(capacity, 1), dtype=np.float32)
+        self._bits = np.zeros((max(capacity, 1), (dim + 7) // 8), dtype=np.uint8)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """dequantized copy of the populated rows"""
+        rows = len(self._ids)
+        return dequantize_int8(self._data[:rows], self._scales[:rows])
+
+    def memory_bytes(self) -> int:
+        return self._data.nbytes + self._scales.nbytes + self._bits.nbytes
+
+    def _ensure_writable(self, rows: int) -> None:
+        if not self._scales.flags.writeable or not self._bits.flags.writeable:
+            self._resize(max(rows, self._data.shape[0]))
+        super()._ensure_writable(rows)
+
+    def _resize(self, capacity: int) -> None:
+        rows = len(self._ids)
+        self._data = _resized(self._data, capacity, rows)
+        self._scales = _resized(self._scales, capacity, rows)
+        self._bits = _resized(self._bits, capacity, rows)
+
+    def _write(self, row: int, vector: np.ndarray) -> None:
+        codes, scales = quantize_int8(vector[None, :])
+        self._data[row] = codes[0]
+        self._scales[row] = scales[0]
+        self._bits[row] = binary_codes(vector)
+
+    def _move(self, source: int, target: int) -> None:
+        self._data[target] = self._data[source]
+        self._scales[target] = self._scales[source]
+        self._bits[target] = self._bits[source]
+
+    def scores(self, query: Sequence[float]) -> np.ndarray:
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        rows = len(self._ids)
+        return int8_scores(self._data[:rows], self._scales[:rows], query)
+
+    def _row_scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # int8 even in binary mode: subsets are small enough to rescore directly
+        return int8_scores(self._data[rows], self._scales[rows], query)
+
+    def top_k(
+        self, query: Sequence[float], k: int, scores: Optional[np.ndarray] = None
+    ) -> List[Tuple[Hashable, float]]:
+        if scores is not None or not self.binary:
+            return super().top_k(query, k, scores)
+        return self.ranker(query)(k)
+
+    def ranker(
+        self, query: Sequence[float]
+    ) -> Callable[[int], List[Tuple[Hashable, float]]]:
+        if not self.binary:
+            return super().ranker(query)
+
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        rows = len(self._ids)
+        distances = hamming_distances(self._bits[:rows], binary_codes(query))
+
+        def rank(k: int) -> List[Tuple[Hashable, float]]:
+            shortlist_size = min(rows, max(k, 1) * self.rescore)
+            if shortlist_size <= 0:
+                return []
+            shortlist = np.argpartition(distances, shortlist_size - 1)[:shortlist_size]
+            scores = int8_scores(self._data[shortlist], self._scales[shortlist], query)
+            return top_k_ids([self._ids[row] for row in shortlist], scores, k)
+
+        return rank
+
+    def rankers(
+        self, queries: Sequence[Sequence[float]]
+    ) -> List[Callable[[int], List[Tuple[Hashable, float]]]]:
+        if self.binary:
+            # each query has its own hamming shortlist to rescore
+            return [self.ranker(query) for query in queries]
+        queries = normalize_rows(np.asarray(queries, dtype=np.float32))
+        rows = len(self._ids)
+        scores = int8_scores(self._data[:rows], self._scales[:rows], queries.T)
+        return [
+            lambda k, column=column: top_k_ids(self._ids, column, k)
+            for column in scores.T
+        ]
+
+    def save(self, path: str) -> None:
+        """`<path>.q8.npy` codes, `.q8.scales.npy`, `.q8.bits.npy` and ids"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        rows = len(self._ids)
+        np.save(f"{path}.q8.npy", np.ascontiguousarray(self._data[:rows]))
+        np.save(f"{path}.q8.scales.npy", np.ascontiguousarray(self._scales[:rows]))
+        np.save(f"{path}.q8.bits.npy", np.ascontiguousarray(self._bits[:rows]))
+        with open(f"{path}.ids.json", "w") as f:
+            json.dump([str(item_id) for item_id in self._ids], f)
+
+    @classmethod
+    def load(
+        cls, path: str, mmap: bool = False, binary: bool = False, rescore: int = 8
+    ) -> "QuantizedMatrix":
+        mode = "r" if mmap else None
+        codes = np.load(f"{path}.q8.npy", mmap_mode=mode)
+        with open(f"{path}.ids.json") as f:
+            ids = json.load(f)
+
+        matrix = cls(dim=codes.shape[1], capacity=1, binary=binary, rescore=rescore)
+        matrix._data = codes
+        matrix._scales = np.load(f"{path}.q8.scales.npy", mmap_mode=mode)
+        matrix._bits = np.load(f"{path}.q8.bits.npy", mmap_mode=mode)
+        matrix._ids = ids
+        matrix._rows = {item_id: row for row, item_id in enumerate(ids)}
+        return matrix
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(f"{path}.q8.npy")
@@ -0,0 +1,119 @@
+"""Per-stage request timing: histograms plus `Server-Timing` response headers"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from vembedding.metrics import histogram
+
+T = TypeVar("T")
+
+STAGE_SECONDS = histogram(
+    "stage_duration_seconds",
+    "Time spent in each stage of a request (embedding, db, llm, ...)",
+    labelnames=("stage",),
+)
+REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds",
+    "Request latency until the response started, by route and status",
+    labelnames=("method", "route", "status"),
+)
+
+# (stage, seconds) recorded during the current request, None outside one
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "timings", default=None
+)
+
+
+@contextmanager
+def stage(name: str, server_timing: bool = True) -> Iterator[None]:
+    """
+    Time the block into `stage_duration_seconds{stage=name}` and, unless
+    `server_timing` is off, into the current response's Server-Timing header.
+
+    Work shared between requests (an embedding batch, a background flush)
+    should pass `server_timing=False`, it would be charged to whichever
+    request happened to start it.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = _timings.get()
+        if server_timing and timings is not None:
+            timings.append((name, elapsed))
+
+
+async def timed(name: str, awaitable: Awaitable[T]) -> T:
+    """`stage` for an awaitable handed to asyncio.gather"""
+    with stage(name):
+        return await awaitable
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """`name;dur=ms` per stage (repeated stages summed) plus the total"""
+    durations: Dict[str, float] = {}
+    for name, seconds in timings:
+        durations[name] = durations.get(name, 0.0) + seconds
+    durations["total"] = total
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()
+    )
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that collects the stages timed while handling a request,
+    sends them as `Server-Timing` and records the request latency per route.
+
+    Streaming responses only report the stages that ran before their first
+    byte; the rest still land in the histograms.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - start
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing_header(timings, elapsed))
+                REQUEST_SECONDS.observe(
+                    elapsed,
+                    method=scope["method"],
+                    route=getattr(scope.get("route"), "path", "unmatched"),
+                    status=str(status_code),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse whose rendering is timed as the `serialize` stage"""
+
+    def render(self, content) -> bytes:
+        with stage("serialize"):
+            return super().render(content)
@@ -0,0 +1,217 @@
+"""
+Background workers that embed the jobs and applicants waiting in the
+embedding queue, so creating them never waits on the embedding API.
+"""
+
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Dict, List
+
+from postgrest import APIError
+from supabase import AsyncClient
+
+from vembedding.ai.queue import EmbeddingQueue, EmbeddingTask, embedding_queue
+from vembedding.applicants.service import applicant
+from vembedding.config import settings
+from vembedding.constant import EmbeddingStatusConst, TableNamesConst
+from vembedding.jobs.service import job
+from vembedding.metrics import counter
+
+EMBEDDING_TASKS = counter(
+    "embedding_tasks_total",
+    "Queued embeddings processed by the workers, by kind and outcome",
+    labelnames=("kind", "outcome"),
+)
+
+# embeds a batch of record ids, returns the error of every id to retry
+Handler = Callable[[List[str], AsyncClient], Awaitable[Dict[str, str]]]
+
+# rows read per page when re-queueing pending records at startup
+RECOVERY_PAGE_SIZE = 1_000
+
+
+class EmbeddingWorkers:
+    """
+    A pool of asyncio tasks draining the embedding queue.
+
+    Every round a worker leases whatever is due (up to `batch_size` tasks)
+    and hands each kind's record ids to its handler in one call, so
+    everything queued is embedded in as few API calls as possible. Failed
+    records are retried with exponential backoff and jitter; after
+    `max_attempts` they are marked `failed`. Every `recovery_seconds`
+    records still pending in the database are queued again.
+    """
+
+    def __init__(
+        self,
+        queue: EmbeddingQueue,
+        handlers: Dict[str, Handler],
+        workers: int,
+        batch_size: int,
+        poll_seconds: float,
+        lease_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+        recovery_seconds: float = 0.0,
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.recovery_seconds = recovery_seconds
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, supabase: AsyncClient) -> None:
+        await self.recover(supabase)
+        self._tasks = [
+            asyncio.create_task(self._run(supabase)) for _ in range(self.workers)
+        ]
+        if self.recovery_seconds > 0:
+            self._tasks.append(
+                asyncio.create_task(self._recover_periodically(supabase))
+            )
+
+    async def stop(self) -> None:
+        # leased tasks of a cancelled round are handed out again after the lease
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def recover(self, supabase: AsyncClient) -> None:
+        """
+        queue records still pending in the database, e.g. created by a process
+        that died before queueing them (queueing is idempotent)
+        """
+        for kind in self.handlers:
+            start = 0
+            while True:
+                response = await (
+                    supabase.table(kind)
+                    .select("id")
+                    .eq("embedding_status", EmbeddingStatusConst.PENDING)
+                    .order("id")
+                    .range(start, start + RECOVERY_PAGE_SIZE - 1)
+                    .execute()
+                )
+                await self.queue.enqueue(kind, [row["id"] for row in response.data])
+                if len(response.data) < RECOVERY_PAGE_SIZE:
+                    break
+                start += RECOVERY_PAGE_SIZE
+
+    async def _recover_periodically(self, supabase: AsyncClient) -> None:
+        while True:
+            await asyncio.sleep(self.recovery_seconds)
+            try:
+                await self.recover(supabase)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.exception(f"Embedding recovery failed: {e}")
+
+    async def _run(self, supabase: AsyncClient) -> None:
+        while True:
+            try:
+                handled = await self.run_once(supabase)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.exception(f"Embedding worker round failed: {e}")
+                handled = 0
+            if not handled:
+                await self.queue.wait(self.poll_seconds)
+
+    async def run_once(self, supabase: AsyncClient) -> int:
+        """process one leased batch, returns the number of tasks handled"""
+        tasks = await self.queue.lease(self.batch_size, self.lease_seconds)
+        by_kind: Dict[str, List[EmbeddingTask]] = {}
+        for task in tasks:
+            by_kind.setdefault(task.kind, []).append(task)
+
+        for kind, kind_tasks in by_kind.items():
+            handler = self.handlers.get(kind)
+            if handler is None:
+                errors = {
+                    task.record_id: f"No handler for {kind}" for task in kind_tasks
+                }
+            else:
+                try:
+                    errors = await handler(
+                        [task.record_id for task in kind_tasks], supabase
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # retried (and eventually failed) like any other error
+                    errors = {task.record_id: str(e) for task in kind_tasks}
+
+            done = []
+            for task in kind_tasks:
+                error = errors.get(task.record_id)
+                if error is None:
+                    done.append(task.id)
+                    EMBEDDING_TASKS.inc(kind=kind, outcome="ready")
+                elif task.attempts + 1 >= self.max_attempts:
+                    await self._mark_failed(task, error, supabase)
+                else:
+                    await self.queue.retry(task, error, self.backoff(task.attempts))
+                    EMBEDDING_TASKS.inc(kind=kind, outcome="retried")
+            await self.queue.complete(done)
+        return len(tasks)
+
+    def backoff(self, attempts: int) -> float:
+        """exponential delay before the next attempt, jittered so retries spread out"""
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * 2**attempts)
+        return random.uniform(delay / 2, delay)
+
+    async def _mark_failed(
+        self, task: EmbeddingTask, error: str, supabase: AsyncClient
+    ) -> None:
+        logging.error(
+            f"Giving up embedding {task.kind} {task.record_id} after "
+            f"{task.attempts + 1} attempts: {error}"
+        )
+        try:
+            await (
+                supabase.table(task.kind)
+                .update(
+                    {
+                        "embedding_status": EmbeddingStatusConst.FAILED,
+                        "embedding_error": error,
+                    }
+                )
+                .eq("id", task.record_id)
+                .execute()
+            )
+        except APIError as e:
+            # keep the task, the status could not be recorded
+            await self.queue.retry(
+                task, f"{error} (marking failed: {e})", self.backoff(0)
+            )
+            return
+        await self.queue.complete([task.id])
+        EMBEDDING_TASKS.inc(kind=task.kind, outcome="failed")
+
+
+embedding_workers = EmbeddingWorkers(
+    queue=embedding_queue,
+    handlers={
+        TableNamesConst.JOBS: job.embed_pending,
+        TableNamesConst.APPLICANTS: applicant.embed_pending,
+    },
+    workers=settings.EMBEDDING_WORKERS,
+    batch_size=settings.EMBEDDING_WORKER_BATCH_SIZE,
+    poll_seconds=settings.EMBEDDING_WORKER_POLL_SECONDS,
+    lease_seconds=settings.EMBEDDING_WORKER_LEASE_SECONDS,
+    max_attempts=settings.EMBEDDING_MAX_ATTEMPTS,
+    retry_base_seconds=settings.EMBEDDING_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.EMBEDDING_RETRY_MAX_SECONDS,
+    recovery_seconds=settings.EMBEDDING_RECOVERY_SECONDS,
+)